@@ -9,22 +9,23 @@ program second_harmonic_generation
     integer n_elements                                                      !# of lines with significant values
     integer n_bcs1, n_bcs4, latest_plasma_mode, current_plasma_mode         !# in data array for triggering time for BCS1, same for BCS2, difference in # of time arrays btw inc and trans for the most retarded plasma mode, current plasma mode
     integer n_min, n_max                                                    !#s to scan PD signal: physical condition = to be between incedent and transmitted pulses
-    real*16 t_bgd, delta_t, pmt_delay                                       ![s], first XX seconds of signal where there's only background, FWHM of photodiod and photomultiplier pulse, integration will pas on (t_max-delta_t;t_max+delta_t); time of delay btw pd and pmt
-    real*16 timestep                                                        !timestep - difference between two closest input T points
-    real*16 trigger                          
+    real(wp) t_bgd, delta_t, pmt_delay                                       ![s], first XX seconds of signal where there's only background, FWHM of photodiod and photomultiplier pulse, integration will pas on (t_max-delta_t;t_max+delta_t); time of delay btw pd and pmt
+    real(wp) timestep                                                        !timestep - difference between two closest input T points
+    real(wp) trigger                          
     character(len=256) :: part1, part2, part3, part4                               ![a.u.], trigger level of BCS1 and BCS2 signals
     character(256) inputfile, outputfile, emissionfile, filepath, emissionpath             !filename of file with data input and output information, filepath for data and emission's file name (if needed), should be syncronised with latest plasma mode manually
 !---------------------------------OUTPUT--------------------------------
-    real*16, allocatable                    ::  signalwbgd(:,:)             !
-    real*16, allocatable                    ::  signal(:,:)                 !
-    real*16, allocatable                    ::  emission(:,:)               !
-    real*16, dimension (:), allocatable     :: pd_integral   
-    real*16, dimension (:), allocatable     :: pmt_integral
-    real*16, dimension (:,:), allocatable   :: shg_singleshot
-    real*16, dimension (:), allocatable     :: pd_maxima
-    real*16, dimension (:), allocatable     :: pmt_maxima
-    real*16, dimension (:), allocatable     :: pmt_noise_maxima
-    real*16 integral                                                        !current value of integrated signal
+    real(wp), allocatable                    ::  signalwbgd(:,:)             !
+    real(wp), allocatable                    ::  signal(:,:)                 !
+    real(wp), allocatable                    ::  emission(:,:)               !
+    real(wp), dimension (:), allocatable     :: pd_integral   
+    real(wp), dimension (:), allocatable     :: pmt_integral
+    real(wp), dimension (:,:), allocatable   :: shg_singleshot
+    real(wp), dimension (:), allocatable     :: pd_maxima
+    real(wp), dimension (:), allocatable     :: pmt_maxima
+    real(wp), dimension (:), allocatable     :: pmt_noise_maxima
+    logical, dimension (:), allocatable      :: passed                       !shots passing the selection, written in shot order at the end
+    real(wp) integral                                                        !current value of integrated signal
     character(len=1) :: separator
 !---------------------------------INNER---------------------------------
     integer i, j                                                            !counter
@@ -40,8 +41,10 @@ program second_harmonic_generation
     part3 ="C:/Users/samue/OneDrive/Documentos/2024/LPP/M1_internship/"
     part4 = "data/2024_05_16/output_pos2_27.dat"
     outputfile = trim(part3)// trim(part4)
-    print *, "Input file: ", inputfile
-    print *, "Output file: ", outputfile
+    if (command_argument_count() >= 1) call get_command_argument(1, inputfile)    !optional arguments: input and output files
+    if (command_argument_count() >= 2) call get_command_argument(2, outputfile)
+    if (verbosity >= 1) print *, "Input file: ", inputfile
+    if (verbosity >= 1) print *, "Output file: ", outputfile
    
     !emissionfile='C3--20240516_Air150mbar_45kV_BG1_inverted.txt'
 !------------------------------DEALLOCATION-----------------------------
@@ -100,6 +103,7 @@ program second_harmonic_generation
     allocate(pd_maxima(osc_z))
     allocate(pmt_maxima(osc_z))
     allocate(pmt_noise_maxima(osc_z))
+    allocate(passed(osc_z))
     do i=1, osc_z
         pd_integral(i)=0.0
         pmt_integral(i)=0.0
@@ -108,6 +112,7 @@ program second_harmonic_generation
         pd_maxima(i)=0.0
         pmt_maxima(i)=0.0
         pmt_noise_maxima(i)=0.0
+        passed(i)=.false.
     enddo
 !----------------------------FILE PREPARATION---------------------------
     open(202405160, file=outputfile)
@@ -120,23 +125,26 @@ program second_harmonic_generation
     latest_plasma_mode=0                                                    !difference in # of time arrays btw inc and trans                       !EXPERIMENTAL VERSION
     n_min=n_elements                                                                                                                                !EXPERIMENTAL VERSION
     n_max=0                                                                                                                                    !EXPERIMENTAL VERSION
+    !shots are independent: with -fopenmp every thread reads into its own buffers, n_min, n_max and the latest mode are reduced
+    !$omp parallel do schedule(dynamic) private(filename, signalwbgd, signal, n_elements, n_bcs1, n_bcs4) &
+    !$omp reduction(min:n_min) reduction(max:n_max, latest_plasma_mode)
     do i=osc_a, osc_z                                                                                                                               !EXPERIMENTAL VERSION
-        print *, 'osc#=', i                                                                                                                 !EXPERIMENTAL VERSION
-        print *, 'C1'                                                      !arriving signal                                                        !EXPERIMENTAL VERSION
+        if (verbosity >= 2) print *, 'osc#=', i                                                                                                                 !EXPERIMENTAL VERSION
+        if (verbosity >= 2) print *, 'C1'                                                      !arriving signal                                                        !EXPERIMENTAL VERSION
         call name_osc(i, filebase_bcs1, filename, fileformat)                                                                                  !EXPERIMENTAL VERSION
         call file_reading (filepath, filename, header, signalwbgd, n_elements)                                                                      !EXPERIMENTAL VERSION
-        call offset_substraction (signalwbgd, n_elements, t_bgd, signal)                                                                            !EXPERIMENTAL VERSION
+        call baseline_correction (signalwbgd, n_elements, t_bgd, signal)                                                                            !EXPERIMENTAL VERSION
         n_bcs1=1                                                            !first elements in array                                                !EXPERIMENTAL VERSION
         do while (signal(n_bcs1,2) .LT. trigger)                                                                                                    !EXPERIMENTAL VERSION
             n_bcs1=n_bcs1+1                                                                                                                 !EXPERIMENTAL VERSION
         enddo                                                                                                                                       !EXPERIMENTAL VERSION
         n_min=min(n_bcs1, n_min)                                                                                                                    !EXPERIMENTAL VERSION
                                                                                                                                                     !EXPERIMENTAL VERSION
-        print *, 'C4'                                                      !transmitted signal                                                     !EXPERIMENTAL VERSION
+        if (verbosity >= 2) print *, 'C4'                                                      !transmitted signal                                                     !EXPERIMENTAL VERSION
         call name_osc(i, filebase_bcs4, filename, fileformat)                                                                                       !EXPERIMENTAL VERSION
         call file_reading (filepath, filename, header, signalwbgd, n_elements) 
                                                                              !EXPERIMENTAL VERSION
-        call offset_substraction (signalwbgd, n_elements, t_bgd, signal) 
+        call baseline_correction (signalwbgd, n_elements, t_bgd, signal) 
                                                                         !EXPERIMENTAL VERSION
         n_bcs4=n_bcs1     
                                                    !first elements in array                                                !EXPERIMENTAL VERSION
@@ -148,8 +156,12 @@ program second_harmonic_generation
         n_max=max(n_bcs4, n_max)                                                                                                                    !EXPERIMENTAL VERSION
                                                                                                                                                     !EXPERIMENTAL VERSION
         latest_plasma_mode=max(latest_plasma_mode, (n_bcs4-n_bcs1))                                                                                 !EXPERIMENTAL VERSION
-        print '(i8, i8, i8, i8, i8)', i, n_bcs4, n_bcs1, (n_bcs4-n_bcs1), latest_plasma_mode                                                       !EXPERIMENTAL VERSION
+        if (verbosity >= 2) print '(i8, i8, i8, i8, i8)', i, n_bcs4, n_bcs1, (n_bcs4-n_bcs1), latest_plasma_mode                                                       !EXPERIMENTAL VERSION
     enddo                                                                                                                                           !EXPERIMENTAL VERSION
+    !$omp end parallel do
+    !the buffers of the threads are gone: the time axis is read again from the last C4 file, as left by the serial loop
+    !$ call name_osc(osc_z, filebase_bcs4, filename, fileformat)
+    !$ call file_reading (filepath, filename, header, signalwbgd, n_elements)
     
     timestep=(signalwbgd(2,1)-signalwbgd(1,1))
     
@@ -171,10 +183,12 @@ program second_harmonic_generation
          emission(i,2)=0.0
     enddo  
 !------------------------SINGLE SHG CALCULATIONS------------------------
+    !$omp parallel do schedule(dynamic) private(filename, signalwbgd, signal, n_elements, n_bcs1, n_bcs4, j, integral) &
+    !$omp private(t_pd_max, t_pmt_max, t_pmt_noise_max, current_plasma_mode)
     do i=osc_a, osc_z
-        print *, 'osc#=', i
+        if (verbosity >= 2) print *, 'osc#=', i
 !---------------------------PD CALCULATIONS-----------------------------
-        print *, 'C2'
+        if (verbosity >= 2) print *, 'C2'
         call name_osc(i, filebase_pd, filename, fileformat)
         call file_reading (filepath, filename, header, signalwbgd, n_elements)
         call offset_substraction (signalwbgd, n_elements, t_bgd, signal)
@@ -185,10 +199,10 @@ program second_harmonic_generation
 !---------------------------PMT CALCULATIONS----------------------------
             pd_maxima(i)=signal(t_pd_max,2)
             pd_integral(i)=integral
-            print *, 'C3'
+            if (verbosity >= 2) print *, 'C3'
             call name_osc(i, filebase_pmt, filename, fileformat)
             call file_reading (filepath, filename, header, signalwbgd, n_elements)
-            call offset_substraction (signalwbgd, n_elements, t_bgd, signal)
+            call baseline_correction (signalwbgd, n_elements, t_bgd, signal)
             do j=1, n_elements
                 signal(j,2)=signal(j,2)-emission(j,2)                                                                                                                                           !EMISSION SUBTRACTION, verrry manual thing, to be improved
             enddo
@@ -206,55 +220,62 @@ program second_harmonic_generation
             
             if (pmt_maxima(i) .GT. pmt_noise_maxima(i)) then                                                                                        !EXPERIMENTAL VERSION: NOISE SEARCH
                 if ((pmt_maxima(i)>0.0) .AND. (pmt_integral(i)>0.0)) then                                                                           !pmt is >0
-                    print *, '--------------------PASSED osc=', i
+                    if (verbosity >= 2) print *, '--------------------PASSED osc=', i
                 
 !--------------------CURRENT PLASMA MODE CALCULATION--------------------                                                                            !EXPERIMENTAL VERSION
-                    print *, 'C1'                                                      !arriving signal                                            !EXPERIMENTAL VERSION
+                    if (verbosity >= 2) print *, 'C1'                                                      !arriving signal                                            !EXPERIMENTAL VERSION
                     call name_osc(i, filebase_bcs1, filename, fileformat)                                                                           !EXPERIMENTAL VERSION
                     call file_reading (filepath, filename, header, signalwbgd, n_elements)                                                          !EXPERIMENTAL VERSION
-                    call offset_substraction (signalwbgd, n_elements, t_bgd, signal)                                                                !EXPERIMENTAL VERSION
+                    call baseline_correction (signalwbgd, n_elements, t_bgd, signal)                                                                !EXPERIMENTAL VERSION
                     n_bcs1=1                                                            !first elements in array                                    !EXPERIMENTAL VERSION
                     do while (signal(n_bcs1,2) .LT. trigger)                                                                                        !EXPERIMENTAL VERSION
                         n_bcs1=n_bcs1+1                                                                                                             !EXPERIMENTAL VERSION
                     enddo                                                                                                                           !EXPERIMENTAL VERSION
-                    print *, 'C4'                                                      !transmitted signal                                         !EXPERIMENTAL VERSION
+                    if (verbosity >= 2) print *, 'C4'                                                      !transmitted signal                                         !EXPERIMENTAL VERSION
                     call name_osc(i, filebase_bcs4, filename, fileformat)                                                                           !EXPERIMENTAL VERSION
                     call file_reading (filepath, filename, header, signalwbgd, n_elements)                                                          !EXPERIMENTAL VERSION
-                    call offset_substraction (signalwbgd, n_elements, t_bgd, signal)                                                                !EXPERIMENTAL VERSION
+                    call baseline_correction (signalwbgd, n_elements, t_bgd, signal)                                                                !EXPERIMENTAL VERSION
                     n_bcs4=n_bcs1                                                       !first elements in array                                    !EXPERIMENTAL VERSION
                     do while (signal(n_bcs4,2) .LT. trigger)                                                                                        !EXPERIMENTAL VERSION
                         n_bcs4=n_bcs4+1                                                                                                             !EXPERIMENTAL VERSION
                     enddo                                                                                                                           !EXPERIMENTAL VERSION
                     current_plasma_mode=n_bcs4-n_bcs1                                                                                               !EXPERIMENTAL VERSION
-                    print '(i8, i8, i8)', i, current_plasma_mode, latest_plasma_mode                                                               !EXPERIMENTAL VERSION
+                    if (verbosity >= 2) print '(i8, i8, i8)', i, current_plasma_mode, latest_plasma_mode                                                               !EXPERIMENTAL VERSION
 !-----------------------------TIME ADJUSTMENT---------------------------                                                                            !EXPERIMENTAL VERSION
                     t_pd_max=t_pd_max+latest_plasma_mode-current_plasma_mode                                                                        !EXPERIMENTAL VERSION
                 
 !----------------------------SAVING SINGLESHOTS-------------------------
                     shg_singleshot(i,1)=signal(t_pd_max,1)*1e9                          !time in [ns]
                     shg_singleshot(i,2)=sqrt(pmt_integral(i))/pd_integral(i)
-                    separator = ';'
-                    write(202405160,'(f11.2,a,e11.4,a,e11.4,a,e11.4,a,e11.4,a,e11.4,a,e11.4,a,i6)') &
-                    shg_singleshot(i,1),trim(separator),pmt_noise_maxima(i),trim(separator),pmt_maxima(i),trim(separator), &
-                    sqrt(pmt_integral(i)),trim(separator),pd_maxima(i),trim(separator),pd_integral(i),trim(separator), &
-                    shg_singleshot(i,2),trim(separator),i
+                    passed(i)=.true.
                                 
                 endif
             endif
         endif
     enddo
-    print *, "checkpoint"
+    !$omp end parallel do
+    separator = ';'
+    do i=osc_a, osc_z
+        if (passed(i)) then
+            write(202405160,'(f11.2,a,e11.4,a,e11.4,a,e11.4,a,e11.4,a,e11.4,a,e11.4,a,i6)') &
+            shg_singleshot(i,1),trim(separator),pmt_noise_maxima(i),trim(separator),pmt_maxima(i),trim(separator), &
+            sqrt(pmt_integral(i)),trim(separator),pd_maxima(i),trim(separator),pd_integral(i),trim(separator), &
+            shg_singleshot(i,2),trim(separator),i
+        endif
+    enddo
+    if (verbosity >= 1) print *, "checkpoint"
     write(202405160, "(i8)") latest_plasma_mode
 
 !---------------------------DEALLOCATION, CLOSURE-----------------------
-    deallocate(signalwbgd)
-    deallocate(signal)
+    if (allocated(signalwbgd)) deallocate(signalwbgd)
+    if (allocated(signal)) deallocate(signal)
     deallocate(pd_integral)  
     deallocate(pmt_integral)
     deallocate(shg_singleshot)
     deallocate(pd_maxima)
     deallocate(pmt_maxima)
     deallocate(pmt_noise_maxima)
+    deallocate(passed)
     deallocate(emission)
     close(202405163)
     
@@ -1,4 +1,24 @@
 module shg
+!---------------------------------PRECISION-----------------------------
+! wp is the kind of all real variables: quadruple precision (real(wp)) by default,
+! double precision (real*8) when compiled with -cpp -DDOUBLE (performance profile)
+! verbosity selects the diagnostic printing: 0 none, 1 start and end of the run, 2 every shot/row/bin (default)
+#ifdef DOUBLE
+    integer, parameter          ::  wp = selected_real_kind(15, 307)
+#else
+    integer, parameter          ::  wp = selected_real_kind(33, 4931)
+#endif
+#ifndef VERBOSITY
+#define VERBOSITY 2
+#endif
+    integer, parameter          ::  verbosity = VERBOSITY
+! corrected is set with -DCORRECTED when the C11, C44 and C33 files written by e_fish already have their
+! baseline offset subtracted (load.subtract_background), so that baseline_correction only copies them
+#ifdef CORRECTED
+    logical, parameter          ::  corrected = .true.
+#else
+    logical, parameter          ::  corrected = .false.
+#endif
     contains 
 
 subroutine name_osc(filenumber, filebase, filename, fileformat)
@@ -38,21 +58,22 @@ subroutine file_reading (filepath, filename, header, signalwbgd, n_elements)
     character(111), intent(in)   ::  filepath                    !line of file with path information
     integer, intent(in)         ::  header                      !number of lines with non-digital data
 !---------------------------------OUTPUT--------------------------------
-    real*16, allocatable        ::  signalwbgd(:,:)             !array: 1st column for time, 2nd for data values
+    real(wp), allocatable        ::  signalwbgd(:,:)             !array: 1st column for time, 2nd for data values
     integer, intent(inout)      ::  n_elements                  !number of lines with digital data == lenght of the output massive; changes in cours of programm
 !---------------------------------INNER---------------------------------
     integer i                                                   !counter
+    integer unit_number                                         !unit chosen by the runtime, so threads can read files concurrently
     
     n_elements=0
     !print *, "file_for_reading:", trim(filepath)//trim(filename)
-    open(1, file=trim(filepath)//trim(filename))
+    open(newunit=unit_number, file=trim(filepath)//trim(filename))
     
     do while (.true.)
-        read(unit=1, fmt="(A)", iostat=io_status) line
+        read(unit=unit_number, fmt="(A)", iostat=io_status) line
         if (io_status /= 0) exit
         n_elements = n_elements + 1  ! total # of lines
     end do   
-    rewind(1)                                                   !goes to the head of file again
+    rewind(unit_number)                                                   !goes to the head of file again
     
     n_elements=n_elements-header                                !# of digital data lines
     if (allocated(signalwbgd)) then
@@ -60,14 +81,14 @@ subroutine file_reading (filepath, filename, header, signalwbgd, n_elements)
     endif
     allocate(signalwbgd(n_elements, 2))
     do i=1, header
-        read(1, "(A)") line                                  !skipping #=header lines
+        read(unit_number, "(A)") line                                  !skipping #=header lines
     enddo       
     do i=1, n_elements
-        read(1, *) signalwbgd(i, 1), signalwbgd(i, 2)           !writing all the lines after skipped ones: time and amplitude
+        read(unit_number, *) signalwbgd(i, 1), signalwbgd(i, 2)           !writing all the lines after skipped ones: time and amplitude
     enddo
 
     
-    close(1)
+    close(unit_number)
        
 end subroutine file_reading
 
@@ -76,13 +97,13 @@ subroutine offset_substraction (signalwbgd, n_elements, t_bgd, signal)
 ! takes measured signal of n_elements points and t_bgd since when signal is considered present
 ! returns signal without offset and/or bgd noise
 !---------------------------------INPUT---------------------------------
-    real*16, intent(in)         ::  signalwbgd(n_elements, 2)   !first column - time, second - data; contains offset and/or bgd noise   
+    real(wp), intent(in)         ::  signalwbgd(n_elements, 2)   !first column - time, second - data; contains offset and/or bgd noise   
     integer, intent(in)         ::  n_elements                  !#of points in input array
-    real*16, intent(in)         ::  t_bgd                       !ending time position of bgd signal; beginning is considered as the 1st point in data input
+    real(wp), intent(in)         ::  t_bgd                       !ending time position of bgd signal; beginning is considered as the 1st point in data input
 !---------------------------------OUTPUT--------------------------------
-    real*16, allocatable        ::  signal(:,:)                 !array: 1st column for time, 2nd for data values
+    real(wp), allocatable        ::  signal(:,:)                 !array: 1st column for time, 2nd for data values
 !---------------------------------INNER---------------------------------
-    real*16 summ, timestep                                      !summ - average bgd field variable, timestep - difference between two closest input T points
+    real(wp) summ, timestep                                      !summ - average bgd field variable, timestep - difference between two closest input T points
     integer i , n_bgd                                           !i - counter, n_bgd - final number for bgd elements
     
     if (allocated(signal)) then
@@ -106,12 +127,33 @@ subroutine offset_substraction (signalwbgd, n_elements, t_bgd, signal)
        
 end subroutine offset_substraction
 
+subroutine baseline_correction (signalwbgd, n_elements, t_bgd, signal)
+!---------------------------------DESCRIPTION---------------------------
+! offset_substraction for the files written by e_fish (C11, C44 and C33)
+! returns the signal unchanged if their offset was subtracted before writing them (-DCORRECTED)
+!---------------------------------INPUT---------------------------------
+    real(wp), intent(in)         ::  signalwbgd(n_elements, 2)   !first column - time, second - data
+    integer, intent(in)         ::  n_elements                  !#of points in input array
+    real(wp), intent(in)         ::  t_bgd                       !ending time position of bgd signal
+!---------------------------------OUTPUT--------------------------------
+    real(wp), allocatable        ::  signal(:,:)                 !array: 1st column for time, 2nd for data values
+
+    if (corrected) then
+        if (allocated(signal)) deallocate(signal)
+        allocate(signal(n_elements, 2))
+        signal=signalwbgd
+    else
+        call offset_substraction (signalwbgd, n_elements, t_bgd, signal)
+    endif
+
+end subroutine baseline_correction
+
 subroutine maxima_search(signal, n_elements, n_initial, n_final, t_max)
 !---------------------------------DESCRIPTION---------------------------
 ! takes a signal of n_elements, searches a local maxima in range of n_initial, n_final
 ! returns maxima's position
 !---------------------------------INPUT---------------------------------
-    real*16, intent(in)         ::  signal(n_elements, 2)           !first column - time, second - data
+    real(wp), intent(in)         ::  signal(n_elements, 2)           !first column - time, second - data
     integer, intent(in)         ::  n_elements, n_initial, n_final  !#of points in input array, boundaries of maxima search
 !---------------------------------OUTPUT--------------------------------
     integer, intent(inout)      ::  t_max                           !index of a line with max signal
@@ -132,10 +174,10 @@ subroutine integration(signal, n_elements, n_initial, n_final, integral)
 ! takes a signal of n_elements and boundaries of integraton n_initial and n_final
 ! returns integral
 !---------------------------------INPUT---------------------------------
-    real*16, intent(in)         ::  signal(n_elements, 2)           !first column - time, second - data
+    real(wp), intent(in)         ::  signal(n_elements, 2)           !first column - time, second - data
     integer, intent(in)         ::  n_elements, n_initial, n_final  !#of points in input array, boundaries of maxima search
 !---------------------------------OUTPUT--------------------------------
-    real*16, intent(inout)      ::  integral                        !integrated signal within (t_max-FWHM, t_max+FWHM)
+    real(wp), intent(inout)      ::  integral                        !integrated signal within (t_max-FWHM, t_max+FWHM)
 !---------------------------------INNER---------------------------------
     integer i                                                       !counter
     
@@ -154,13 +196,13 @@ subroutine wigwam_correction(signal, n_elements, t_max, maxima, integral)
 ! if wigwam problem is there, returns corrected values for maxima and integral
 ! if not, changes nothing
 !---------------------------------INPUT---------------------------------
-    real*16, intent(in)         ::  signal(n_elements, 2)           !first column - time, second - data
+    real(wp), intent(in)         ::  signal(n_elements, 2)           !first column - time, second - data
     integer, intent(in)         ::  n_elements, t_max               !#of points in input array, boundaries of maxima search
 !---------------------------------OUTPUT--------------------------------
-    real*16, intent(inout)      ::  maxima, integral                !integrated signal within (t_max-FWHM, t_max+FWHM)
+    real(wp), intent(inout)      ::  maxima, integral                !integrated signal within (t_max-FWHM, t_max+FWHM)
 !---------------------------------INNER---------------------------------
     integer i, ww_min, ww_max                                       !counter, min and max positions of wigwam pedestal
-    real*16 slope                                                   !slope>o of the wigwam wall
+    real(wp) slope                                                   !slope>o of the wigwam wall
     
     slope=0.1785*1e9                                                ![a.u./ns*1e9]=[a.u./s], slope is to estimate for every case at Origin PAY ATTENTION TO S-NS TRANSITION!
     
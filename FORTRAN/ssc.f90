@@ -1,4 +1,17 @@
 module ssc
+!---------------------------------PRECISION-----------------------------
+! wp is the kind of all real variables: quadruple precision (real(wp)) by default,
+! double precision (real*8) when compiled with -cpp -DDOUBLE (performance profile)
+! verbosity selects the diagnostic printing: 0 none, 1 start and end of the run, 2 every shot/row/bin (default)
+#ifdef DOUBLE
+    integer, parameter          ::  wp = selected_real_kind(15, 307)
+#else
+    integer, parameter          ::  wp = selected_real_kind(33, 4931)
+#endif
+#ifndef VERBOSITY
+#define VERBOSITY 2
+#endif
+    integer, parameter          ::  verbosity = VERBOSITY
     contains 
 
 subroutine file_reading (filepath, filename, header, signalwbgd, n_elements)
@@ -10,7 +23,7 @@ subroutine file_reading (filepath, filename, header, signalwbgd, n_elements)
     character(80), intent(in)   ::  filepath                    !line of file with path information
     integer, intent(in)         ::  header                      !number of lines with non-digital data
 !---------------------------------OUTPUT--------------------------------
-    real*16, allocatable        ::  signalwbgd(:,:)             !array: 1st column for time, 2nd for data values
+    real(wp), allocatable        ::  signalwbgd(:,:)             !array: 1st column for time, 2nd for data values
     integer, intent(inout)      ::  n_elements                  !number of lines with digital data == lenght of the output massive; changes in cours of programm
 !---------------------------------INNER---------------------------------
     integer i                                                   !counter
@@ -39,7 +52,7 @@ subroutine file_reading (filepath, filename, header, signalwbgd, n_elements)
     enddo       
     do i=1, n_elements
         read(1, *) signalwbgd(i, 1), signalwbgd(i, 2)           !writing all the lines after skipped ones: time and amplitude
-        print *, signalwbgd(i, 1), signalwbgd(i, 2)  
+        if (verbosity >= 2) print *, signalwbgd(i, 1), signalwbgd(i, 2)  
     enddo
     close(1)
        
@@ -50,13 +63,13 @@ subroutine binner_sinner(t_student, n_student, shg_singleshot, n_elements, bin_w
 ! takes the unbinned data shg_singleshot, does # of bins to fit all the time points from t_min to t_max with a bin_width step
 ! returns an (n_bins, 2) array with statistically treated values and filled time axis as a middle bin time point
 !---------------------------------INPUT---------------------------------
-    real*16, intent(in)         ::  shg_singleshot(n_elements, 2)   !first column - time, second - data
-    real*16, intent(in)         ::  t_student(n_student,2)            !student coefficients for absolute random error estimation for a chosen probability (usually requested standart is 0.95=95%)
+    real(wp), intent(in)         ::  shg_singleshot(n_elements, 2)   !first column - time, second - data
+    real(wp), intent(in)         ::  t_student(n_student,2)            !student coefficients for absolute random error estimation for a chosen probability (usually requested standart is 0.95=95%)
     integer, intent(in)         ::  n_elements                      !#of points in input array
     integer, intent(in)         ::  n_student                       !#of points in input array for t_student values
-    real*16, intent(in)         ::  bin_width                       !the selected width of the bin
+    real(wp), intent(in)         ::  bin_width                       !the selected width of the bin
 !---------------------------------OUTPUT--------------------------------
-    real*16, allocatable        ::  shg_binned(:,:)                 !1st column for time, 2nd for arithmetic average (further 'mean'), 3rd for absolute random error (furter 'error'), 4th for # of data points collected in a bin (further 'histogram')
+    real(wp), allocatable        ::  shg_binned(:,:)                 !1st column for time, 2nd for arithmetic average (further 'mean'), 3rd for absolute random error (furter 'error'), 4th for # of data points collected in a bin (further 'histogram')
     integer, intent(inout)      ::  n_bins                          !# of bins
 !---------------------------------INNER---------------------------------
     integer i, j, j_initial, j_final                                !counters
@@ -75,7 +88,7 @@ subroutine binner_sinner(t_student, n_student, shg_singleshot, n_elements, bin_w
     
     n_bins=int(( shg_singleshot(n_elements,1)-shg_singleshot(1,1) )/bin_width)+1
     !print '(e14.6, e14.6, i6)', shg_singleshot(n_elements,1), shg_singleshot(1,1), n_bins
-    print *, n_bins
+    if (verbosity >= 2) print *, n_bins
 !------------------------------DEALLOCATION-----------------------------
     if (allocated(shg_binned)) then
         deallocate(shg_binned)
@@ -89,7 +102,8 @@ subroutine binner_sinner(t_student, n_student, shg_singleshot, n_elements, bin_w
         shg_binned(i,4)=0.0                                                                 !HISTOGRAM values are initially zeroed        
     enddo
     do i=1, n_bins
-       print '(i8, f6.2, e12.2, e12.2, i6)', i, shg_binned(i,1), shg_binned(i,2), shg_binned(i,3), int(shg_binned(i,4))
+       if (verbosity >= 2) print '(i8, f6.2, e12.2, e12.2, i6)', i, shg_binned(i,1), shg_binned(i,2), shg_binned(i,3), &
+       int(shg_binned(i,4))
     enddo
 !--------------------------------CALCULATIONS---------------------------
     j=1
@@ -97,7 +111,7 @@ subroutine binner_sinner(t_student, n_student, shg_singleshot, n_elements, bin_w
     j_final=1
     flag=.TRUE.
     do i=1, n_bins
-        print '(i8, i8, i8)', j, j_initial, j_final
+        if (verbosity >= 2) print '(i8, i8, i8)', j, j_initial, j_final
         do while (flag)
             if (shg_singleshot(j,1) .GE. shg_binned(i,1)) then
                 flag=.FALSE.
@@ -119,7 +133,8 @@ subroutine binner_sinner(t_student, n_student, shg_singleshot, n_elements, bin_w
             else
                 shg_binned(i,2)=shg_binned(i,2)+shg_singleshot(j,2)                             !summ of all singleshot values of the bin, will be devided by the bins histogram further
                 shg_binned(i,4)=shg_binned(i,4)+1                                               !evaluation of the bins histogram
-                print '(f12.2, f12.2, f12.2, e12.2, i6, i6)', shg_binned(i,1), shg_binned(i,1)+bin_width, shg_singleshot(j,1),&
+                if (verbosity >= 2) print '(f12.2, f12.2, f12.2, e12.2, i6, i6)', shg_binned(i,1), shg_binned(i,1)+bin_width, &
+                shg_singleshot(j,1),&
                 shg_singleshot(j,2), int(shg_binned(i,4)), j
                 if (j .GE. n_elements) then
                     j=j+1
@@ -148,9 +163,10 @@ subroutine binner_sinner(t_student, n_student, shg_singleshot, n_elements, bin_w
             !print *, 't_student(hist)=', t_student(int(shg_binned(i,4)),2)
         endif        
         j=j_final+1
-        print *, 'OUT--------time------------mean-----------error------------hist-------i'
-        print '(f16.2, e16.2, e16.2, f16.2, i8)', shg_binned(i,1), shg_binned(i,2), shg_binned(i,3), shg_binned(i,4), i
-        print '(i8, i8, i8)', j, j_initial, j_final  
+        if (verbosity >= 2) print *, 'OUT--------time------------mean-----------error------------hist-------i'
+        if (verbosity >= 2) print '(f16.2, e16.2, e16.2, f16.2, i8)', shg_binned(i,1), shg_binned(i,2), shg_binned(i,3), &
+        shg_binned(i,4), i
+        if (verbosity >= 2) print '(i8, i8, i8)', j, j_initial, j_final  
     enddo
     
     do i=1, n_bins
@@ -4,15 +4,16 @@ program stud_stat_calc
 !------------------------------DECLARATION------------------------------
 !---------------------------------INPUT---------------------------------
 !--------------------------ALL TIMES ARE IN[NS]-------------------------
-    character(100) inputfile, studentfile, outputfile, filepath              !filenames of file with data input and output information
+    character(100) studentfile, filepath                                    !filenames of file with data input and output information
+    character(256) inputfile, outputfile                                    !
     integer header                                                          !# of lines to skip at header
     integer n_elements                                                      !# of lines with significant values
     integer n_student                                                       !# of lines with significant values for a t_student
-    real*16 bin_width                                                       ![ns], width of a bin, 1st bin begins from first data point, each bin has a time coordinate in a middle of a bin
+    real(wp) bin_width                                                       ![ns], width of a bin, 1st bin begins from first data point, each bin has a time coordinate in a middle of a bin
 !---------------------------------OUTPUT--------------------------------
-    real*16, allocatable                    ::  shg_singleshot(:,:)         !ORDERED FROM T_MIN TO T_MAX!!!
-    real*16, allocatable                    ::  t_student(:,:)              !student's coefficients database for a selected probability (usually requested standart is 0.95=95%)
-    real*16, allocatable                    ::  shg_binned(:,:)             !result of the work: 1st column for time [ns], 2nd for arithmetic average (further 'mean'), 3rd for absolute random error (furter 'error'), 4th for # of data points collected in a bin (further 'histogram')
+    real(wp), allocatable                    ::  shg_singleshot(:,:)         !ORDERED FROM T_MIN TO T_MAX!!!
+    real(wp), allocatable                    ::  t_student(:,:)              !student's coefficients database for a selected probability (usually requested standart is 0.95=95%)
+    real(wp), allocatable                    ::  shg_binned(:,:)             !result of the work: 1st column for time [ns], 2nd for arithmetic average (further 'mean'), 3rd for absolute random error (furter 'error'), 4th for # of data points collected in a bin (further 'histogram')
     integer n_bins                                                          !# of bins
     character(len=1) :: separator
 !---------------------------------INNER---------------------------------
@@ -22,6 +23,9 @@ program stud_stat_calc
     inputfile="C:\Users\samue\OneDrive\Documentos\2024\LPP\M1_internship\data\2024_05_16\input_pos2_27_SSC.dat"                                                   !directs to 'shg_singleshot.dat'with all single shot data for selected case
     studentfile='t_student.dat'                                             !gives the student coefficients for a chosen probability (usually requested standart is 0.95=95%)
     outputfile="C:\Users\samue\OneDrive\Documentos\2024\LPP\M1_internship\data\2024_05_16\output_pos2_27_SSC.dat"
+    if (command_argument_count() >= 1) call get_command_argument(1, inputfile)    !optional arguments: input, output and student files
+    if (command_argument_count() >= 2) call get_command_argument(2, outputfile)
+    if (command_argument_count() >= 3) call get_command_argument(3, studentfile)
 !------------------------------DEALLOCATION-----------------------------
     if (allocated(shg_singleshot)) then
         deallocate(shg_singleshot)
@@ -34,7 +38,7 @@ program stud_stat_calc
     read(20240516, "(A)") filepath, filename
     read(20240516, *) header, n_elements
     read(20240516, *) bin_width
-    print *, filepath, filename, header, n_elements, bin_width
+    if (verbosity >= 1) print *, filepath, filename, header, n_elements, bin_width
     close(20240516)
 !---------------------------READING INPUT FILE2--------------------------- 
     open(202405165, file=studentfile)
@@ -71,7 +75,7 @@ program stud_stat_calc
 !----------------------CREATING AND FILLING BINS------------------------
     call binner_sinner(t_student, n_student, shg_singleshot, n_elements, bin_width, shg_binned, n_bins)
     separator = ';'
-    print *, n_bins
+    if (verbosity >= 1) print *, n_bins
     do i=1, n_bins
         if (shg_binned(i,4) .NE. 0.0) then
             write(202405160, "(f6.2,a,e14.4,a,e14.4,a,i8)") shg_binned(i,1),trim(separator),shg_binned(i,2),trim(separator),&
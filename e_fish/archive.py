@@ -0,0 +1,112 @@
+import os
+import tarfile
+import zipfile
+from pathlib import Path
+
+
+# Archive formats accepted in place of an acquisition folder
+SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+def is_archive(path) -> bool:
+    """
+    Tells whether a path is an archive file (zip or tar, possibly compressed) rather than a folder.
+    """
+
+    path = Path(path)
+    return path.is_file() and path.name.lower().endswith(SUFFIXES)
+
+
+def member_names(path) -> list:
+    """
+    Lists the names of the regular files in an archive, in archive order.
+
+    Notes:
+    ------
+    - A zip is listed from its central directory; a tar has no index, so listing a compressed tar costs
+      one decompression pass.
+    """
+
+    path = str(path)
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            return [i.filename for i in archive.infolist() if not i.is_dir()]
+    with tarfile.open(path, "r|*") as archive:
+        return [i.name for i in archive if i.isfile()]
+
+
+def list_members(path, channels) -> dict:
+    """
+    Lists the files of several channels in an archive, indexed by shot number.
+
+    Parameters:
+    -----------
+    path : str or Path
+        The archive.
+    channels : iterable of str
+        The channel identifiers used to filter the files.
+
+    Returns:
+    --------
+    dict
+        Mapping from every channel to a mapping from shot number to member name, sorted by shot number.
+
+    Notes:
+    ------
+    - Members are selected on their file name as in 'load.list_channel_files': the channel is the part
+      before the first "-", background files ("BG") are excluded and the shot number ends the name.
+    """
+
+    files = {channel: {} for channel in channels}
+    for name in member_names(path):
+        base = os.path.basename(name)
+        channel = base.split("-")[0]
+        if channel not in files or "BG" in base:
+            continue
+        try:
+            files[channel][int(base.split("--")[-1].split(".")[0])] = name
+        except ValueError:
+            print(f"Error: No shot number in the file name '{name}'.")
+    return {channel: dict(sorted(f.items())) for channel, f in files.items()}
+
+
+def read_members(path, members):
+    """
+    Reads members of an archive sequentially, in archive order, without extracting them.
+
+    Parameters:
+    -----------
+    path : str or Path
+        The archive.
+    members : iterable of str
+        The names of the members to read; the other members are skipped.
+
+    Yields:
+    -------
+    tuple
+        (name, content) with the content of the member as bytes.
+
+    Notes:
+    ------
+    - A tar is read as a stream, so the archive is decompressed once from its start up to the last member wanted.
+    - Zip members are read in the order of their offsets, i.e. sequentially on disk.
+    """
+
+    wanted = set(members)
+    path = str(path)
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            infos = sorted(
+                (i for i in archive.infolist() if i.filename in wanted),
+                key=lambda i: i.header_offset,
+            )
+            for info in infos:
+                yield info.filename, archive.read(info)
+        return
+    with tarfile.open(path, "r|*") as archive:
+        for info in archive:
+            if info.isfile() and info.name in wanted:
+                yield info.name, archive.extractfile(info).read()
+                wanted.discard(info.name)
+                if not wanted:
+                    return
@@ -0,0 +1,373 @@
+import json
+import numbers
+import os
+import shutil
+from pathlib import Path
+from functools import wraps
+
+
+# Environment variables overriding the cache location and the global budget (bytes, or e.g. "20G")
+ENV_VAR = "E_FISH_CACHE_DIR"
+BUDGET_VAR = "E_FISH_CACHE_BUDGET"
+DEFAULT_BUDGET = "10G"
+
+_root = None
+_budget = None
+_stores = {}
+
+
+def default_dir() -> Path:
+    """
+    Returns the per-user cache directory of the platform, e.g. '%LOCALAPPDATA%\\e_fish\\cache' on Windows
+    and '~/.cache/e_fish' elsewhere.
+    """
+
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        return Path(os.environ["LOCALAPPDATA"]) / "e_fish" / "cache"
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "e_fish"
+
+
+def cache_dir() -> Path:
+    """
+    Returns the root of the caches: the directory given to 'set_cache_dir', else the 'E_FISH_CACHE_DIR'
+    environment variable, else 'default_dir()'.
+
+    Notes:
+    ------
+    - Nothing is created here; the directory of a store is only created when the store is first used.
+    """
+
+    if _root is not None:
+        return _root
+    if os.environ.get(ENV_VAR):
+        return Path(os.environ[ENV_VAR])
+    return default_dir()
+
+
+def set_cache_dir(path: str | Path | None):
+    """
+    Sets the root of the caches for the current process; None restores the default.
+
+    Notes:
+    ------
+    - Functions already memoized write to the new location from their next call on.
+    """
+
+    global _root
+    _root = None if path is None else Path(path)
+
+
+def parse_size(size: str | int) -> int:
+    """
+    Converts a size such as 500M, 20G or 1.5T (powers of 1024) into bytes.
+    """
+
+    if isinstance(size, numbers.Real):
+        return int(size)
+    size = size.strip().upper().removesuffix("B")
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(float(size))
+
+
+def budget() -> int:
+    """
+    Returns the global byte budget of the caches: the value given to 'set_budget', else the
+    'E_FISH_CACHE_BUDGET' environment variable, else 'DEFAULT_BUDGET'.
+    """
+
+    if _budget is not None:
+        return _budget
+    return parse_size(os.environ.get(BUDGET_VAR) or DEFAULT_BUDGET)
+
+
+def set_budget(size: str | int | None):
+    """
+    Sets the global byte budget of the caches for the current process; None restores the default.
+    """
+
+    global _budget
+    _budget = None if size is None else parse_size(size)
+
+
+def memory(name: str):
+    """
+    Returns the joblib Memory store of a stage, created on first use under 'cache_dir() / name'.
+    """
+
+    location = cache_dir() / name
+    if ("memory", location) not in _stores:
+        import joblib
+
+        os.makedirs(location, exist_ok=True)
+        # joblib only adds its 'joblib' subfolder, where '_joblib_entries' looks, for a str location
+        _stores["memory", location] = joblib.Memory(location=str(location), verbose=0)
+    return _stores["memory", location]
+
+
+def disk_cache(name: str):
+    """
+    Returns the diskcache Cache of a stage, created on first use under 'cache_dir() / name'.
+
+    Notes:
+    ------
+    - The cache evicts its least recently used items once it holds more than the global budget;
+      'prune' also shrinks it when the stores together exceed the budget.
+    """
+
+    location = cache_dir() / name
+    if ("disk", location) not in _stores:
+        from diskcache import Cache
+
+        os.makedirs(location, exist_ok=True)
+        _stores["disk", location] = Cache(
+            location, size_limit=budget(), eviction_policy="least-recently-used"
+        )
+    return _stores["disk", location]
+
+
+def _counters_path() -> Path:
+    return cache_dir() / "counters.json"
+
+
+def _read_counters() -> dict:
+    try:
+        with open(_counters_path()) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _record(name: str, hit: bool):
+    """
+    Adds a hit or a miss to the counters of a store, kept in 'counters.json' so they add up across runs.
+    """
+
+    counters = _read_counters()
+    store = counters.setdefault(name, {"hits": 0, "misses": 0})
+    store["hits" if hit else "misses"] += 1
+    path = _counters_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(f"{path}.{os.getpid()}", "w") as f:
+        json.dump(counters, f)
+    os.replace(f"{path}.{os.getpid()}", path)
+
+
+def memoize(name: str):
+    """
+    Decorator caching a function on disk with joblib, in the store 'name'.
+
+    Unlike '@joblib.Memory(...).cache', neither joblib nor the store directory is touched before the first call.
+    Every call is counted as a hit or a miss of the store, and a miss is followed by 'prune' so the caches
+    stay within the global budget.
+
+    Parameters:
+    -----------
+    name : str
+        The name of the store, e.g. "avg" for 'load.bkgd_template'.
+    """
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            store = memory(name)
+            if (store, function) not in _stores:
+                _stores[store, function] = store.cache(function)
+            cached = _stores[store, function]
+            hit = cached.check_call_in_cache(*args, **kwargs)
+            result = cached(*args, **kwargs)
+            _record(name, hit)
+            if not hit:
+                prune()
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _size(path: Path) -> int:
+    return sum(i.stat().st_size for i in path.rglob("*") if i.is_file())
+
+
+def _stores_on_disk() -> dict:
+    """
+    Finds the stores under 'cache_dir()': diskcache stores hold a 'cache.db', joblib stores a 'joblib' folder,
+    or directly the 'output.pkl' tree of their results for stores written with a Path location.
+    """
+
+    root = cache_dir()
+    if not root.is_dir():
+        return {}
+    stores = {}
+    for path in sorted(root.iterdir()):
+        if (path / "cache.db").exists():
+            stores[path.name] = "diskcache"
+        elif (path / "joblib").is_dir() or next(path.rglob("output.pkl"), None):
+            stores[path.name] = "joblib"
+    return stores
+
+
+def _joblib_entries(name: str) -> list:
+    """
+    Lists the results of a joblib store as (last access, bytes, folder, arguments) tuples,
+    the arguments being the repr of the call arguments saved by joblib.
+    """
+
+    store = cache_dir() / name
+    if (store / "joblib").is_dir():
+        store = store / "joblib"
+    entries = []
+    for output in store.rglob("output.pkl"):
+        folder = output.parent
+        stat = output.stat()
+        try:
+            with open(folder / "metadata.json") as f:
+                arguments = " ".join(json.load(f).get("input_args", {}).values())
+        except (FileNotFoundError, json.JSONDecodeError):
+            arguments = ""
+        # As joblib's own 'reduce_size', the access time of the output tells when it was last loaded
+        entries.append(
+            (max(stat.st_atime, stat.st_mtime), _size(folder), folder, arguments)
+        )
+    return entries
+
+
+def _disk_cache_at(name: str):
+    from diskcache import Cache
+
+    disk = _stores.get(("disk", cache_dir() / name))
+    return Cache(cache_dir() / name) if disk is None else disk
+
+
+def info():
+    """
+    Reports the size, the number of entries and the hit rate of every store.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per store with the columns 'store', 'kind', 'entries', 'bytes', 'hits', 'misses' and 'hit_rate'.
+    """
+
+    import pandas as pd
+
+    counters = _read_counters()
+    rows = []
+    for name, kind in _stores_on_disk().items():
+        if kind == "joblib":
+            entries = _joblib_entries(name)
+            n_entries, n_bytes = len(entries), sum(i[1] for i in entries)
+        else:
+            disk = _disk_cache_at(name)
+            n_entries, n_bytes = len(disk), disk.volume()
+        hits = counters.get(name, {}).get("hits", 0)
+        misses = counters.get(name, {}).get("misses", 0)
+        rows.append(
+            {
+                "store": name,
+                "kind": kind,
+                "entries": n_entries,
+                "bytes": n_bytes,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else float("nan"),
+            }
+        )
+    return pd.DataFrame(
+        rows, columns=["store", "kind", "entries", "bytes", "hits", "misses", "hit_rate"]
+    )
+
+
+def prune(size: str | int | None = None) -> int:
+    """
+    Evicts the least recently used results of all stores until they hold at most the budget.
+
+    Parameters:
+    -----------
+    size : str or int, optional
+        The budget in bytes (or e.g. "5G"), default is 'budget()'.
+
+    Returns:
+    --------
+    int
+        The number of bytes freed.
+
+    Notes:
+    ------
+    - The joblib results of all stores are evicted together, oldest access first. If the diskcache stores alone
+      exceed the budget, they are then culled by their own least-recently-used policy.
+    """
+
+    limit = budget() if size is None else parse_size(size)
+    stores = _stores_on_disk()
+    entries = sorted(
+        i for name, kind in stores.items() if kind == "joblib" for i in _joblib_entries(name)
+    )
+    disks = {name: _disk_cache_at(name) for name, kind in stores.items() if kind == "diskcache"}
+    total = sum(i[1] for i in entries) + sum(i.volume() for i in disks.values())
+    start = total
+
+    for _, n_bytes, folder, _ in entries:
+        if total <= limit:
+            break
+        shutil.rmtree(folder, ignore_errors=True)
+        total -= n_bytes
+
+    if total > limit and disks:
+        volume = sum(i.volume() for i in disks.values())
+        share = max(limit - (total - volume), 0) / volume
+        for disk in disks.values():
+            before = disk.volume()
+            disk.reset("size_limit", int(before * share))
+            disk.cull()
+            disk.reset("size_limit", max(limit, 1))
+            total -= before - disk.volume()
+    return start - total
+
+
+def invalidate(folder: str) -> int:
+    """
+    Removes the cached results computed from a data folder, in every store.
+
+    Parameters:
+    -----------
+    folder : str
+        The folder as passed to the cached functions, e.g. "2024_05_16\\pos2_27kV\\pos2_27kV".
+        A result is removed if one of its arguments mentions the folder.
+
+    Returns:
+    --------
+    int
+        The number of results removed.
+    """
+
+    needles = {folder, repr(folder)[1:-1]}  # as written and as escaped in the joblib metadata
+    removed = 0
+    for name, kind in _stores_on_disk().items():
+        if kind == "joblib":
+            for _, _, path, arguments in _joblib_entries(name):
+                if any(i in arguments for i in needles):
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+        else:
+            disk = _disk_cache_at(name)
+            for key in list(disk.iterkeys()):
+                if any(i in str(key) for i in needles) and disk.delete(key):
+                    removed += 1
+    return removed
+
+
+def clear(name: str | None = None):
+    """
+    Removes a store, or every store and the counters if no name is given.
+    """
+
+    root = cache_dir()
+    for store in [name] if name else list(_stores_on_disk()):
+        shutil.rmtree(root / store, ignore_errors=True)
+    if name is None:
+        _counters_path().unlink(missing_ok=True)
+    _stores.clear()
+    return print(f"Cache cleared at {root}{'' if name is None else f' ({name})'}")
@@ -0,0 +1,107 @@
+import argparse
+import tomllib
+from . import cache
+
+
+def read_config(path: str, overrides: list | None = None) -> dict:
+    """
+    Reads the parameters of a run from a TOML file.
+
+    Parameters:
+    -----------
+    path : str
+        The TOML file, with the keys of 'pipeline.DEFAULTS' at the top level.
+    overrides : list of str, optional
+        "key=value" pairs replacing values of the file; values are parsed as TOML, else kept as strings.
+
+    Returns:
+    --------
+    dict
+        The parameters.
+    """
+
+    with open(path, "rb") as f:
+        config = tomllib.load(f)
+    for override in overrides or []:
+        key, _, value = override.partition("=")
+        try:
+            config[key.strip()] = tomllib.loads(f"value = {value}")["value"]
+        except tomllib.TOMLDecodeError:
+            config[key.strip()] = value
+    return config
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="e_fish", description="E-FISH data analysis pipeline"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser(
+        "run", help="run the pipeline, resuming from the last valid checkpoints"
+    )
+    run.add_argument("config", help="TOML file with the parameters of the run")
+    run.add_argument(
+        "--set", action="append", metavar="KEY=VALUE", help="override a parameter of the file"
+    )
+    run.add_argument(
+        "--force", nargs="+", default=(), metavar="STAGE", help="rerun these stages and the ones after"
+    )
+    run.add_argument("--until", metavar="STAGE", help="stop after this stage")
+    run.add_argument(
+        "--parallel",
+        action="store_true",
+        default=None,
+        help="run independent stages concurrently and report the critical path",
+    )
+
+    status = commands.add_parser("status", help="show which stages have a valid checkpoint")
+    status.add_argument("config", help="TOML file with the parameters of the run")
+    status.add_argument(
+        "--set", action="append", metavar="KEY=VALUE", help="override a parameter of the file"
+    )
+
+    store = commands.add_parser("cache", help="inspect, prune or invalidate the caches")
+    actions = store.add_subparsers(dest="action", required=True)
+    actions.add_parser("info", help="size, entries and hit rate of every store")
+    prune = actions.add_parser("prune", help="evict least recently used results")
+    prune.add_argument("--budget", help="size to prune to, e.g. 5G (default: the global budget)")
+    invalidate = actions.add_parser("invalidate", help="remove the results computed from a folder")
+    invalidate.add_argument("folder", help="data folder, as in the 'data_path' parameter")
+    clear = actions.add_parser("clear", help="remove a store, or all of them")
+    clear.add_argument("store", nargs="?", help="name of the store, default is every store")
+    return parser
+
+
+def cache_command(args):
+    print(f"Cache directory: {cache.cache_dir()} (budget {cache.budget() / 1024**3:.1f} GiB)")
+    if args.action == "info":
+        print(cache.info().to_string(index=False))
+    elif args.action == "prune":
+        print(f"{cache.prune(args.budget) / 1024**2:.1f} MiB freed")
+    elif args.action == "invalidate":
+        print(f"{cache.invalidate(args.folder)} cached results removed")
+    elif args.action == "clear":
+        cache.clear(args.store)
+
+
+def main(argv: list | None = None):
+    """
+    Entry point of the 'e_fish' command.
+    """
+
+    args = parser().parse_args(argv)
+    if args.command == "cache":
+        return cache_command(args)
+    # The pipeline modules are only imported for the commands that need them
+    from . import pipeline
+
+    config = read_config(args.config, args.set)
+    if args.command == "run":
+        pipeline.run(config, force=tuple(args.force), until=args.until, parallel=args.parallel)
+    elif args.command == "status":
+        print(pipeline.status(config).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+
+def _minmax_2d(time: np.ndarray, values: np.ndarray, bucket: int):
+    """
+    Keeps the minimum and the maximum of every bucket of 'bucket' samples along the last axis, in time order.
+    """
+
+    n_shots, n = values.shape
+    n_buckets = -(-n // bucket)
+    pad = n_buckets * bucket - n
+    if pad:
+        time = np.pad(time, ((0, 0), (0, pad)), constant_values=np.nan)
+        values = np.pad(values, ((0, 0), (0, pad)), constant_values=np.nan)
+    blocks = values.reshape(n_shots, n_buckets, bucket)
+    missing = np.isnan(blocks)
+    i_min = np.where(missing, np.inf, blocks).argmin(axis=2)
+    i_max = np.where(missing, -np.inf, blocks).argmax(axis=2)
+
+    # Keep both extrema of a bucket in their original order so the line shape is preserved
+    first = np.minimum(i_min, i_max)
+    second = np.maximum(i_min, i_max)
+    base = np.arange(n_buckets) * bucket
+    index = np.stack([first + base, second + base], axis=2).reshape(n_shots, -1)
+    return (
+        np.take_along_axis(time, index, axis=1),
+        np.take_along_axis(values, index, axis=1),
+    )
+
+
+def minmax(x: np.ndarray, y: np.ndarray, max_points: int):
+    """
+    Decimates a line to at most 'max_points' points, keeping the minimum and maximum of every bucket.
+
+    Parameters:
+    -----------
+    x : np.ndarray
+        The abscissa, sorted.
+    y : np.ndarray
+        The values.
+    max_points : int
+        The maximum number of points returned.
+
+    Returns:
+    --------
+    tuple
+        The decimated (x, y) arrays; the input arrays if they already have at most 'max_points' points.
+
+    Notes:
+    ------
+    - Peaks are never lost, since the extrema of every bucket are kept.
+    """
+
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(y) <= max_points:
+        return x, y
+    bucket = -(-2 * len(y) // max_points)
+    x, y = _minmax_2d(x[np.newaxis].astype(float), y[np.newaxis].astype(float), bucket)
+    return x[0], y[0]
+
+
+class Pyramid:
+    """
+    Multi-resolution min/max representation of the waveforms of one channel.
+
+    Level 0 holds the raw samples, level k the minimum and maximum of every bucket of 2**k samples.
+    'view' picks the finest level whose samples in the requested time window fit the point budget.
+
+    Parameters:
+    -----------
+    time : np.ndarray
+        The time of every sample, with shape (shots, samples) or (samples,). Shorter shots are padded with NaN.
+    values : np.ndarray
+        The values, with the same shape as 'time'.
+    min_points : int, optional
+        Levels are built until a level has fewer samples per shot than this value, default is 64.
+    """
+
+    def __init__(self, time: np.ndarray, values: np.ndarray, min_points: int = 64):
+        time = np.atleast_2d(np.asarray(time, dtype=float))
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        self.levels = [(time, values)]
+        self.shots = np.arange(len(values))
+        bucket = 2
+        while 2 * values.shape[1] / bucket >= min_points:
+            self.levels.append(_minmax_2d(time, values, bucket))
+            bucket *= 2
+
+    @classmethod
+    def from_frame(
+        cls, df: pd.DataFrame, column: str = "amplitude", time_column: str = "time", **kwargs
+    ) -> "Pyramid":
+        """
+        Builds the pyramid of one column of a DataFrame with a 'file_number' column, one row per shot.
+
+        Returns:
+        --------
+        Pyramid
+            The pyramid, with the shots in the order of their file numbers (see 'shots').
+        """
+
+        df = df.sort_values(["file_number", time_column], kind="stable")
+        shots, position = np.unique(df.file_number.values, return_inverse=True)
+        sample = df.groupby("file_number").cumcount().values
+        time = np.full((len(shots), sample.max() + 1), np.nan)
+        values = np.full_like(time, np.nan)
+        time[position, sample] = df[time_column].values
+        values[position, sample] = df[column].values
+        pyramid = cls(time, values, **kwargs)
+        pyramid.shots = shots
+        return pyramid
+
+    def view(self, t_min: float | None = None, t_max: float | None = None, max_points: int = 20000):
+        """
+        Returns the waveforms in a time window at the finest level with at most 'max_points' points in total.
+
+        Parameters:
+        -----------
+        t_min, t_max : float, optional
+            The bounds of the time window, default is the whole record.
+        max_points : int, optional
+            The maximum number of points over all shots, default is 20000.
+
+        Returns:
+        --------
+        tuple
+            (time, values) arrays of shape (shots, points), NaN outside the window, ready for 'ax.plot(time.T, values.T)'.
+        """
+
+        t_min = -np.inf if t_min is None else t_min
+        t_max = np.inf if t_max is None else t_max
+        for time, values in self.levels:
+            inside = (time >= t_min) & (time <= t_max)
+            if inside.sum() <= max_points:
+                break
+        columns = inside.any(axis=0)
+        return (
+            np.where(inside, time, np.nan)[:, columns],
+            np.where(inside, values, np.nan)[:, columns],
+        )
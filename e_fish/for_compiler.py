@@ -1,9 +1,11 @@
+import asyncio
 import subprocess
 import os
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import re
-from . import signals
+from . import signals, shm
 from concurrent.futures import ProcessPoolExecutor
 
 
@@ -11,6 +13,11 @@ folder = Path(__file__).parent.parent
 input_folder = Path(__file__).parent.parent.parent / Path("data")
 module = "shg.f90"
 code = "second_harmonic_generation.f90"
+# Mimics the header generated by the oscilloscope
+header_text = "LECROYWR625Zi;61392;Waveform\nSegments;1;SegmentSize;2002\nSegment;TrigTime;TimeSinceSegment1\n#1date;0"
+
+# Student coefficients read by the SSC, looked up in the folder written on the first line of its input file
+student_table = "t_student.dat"
 
 
 def write_input(
@@ -94,7 +101,231 @@ def write_input(
     return print(f"Content written to {str(input_folder/Path(input_path))}")
 
 
-def compile_shg(path_folder: str):
+# gfortran flags of the build profiles: "reference" is the original quadruple-precision build,
+# "performance" switches the 'wp' kind of shg.f90/ssc.f90 to double precision and turns off diagnostic printing,
+# "openmp" is the performance build with the oscillogram loops of second_harmonic_generation.f90 run in parallel
+PROFILES = {
+    "reference": ["-cpp"],
+    "performance": ["-cpp", "-DDOUBLE", "-O3", "-march=native", "-DVERBOSITY=0"],
+    "openmp": ["-cpp", "-fopenmp", "-DDOUBLE", "-O3", "-march=native", "-DVERBOSITY=0"],
+}
+
+
+def build_fortran(
+    path_folder: str,
+    module: str,
+    code: str,
+    executable: str,
+    profile: str = "reference",
+    verbosity: int | None = None,
+    defines: tuple = (),
+) -> Path:
+    """
+    Compiles a Fortran program with the flags of a build profile.
+
+    Parameters:
+    -----------
+    path_folder : str
+        Path to the folder containing the FORTRAN source files, relative to the repository.
+    module, code : str
+        The module and program source files.
+    executable : str
+        The name of the executable; builds other than "reference" get the profile name as suffix.
+    profile : str, optional
+        A key of 'PROFILES', default is "reference".
+    verbosity : int, optional
+        Diagnostic printing of the program: 0 none, 1 start and end of the run, 2 every shot, row or bin.
+        Default is the one of the profile.
+    defines : tuple of str, optional
+        Extra preprocessor macros, e.g. ("CORRECTED",) for inputs whose baseline offset is already subtracted
+        (see 'shg.f90'). Every macro adds its lower-case name as suffix of the executable.
+
+    Returns:
+    --------
+    Path
+        The path of the executable.
+
+    Exceptions:
+    -----------
+    subprocess.CalledProcessError
+        Raised if the compilation fails.
+    """
+
+    compile_command, output = build_command(
+        path_folder, module, code, executable, profile, verbosity, defines
+    )
+    subprocess.run(compile_command, shell=True, check=True)
+    return output
+
+
+def executable_path(
+    path_folder: str, executable: str, profile: str = "reference", defines: tuple = ()
+) -> Path:
+    """
+    Returns the path of the executable built by 'build_fortran' with a build profile and preprocessor macros.
+    """
+
+    source = folder / Path(path_folder)
+    name = executable if profile == "reference" else f"{executable}_{profile}"
+    return source / "".join([name] + [f"_{i.lower()}" for i in defines])
+
+
+def build_command(
+    path_folder: str,
+    module: str,
+    code: str,
+    executable: str,
+    profile: str = "reference",
+    verbosity: int | None = None,
+    defines: tuple = (),
+) -> tuple:
+    """
+    Returns the gfortran command of 'build_fortran' and the path of the executable it builds.
+    """
+
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown build profile: {profile}")
+    source = folder / Path(path_folder)
+    flags = PROFILES[profile] + ([] if verbosity is None else [f"-DVERBOSITY={verbosity}"])
+    flags += [f"-D{i}" for i in defines]
+    output = executable_path(path_folder, executable, profile, defines)
+    compile_command = (
+        f'gfortran {" ".join(flags)} -J "{source}" "{source / module}" "{source / code}" -o "{output}"'
+    )
+    return compile_command, output
+
+
+def _file_arguments(*files) -> list:
+    """
+    Returns the leading file arguments that are given: the programs read them by position.
+    """
+
+    given = []
+    for i in files:
+        if i is None:
+            break
+        given.append(str(i))
+    return given
+
+
+def fortran_command(executable: Path, *args) -> str:
+    """
+    Builds the command running a Fortran executable with optional file arguments.
+    """
+
+    return " ".join([f'"{executable}"'] + [f'"{i}"' for i in args if i is not None])
+
+
+async def run_command(command: str, env: dict | None = None) -> str:
+    """
+    Runs a shell command as an asyncio subprocess, so that the event loop keeps scheduling other work meanwhile.
+
+    Parameters:
+    -----------
+    command : str
+        The command, e.g. from 'build_command' or 'fortran_command'.
+    env : dict, optional
+        The environment of the command, default is the one of the current process.
+
+    Returns:
+    --------
+    str
+        The standard output of the command.
+
+    Side Effects:
+    -------------
+    - Prints the standard output and error output if the command fails.
+
+    Exceptions:
+    -----------
+    subprocess.CalledProcessError
+        Raised if the command exits with a non-zero return code.
+
+    Notes:
+    ------
+    - The output is captured rather than streamed, so that commands running side by side do not interleave.
+    """
+
+    process = await asyncio.create_subprocess_shell(
+        command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, env=env
+    )
+    stdout, stderr = await process.communicate()
+    stdout, stderr = stdout.decode(errors="replace"), stderr.decode(errors="replace")
+    if process.returncode:
+        print("Error occurred:")
+        print("Return Code:", process.returncode)
+        print("Standard Output:", stdout)
+        print("Error Output:", stderr)
+        raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+    return stdout
+
+
+async def build_fortran_async(
+    path_folder: str,
+    module: str,
+    code: str,
+    executable: str,
+    profile: str = "reference",
+    verbosity: int | None = None,
+    defines: tuple = (),
+) -> Path:
+    """
+    Same as 'build_fortran', with gfortran run as an asyncio subprocess.
+    """
+
+    compile_command, output = build_command(
+        path_folder, module, code, executable, profile, verbosity, defines
+    )
+    await run_command(compile_command)
+    return output
+
+
+async def run_fortran_async(
+    executable: Path,
+    input_file: str | None = None,
+    output_file: str | None = None,
+    threads: int | None = None,
+    student_file: str | None = None,
+) -> str:
+    """
+    Runs an executable built by 'build_fortran' as an asyncio subprocess.
+
+    Parameters:
+    -----------
+    executable : Path
+        The executable.
+    input_file, output_file : str, optional
+        Input and output files of the program, default are the paths written in its source.
+    threads : int, optional
+        Number of OpenMP threads of an "openmp" build (OMP_NUM_THREADS), default is the number of cores.
+    student_file : str, optional
+        Student table of the SSC, relative to the folder of its input, see 'student_table'. Only passed
+        after both 'input_file' and 'output_file'.
+
+    Returns:
+    --------
+    str
+        The standard output of the program, also printed.
+    """
+
+    env = None if threads is None else os.environ | {"OMP_NUM_THREADS": str(threads)}
+    stdout = await run_command(
+        fortran_command(executable, *_file_arguments(input_file, output_file, student_file)),
+        env=env,
+    )
+    print("Standard Output:", stdout)
+    return stdout
+
+
+def compile_shg(
+    path_folder: str,
+    profile: str = "reference",
+    verbosity: int | None = None,
+    input_file: str | None = None,
+    output_file: str | None = None,
+    threads: int | None = None,
+    defines: tuple = (),
+):
     """
     Compiles and executes a FORTRAN code for second harmonic generation.
 
@@ -102,6 +333,16 @@ def compile_shg(path_folder: str):
     -----------
     path_folder : str
         Path to the folder containing the FORTRAN source files.
+    profile : str, optional
+        Build profile, see 'PROFILES'. Default is "reference", the original quadruple-precision build.
+    verbosity : int, optional
+        Diagnostic printing of the program, see 'build_fortran'.
+    input_file, output_file : str, optional
+        Input and output files of the program, default are the paths written in 'second_harmonic_generation.f90'.
+    threads : int, optional
+        Number of OpenMP threads of the "openmp" build (OMP_NUM_THREADS), default is the number of cores.
+    defines : tuple of str, optional
+        Extra preprocessor macros, see 'build_fortran'.
 
     Returns:
     --------
@@ -118,13 +359,16 @@ def compile_shg(path_folder: str):
     subprocess.CalledProcessError
         Raised if the compilation or execution fails.
     """
-    compile_command = f"gfortran {str(folder/Path(path_folder))}\\{module} {str(folder/Path(path_folder))}\\{code} -o {str(folder/Path(path_folder))}\\second_harmonic_generation"
-    subprocess.run(compile_command, shell=True, check=True)
+    executable = build_fortran(
+        path_folder, module, code, "second_harmonic_generation", profile, verbosity, defines
+    )
     # Execute the compiled Fortran program
-    execute_command = f"{str(folder/Path(path_folder))}\\second_harmonic_generation"
+    execute_command = fortran_command(executable, *_file_arguments(input_file, output_file))
+
+    env = None if threads is None else os.environ | {"OMP_NUM_THREADS": str(threads)}
 
     try:
-        result = subprocess.run(execute_command, shell=True, check=True)
+        result = subprocess.run(execute_command, shell=True, check=True, env=env)
         print("Standard Output:", result.stdout)
     except subprocess.CalledProcessError as e:
         print("Error occurred:")
@@ -132,7 +376,7 @@ def compile_shg(path_folder: str):
         print("Standard Output:", e.stdout)
         print("Error Output:", e.stderr)
         result = subprocess.run(
-            execute_command, shell=True, check=True, capture_output=True, text=True
+            execute_command, shell=True, check=True, capture_output=True, text=True, env=env
         )
     return print("Standard Output:", result.stdout)
 
@@ -211,8 +455,9 @@ def write_single_file(file_info):
     file_info : tuple
         A tuple containing the following elements:
         - file_number : int.
-        - group : pd.DataFrame
-            A DataFrame containing the data to be written to the file, expected to have "time" and "amplitude" columns.
+        - group : pd.DataFrame or dict
+            A DataFrame containing the data to be written to the file, expected to have "time" and "amplitude" columns,
+            or the 'shm' descriptors of these columns for the rows of the shot.
         - base_path : Path
             The base path where the file will be saved.
         - static_part1 : str
@@ -234,6 +479,8 @@ def write_single_file(file_info):
     """
 
     file_number, group, base_path, static_part1, static_part2, header_text = file_info
+    if isinstance(group, dict):
+        group = pd.DataFrame({name: shm.view(d) for name, d in group.items()}, copy=False)
     file_path = base_path / f"{static_part1}{static_part2}{file_number}.txt"
 
     file_path.parent.mkdir(parents=True, exist_ok=True)  # Ensure directory exists
@@ -245,11 +492,55 @@ def write_single_file(file_info):
         print(f"Warning: Data for file {file_path} is empty.")
     else:
         group[["time", "amplitude"]].to_csv(file_path, sep=";", index=False, mode="a") #append mode
+    return str(file_path)
+
+
+def file_parts(channel: str, pos_path: str) -> tuple:
+    """
+    Returns the folder and the two static parts of the names of the files written for a channel,
+    e.g. 'C11--20240516_Air150mbar_' and '27kV--' for "2024_05_16\\pos2_27kV\\pos2_27kV".
+    """
+
+    pos_path_parts = pos_path.split("\\")
+    base_path = Path(input_folder) / Path(pos_path)
+    static_part1 = (
+        f"{channel}--{int(''.join(pos_path_parts[0].split('_')))}_Air150mbar_"
+    )
+    static_part2 = f"{int(pos_path_parts[1].split('_')[1].split('k')[0])}kV--"
+    return base_path, static_part1, static_part2
+
+
+def write_shot(df: pd.DataFrame, channel: str, pos_path: str, total_length: int = 5):
+    """
+    Writes the file of a single shot under its final zero-padded name, as 'write_files' followed by
+    'add_leading_zeros' would, without a renaming pass.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        The samples of one shot with the columns 'file_number', 'time' and 'amplitude'.
+    channel : str
+        The channel identifier.
+    pos_path : str
+        The relative path where the file will be saved.
+    total_length : int, optional
+        Number of digits of the shot number in the file name, default is 5.
+
+    Returns:
+    --------
+    str
+        The path of the written file.
+    """
+
+    base_path, static_part1, static_part2 = file_parts(channel, pos_path)
+    file_number = str(int(df.file_number.iloc[0])).zfill(total_length)
+    return write_single_file((file_number, df, base_path, static_part1, static_part2, header_text))
 
 
 def write_files(df: pd.DataFrame, channel: str, pos_path: str, fmt: str = ".txt"):
     """
     Writes multiple files based on the input DataFrame, using multiprocessing to speed up the file writing process.
+    The columns are shared with the worker processes through 'shm' instead of pickling a DataFrame per shot.
 
     Parameters:
     -----------
@@ -262,9 +553,15 @@ def write_files(df: pd.DataFrame, channel: str, pos_path: str, fmt: str = ".txt"
     fmt : str, optional
         The file extension for the output files, default is ".txt".
 
+    Returns:
+    --------
+    list of str
+        The paths of the written files, under their final zero-padded names.
+
     Side Effects:
     -------------
     - Creates the necessary directories for saving the files.
+    - Publishes the 'time' and 'amplitude' columns in shared memory for the duration of the call.
     - Writes data for each file into separate files using multiprocessing.
     - Appends the 'time' and 'amplitude' columns from the DataFrame to the output files.
     - Calls the 'add_leading_zeros' function to standardize the filenames.
@@ -275,28 +572,48 @@ def write_files(df: pd.DataFrame, channel: str, pos_path: str, fmt: str = ".txt"
     - The file paths are constructed based on the 'channel', 'pos_path', and 'file_number'.
     """
 
-    # Mimics the header generated by the oscilloscope
-    header_text = "LECROYWR625Zi;61392;Waveform\nSegments;1;SegmentSize;2002\nSegment;TrigTime;TimeSinceSegment1\n#1date;0"
-
-    pos_path_parts = pos_path.split("\\")
-    base_path = Path(input_folder) / Path(pos_path)
-    static_part1 = (
-        f"{channel}--{int(''.join(pos_path_parts[0].split('_')))}_Air150mbar_"
-    )
-    static_part2 = f"{int(pos_path_parts[1].split('_')[1].split('k')[0])}kV--"
-
-    # Prepare the data for multiprocessing
-    file_groups = [
-        (file_number, group, base_path, static_part1, static_part2, header_text)
-        for file_number, group in df.groupby("file_number")
-    ]
-
-    with ProcessPoolExecutor() as executor:
-        executor.map(write_single_file, file_groups)
+    base_path, static_part1, static_part2 = file_parts(channel, pos_path)
+
+    # Rows of every shot in a frame sorted by shot, as the groups of 'df.groupby("file_number")'
+    if not df.file_number.is_monotonic_increasing:
+        df = df.sort_values("file_number", kind="stable")
+    shots, starts = np.unique(df.file_number.to_numpy(), return_index=True)
+    stops = np.append(starts[1:], len(df))
+
+    with shm.session() as blocks:
+        # The columns are published once; every task only carries their descriptors and the rows of its shot
+        columns = {name: shm.publish(df[name].to_numpy(), blocks) for name in ("time", "amplitude")}
+        file_groups = [
+            (
+                int(file_number),
+                {
+                    name: shm.rows(d, start, stop, (int(file_number),) * 2)
+                    for name, d in columns.items()
+                },
+                base_path,
+                static_part1,
+                static_part2,
+                header_text,
+            )
+            for file_number, start, stop in zip(shots, starts, stops)
+        ]
+
+        workers = os.cpu_count() or 1
+        with ProcessPoolExecutor() as executor:
+            list(
+                executor.map(
+                    write_single_file,
+                    file_groups,
+                    chunksize=max(1, len(file_groups) // (4 * workers)),
+                )
+            )
 
     # Add leading zeros to the file names
     add_leading_zeros(pos_path=pos_path, channel=channel, fmt=fmt)
     print(f"Files written for channel {channel} at {base_path}")
+    return [
+        str(base_path / f"{static_part1}{static_part2}{str(int(i)).zfill(5)}{fmt}") for i in shots
+    ]
 
 
 def write_shg_for_ssc(path_to_read: str, path_to_write: str):
@@ -382,6 +699,11 @@ def compile_ssc(
     path_folder: str = "FORTRAN",
     module: str = "ssc.f90",
     code: str = "stud_stat_calc.f90",
+    profile: str = "reference",
+    verbosity: int | None = None,
+    input_file: str | None = None,
+    output_file: str | None = None,
+    student_file: str | None = None,
 ):
     """
     Compiles and executes the Fortran code for the SSC (Student Statistic Code) calculation.
@@ -394,6 +716,15 @@ def compile_ssc(
         The name of the Fortran module file to be compiled, default is "ssc.f90".
     code : str, optional
         The name of the Fortran code file to be compiled, default is "stud_stat_calc.f90".
+    profile : str, optional
+        Build profile, see 'PROFILES'. Default is "reference", the original quadruple-precision build.
+    verbosity : int, optional
+        Diagnostic printing of the program, see 'build_fortran'.
+    input_file, output_file : str, optional
+        Input and output files of the program, default are the paths written in 'stud_stat_calc.f90'.
+    student_file : str, optional
+        Student table, relative to the folder of the input, see 'student_table'. Only passed after both
+        'input_file' and 'output_file'.
 
     Side Effects:
     -------------
@@ -407,10 +738,11 @@ def compile_ssc(
     - Any errors during the compilation or execution will be printed along with the error details.
     """
 
-    compile_command = f"gfortran {str(folder/Path(path_folder))}\\{module} {str(folder/Path(path_folder))}\\{code} -o {str(folder/Path(path_folder))}\\stud_stat_calc"
-    subprocess.run(compile_command, shell=True, check=True)
+    executable = build_fortran(path_folder, module, code, "stud_stat_calc", profile, verbosity)
     # Execute the compiled Fortran program
-    execute_command = f"{str(folder/Path(path_folder))}\\stud_stat_calc"
+    execute_command = fortran_command(
+        executable, *_file_arguments(input_file, output_file, student_file)
+    )
 
     try:
         result = subprocess.run(
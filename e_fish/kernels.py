@@ -0,0 +1,90 @@
+import importlib.util
+from functools import cache
+import numpy as np
+
+
+# Backend used when a kernel is called without 'backend': "numba" if it is installed, else "numpy"
+BACKEND = "numba" if importlib.util.find_spec("numba") is not None else "numpy"
+
+
+def set_backend(backend: str):
+    """
+    Selects the default backend of the kernels.
+
+    Parameters:
+    -----------
+    backend : str
+        Either "numba" (JIT-compiled loops, parallel across shots) or "numpy" (vectorized fallback).
+    """
+
+    global BACKEND
+    if backend not in ("numba", "numpy"):
+        raise ValueError(f"Unknown backend: {backend}")
+    if backend == "numba" and importlib.util.find_spec("numba") is None:
+        raise ImportError("numba is not installed, use the numpy backend")
+    BACKEND = backend
+
+
+@cache
+def _numba_kernels():
+    """
+    Compiles the numba kernels on first use.
+    """
+
+    import numba
+
+    @numba.njit(parallel=True)
+    def segment_argmin(values, offsets, mask):
+        result = np.full(len(offsets) - 1, -1, dtype=np.int64)
+        for s in numba.prange(len(offsets) - 1):
+            best = np.inf
+            for i in range(offsets[s], offsets[s + 1]):
+                if mask[i] and values[i] < best:
+                    best = values[i]
+                    result[s] = i - offsets[s]
+        return result
+
+    return segment_argmin
+
+
+def _segments(offsets: np.ndarray):
+    lengths = np.diff(offsets)
+    segment = np.repeat(np.arange(len(lengths)), lengths)
+    return lengths, segment, np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+
+
+def _first_true(mask: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    # Index within its shot of the first True of every shot, -1 if none
+    _, segment, position = _segments(offsets)
+    index = np.flatnonzero(mask)
+    segments, first = np.unique(segment[index], return_index=True)
+    result = np.full(len(offsets) - 1, -1, dtype=np.int64)
+    result[segments] = position[index[first]]
+    return result
+
+
+def segment_argmin(
+    values: np.ndarray, offsets: np.ndarray, mask: np.ndarray, backend: str | None = None
+) -> np.ndarray:
+    """
+    Finds the first minimum of every shot among the samples where 'mask' is True.
+
+    Returns:
+    --------
+    np.ndarray
+        The index within its shot of the minimum, -1 if the shot has no valid sample.
+    """
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if (backend or BACKEND) == "numba":
+        return _numba_kernels()(values, offsets, mask)
+
+    lengths, _, _ = _segments(offsets)
+    # NaN and infinite values are never selected, as with the strict comparison of the numba loop
+    candidates = np.where(mask & (values < np.inf), values, np.inf)
+    minimum = np.full(len(lengths), np.inf)
+    filled = lengths > 0
+    minimum[filled] = np.minimum.reduceat(candidates, offsets[:-1][filled])
+    return _first_true(
+        (candidates < np.inf) & (candidates == np.repeat(minimum, lengths)), offsets
+    )
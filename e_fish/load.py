@@ -1,27 +1,75 @@
 import pandas as pd
 import concurrent.futures
+from collections import deque
 from pathlib import Path
+import io
 import os
 import numpy as np
 from tqdm import tqdm
-from diskcache import Cache
-import math
-import joblib
+from functools import partial
+from . import cache, archive, trc
+from .ragged import Regular
 
 
-# If a cache is desired
-cache_dir = (
-    Path(__file__).parent / "cache_load"
-)  #'/home/samuel/Documents/Internship/STAGE/Data_analysis/data/'
-os.makedirs(cache_dir, exist_ok=True)
-cache = Cache(cache_dir, size_limit=math.inf)
+def data_folder(folder: str) -> Path:
+    """
+    Returns the path of a folder (or archive) of the 'data' directory.
+    """
+
+    return Path(__file__).parent.parent.parent / Path("data") / folder
+
 
-cache_avg = Path(__file__).parent / "cache_avg"
-os.makedirs(cache_dir, exist_ok=True)
-memory = joblib.Memory(location=cache_avg, verbose=0)
+def sample_range(filename, time_window=None, sample_window=None, content=None) -> tuple:
+    """
+    Converts a time window and/or a sample-index window into the range of data rows to parse from a file.
+
+    Parameters:
+    -----------
+    filename : str
+        The path to the CSV file.
+    time_window : tuple of float, optional
+        (t_min, t_max) in seconds; either bound may be None.
+    sample_window : tuple of int, optional
+        (first, last) sample indices, 'last' excluded; either bound may be None.
+    content : bytes, optional
+        The content of the file, if already read (e.g. from an archive).
 
+    Returns:
+    --------
+    tuple
+        (first, n_rows): the index of the first data row to parse and the number of rows, None meaning up to the end.
 
-def reader(filename) -> pd.DataFrame:
+    Notes:
+    ------
+    - The time axis is assumed to be uniform, as in the Fortran code, so only the first two data rows are read to
+      locate the time window. One extra sample is kept on each side to absorb rounding; stages apply their exact
+      comparison afterwards.
+    """
+
+    first, last = 0, None
+    if sample_window is not None:
+        first = sample_window[0] or 0
+        last = sample_window[1]
+
+    if time_window is not None:
+        with open(filename) if content is None else io.StringIO(content.decode()) as f:
+            rows = [f.readline() for _ in range(7)][5:]
+        t0, t1 = (float(row.split(";")[0]) for row in rows)
+        dt = t1 - t0
+        t_min, t_max = time_window
+        if t_min is not None and np.isfinite(t_min):
+            first = max(first, int(np.floor((t_min - t0) / dt)) - 1)
+        if t_max is not None and np.isfinite(t_max):
+            time_last = max(int(np.ceil((t_max - t0) / dt)) + 2, 0)
+            last = time_last if last is None else min(last, time_last)
+
+    first = max(first, 0)
+    return first, None if last is None else max(last - first, 0)
+
+
+def reader(
+    filename, compact: bool = False, time_window=None, sample_window=None, content=None
+) -> pd.DataFrame:
     """
     Reads a CSV file containing time series data, sets a custom index, and returns the data as a DataFrame.
 
@@ -29,6 +77,14 @@ def reader(filename) -> pd.DataFrame:
     -----------
     filename : str
         The path to the CSV file to be read.
+    compact : bool, optional
+        If True, the amplitude column is stored as float32, default is False.
+    time_window : tuple of float, optional
+        (t_min, t_max) in seconds; only the samples within the window are parsed. Default is the whole record.
+    sample_window : tuple of int, optional
+        (first, last) sample indices to parse, 'last' excluded. Default is the whole record.
+    content : bytes, optional
+        The content of the file, e.g. an archive member; 'filename' then only gives the shot number.
 
     Returns:
     --------
@@ -42,12 +98,29 @@ def reader(filename) -> pd.DataFrame:
     Notes:
     ------
     - Assumes that the CSV file has a semicolon (;) delimiter.
+    - LeCroy binary files ('.trc', but not the '.trc.txt' exports) are decoded with 'read_trc' instead.
     - Skips the first four rows of the file when reading the data because of the oscilloscope header.
     - Sets the index of the DataFrame to the file number extracted from the filename.
     """
 
+    source = filename if content is None else io.BytesIO(content)
     try:
-        df = pd.read_csv(filename, skiprows=4, delimiter=";")
+        if str(filename).lower().endswith(".trc"):
+            df = read_trc(filename, compact, time_window, sample_window, content)
+        elif time_window is None and sample_window is None:
+            df = pd.read_csv(source, skiprows=4, delimiter=";")
+        else:
+            first, n_rows = sample_range(filename, time_window, sample_window, content)
+            # Lines 0-3 are the oscilloscope header, line 4 the column names
+            df = pd.read_csv(
+                source,
+                skiprows=lambda i: i < 4 or 5 <= i < 5 + first,
+                nrows=n_rows,
+                delimiter=";",
+            )
+        if compact and df.dtypes.iloc[1] != np.float32:
+            # The 8-bit ADC of the oscilloscope does not need double precision
+            df[df.columns[1]] = df[df.columns[1]].astype(np.float32)
         # print(filename)
         df.index = [int(filename.split("--")[-1].split(".")[0])] * len(df)
         return df
@@ -63,8 +136,99 @@ def reader(filename) -> pd.DataFrame:
         print(f"An unexpected error occurred: {e}")
 
 
-# cache.memoize()
-def create_dfs(file_list: tuple) -> list:
+def read_files(file_list, read, archive_path=None) -> list:
+    """
+    Applies a reader to files in parallel, or to the members of an archive read sequentially.
+
+    Parameters:
+    -----------
+    file_list : list of str
+        The paths of the files, or the member names if 'archive_path' is given.
+    read : callable
+        Called as 'read(filename)' for files and 'read(name, content=bytes)' for archive members.
+    archive_path : str or Path, optional
+        The archive holding the members.
+
+    Returns:
+    --------
+    list
+        The results in the order of 'file_list'; None for members missing from the archive.
+
+    Notes:
+    ------
+    - Members are read in archive order by the calling thread while a thread pool decodes them; at most
+      a few members per thread wait to be decoded, which bounds the memory held.
+    """
+
+    max_workers = min(32, (os.cpu_count() or 1) + 4)  # default of the thread pool
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        if archive_path is None:
+            return list(
+                tqdm(
+                    executor.map(read, file_list),
+                    total=len(file_list),
+                    desc="Reading files",
+                    unit="file",
+                )
+            )
+
+        limit = 4 * max_workers
+        results = {}
+        pending = deque()
+        for name, content in tqdm(
+            archive.read_members(archive_path, file_list),
+            total=len(file_list),
+            desc="Reading archive",
+            unit="file",
+        ):
+            pending.append((name, executor.submit(read, name, content=content)))
+            while len(pending) > limit:
+                name, future = pending.popleft()
+                results[name] = future.result()
+        for name, future in pending:
+            results[name] = future.result()
+    return [results.get(i) for i in file_list]
+
+
+def read_trc(
+    filename, compact: bool = False, time_window=None, sample_window=None, content=None
+) -> pd.DataFrame:
+    """
+    Reads a LeCroy binary ('.trc') file into the columns of an exported CSV file, see 'trc.read'.
+
+    Returns:
+    --------
+    pd.DataFrame
+        DataFrame with the columns 'Time' and 'Ampl'.
+
+    Exceptions:
+    -----------
+    ValueError
+        Raised for sequence files, since every file must hold a single shot.
+    """
+
+    time, amplitude, desc = trc.read(
+        filename,
+        content,
+        time_window=time_window,
+        sample_window=sample_window,
+        dtype=np.float32 if compact else np.float64,
+    )
+    if desc["n_segments"] > 1:
+        raise ValueError(
+            f"'{filename}' holds {desc['n_segments']} segments, one shot per file is expected"
+        )
+    return pd.DataFrame({"Time": time[0], "Ampl": amplitude[0]})
+
+
+# @cache.memoize("load")
+def create_dfs(
+    file_list: tuple,
+    compact: bool = False,
+    time_window=None,
+    sample_window=None,
+    archive_path=None,
+) -> list:
     """
     Reads multiple CSV files in parallel and returns a list of DataFrames.
 
@@ -72,6 +236,12 @@ def create_dfs(file_list: tuple) -> list:
     -----------
     file_list : tuple
         A tuple of file paths to be read, excluding any files containing "BG" in their names to exclude background measurement.
+    compact : bool, optional
+        If True, the amplitudes are read as float32, default is False.
+    time_window, sample_window : tuple, optional
+        Window of samples parsed from every file, see 'reader'.
+    archive_path : str or Path, optional
+        If given, 'file_list' holds member names of this archive, read without extracting them.
 
     Returns:
     --------
@@ -88,22 +258,378 @@ def create_dfs(file_list: tuple) -> list:
     - Relies on the 'reader' function to read individual files.
     """
 
-    file_list = [i for i in file_list if "BG" not in i]
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        # Read files in parallel
-        dfs = list(
-            tqdm(
-                executor.map(reader, file_list),
-                total=len(file_list),
-                desc="Reading files",
-                unit="file",
+    file_list = [i for i in file_list if "BG" not in os.path.basename(i)]
+    read = partial(
+        reader,
+        compact=compact,
+        time_window=time_window,
+        sample_window=sample_window,
+    )
+    return read_files(file_list, read, archive_path)
+
+
+def segment_size(filename, content=None) -> int:
+    """
+    Returns the number of samples per segment declared in the header of a file: 'SegmentSize' on the second
+    line of an exported CSV file ("Segments;1;SegmentSize;2002"), the WAVEDESC block of a '.trc' file.
+    """
+
+    if str(filename).lower().endswith(".trc"):
+        if content is None:
+            with open(filename, "rb") as f:
+                content = f.read(512)  # the WAVEDESC fields used end before byte 400
+        desc = trc.header(content)
+        return desc["n_samples"] // desc["n_segments"]
+    with open(filename) if content is None else io.StringIO(content.decode()) as f:
+        fields = [f.readline() for _ in range(2)][1].strip().split(";")
+    return int(fields[fields.index("SegmentSize") + 1])
+
+
+def slot_capacity(filename, time_window=None, sample_window=None, content=None) -> int:
+    """
+    Returns the number of samples to preallocate per shot, from the header and the windows of the first file.
+
+    Notes:
+    ------
+    - A time window falls on slightly different samples from shot to shot, so two samples of margin are added;
+      the capacity never exceeds the declared segment size.
+    """
+
+    if str(filename).lower().endswith(".trc"):
+        if content is None:
+            with open(filename, "rb") as f:
+                content = f.read(512)
+        desc = trc.header(content)
+        size = desc["n_samples"] // desc["n_segments"]
+        first, last = trc.sample_range(desc, time_window, sample_window)
+        n = (size if last is None else min(last, size)) - first
+    else:
+        size = segment_size(filename, content)
+        first, n_rows = sample_range(filename, time_window, sample_window, content)
+        n = size - first if n_rows is None else min(n_rows, size - first)
+    if time_window is not None:
+        n += 2
+    return max(min(n, size), 0)
+
+
+def allocate(n_shots: int, capacity: int, compact: bool = False, regular: bool = False) -> dict:
+    """
+    Preallocates the samples of a channel as (shots, capacity) arrays, filled in place by 'fill_slot'.
+
+    Returns:
+    --------
+    dict
+        'time' (float64) and 'amplitude' (float32 if 'compact', else float64) arrays, the number of samples
+        read per shot in 'counts' and 'overflow', the shots longer than the capacity kept aside.
+        With 'regular=True', the time array is replaced by the first time 't0' and the timestep 'dt' of every shot.
+    """
+
+    buffers = {
+        "amplitude": np.empty((n_shots, capacity), dtype=np.float32 if compact else np.float64),
+        "counts": np.zeros(n_shots, dtype=np.int64),
+        "overflow": {},
+    }
+    if regular:
+        buffers["t0"] = np.full(n_shots, np.nan)
+        buffers["dt"] = np.full(n_shots, np.nan)
+    else:
+        buffers["time"] = np.empty((n_shots, capacity))
+    return buffers
+
+
+def fill_slot(filename, slots: dict, read, content=None):
+    """
+    Reads a file and copies its samples into its slot of the preallocated arrays.
+
+    Parameters:
+    -----------
+    filename : str
+        The path of the file, or the member name for an archive.
+    slots : dict
+        Mapping from file name to (buffers, row) with the buffers from 'allocate'.
+    read : callable
+        The reader returning the file as a two-column DataFrame (time, amplitude), e.g. a partial of 'reader'.
+    content : bytes, optional
+        The content of an archive member.
+
+    Notes:
+    ------
+    - Files that cannot be read leave a count of 0. Samples are sorted by time if the file is not.
+    - Every file owns its row, so the threads of 'read_files' fill the arrays without locking.
+    - For buffers allocated with 'regular=True', only the first time and the timestep are kept; a file whose times
+      deviate from the regular axis by more than 1% of the timestep raises a ValueError.
+    """
+
+    df = read(filename) if content is None else read(filename, content=content)
+    if df is None:
+        return
+    buffers, row = slots[filename]
+    time = df.iloc[:, 0].to_numpy()
+    amplitude = df.iloc[:, 1].to_numpy()
+    if np.any(time[1:] < time[:-1]):
+        order = np.argsort(time, kind="stable")
+        time, amplitude = time[order], amplitude[order]
+    n = len(time)
+    buffers["counts"][row] = n
+    if "t0" in buffers:
+        dt = (time[-1] - time[0]) / (n - 1) if n > 1 else 1.0
+        if n > 1 and np.abs(time - (time[0] + dt * np.arange(n))).max() > 1e-2 * abs(dt):
+            raise ValueError(f"'{filename}' is not uniformly sampled")
+        buffers["t0"][row], buffers["dt"][row] = time[0], dt
+        time = None
+    if n > buffers["amplitude"].shape[1]:
+        buffers["overflow"][row] = (time, amplitude)
+        return
+    if time is not None:
+        buffers["time"][row, :n] = time
+    buffers["amplitude"][row, :n] = amplitude
+
+
+def assemble(shots, buffers: dict, compact: bool = False, keep=None) -> pd.DataFrame | Regular:
+    """
+    Turns the arrays filled by 'fill_slot' into the DataFrame of a channel.
+
+    Parameters:
+    -----------
+    shots : sequence of int
+        The sorted shot numbers of the rows of the arrays.
+    buffers : dict
+        The arrays from 'allocate'.
+    compact : bool, optional
+        If True, the file numbers are stored in the narrowest unsigned integer type that holds them.
+    keep : np.ndarray of bool, optional
+        The rows to keep, default is every shot that was read.
+
+    Returns:
+    --------
+    pd.DataFrame or Regular
+        DataFrame with columns ['file_number', 'time', 'amplitude'] sorted by shot and time,
+        or a 'ragged.Regular' container with the 'amplitude' column for buffers allocated with 'regular=True'.
+
+    Notes:
+    ------
+    - If every kept shot filled its whole row, the columns are views of the arrays and nothing is copied.
+      Otherwise (shorter files, windows falling on fewer samples, dropped shots) the kept samples are copied once.
+
+    Exceptions:
+    -----------
+    ValueError
+        Raised if no shot was read.
+    """
+
+    shots = np.asarray(shots, dtype=np.int64)
+    counts = buffers["counts"]
+    keep = counts > 0 if keep is None else keep & (counts > 0)
+    if not keep.any():
+        raise ValueError("No file could be read")
+    regular = "t0" in buffers
+    capacity = buffers["amplitude"].shape[1]
+    if keep.all() and (counts == capacity).all():
+        time = None if regular else buffers["time"].reshape(-1)
+        amplitude = buffers["amplitude"].reshape(-1)
+        rows = slice(None)
+    else:
+        rows = np.flatnonzero(keep)
+        pieces = [
+            buffers["overflow"].get(
+                i,
+                (
+                    None if regular else buffers["time"][i, : counts[i]],
+                    buffers["amplitude"][i, : counts[i]],
+                ),
             )
+            for i in rows
+        ]
+        time = None if regular else np.concatenate([i[0] for i in pieces])
+        amplitude = np.concatenate([i[1] for i in pieces]).astype(
+            buffers["amplitude"].dtype, copy=False
+        )
+        shots, counts = shots[rows], counts[rows]
+    if regular:
+        return Regular(
+            {"amplitude": amplitude},
+            np.append(0, np.cumsum(counts)),
+            shots,
+            buffers["t0"][rows],
+            buffers["dt"][rows],
+        )
+    file_number = np.repeat(shots, counts)
+    if compact:
+        file_number = file_number.astype(np.min_scalar_type(file_number.max()), copy=False)
+    # copy=False keeps the arrays as they are instead of consolidating the columns into a new block
+    return pd.DataFrame(
+        {"file_number": file_number, "time": time, "amplitude": amplitude}, copy=False
+    )
+
+
+def list_channel_files(channels, folder: str) -> dict:
+    """
+    Lists the files of several channels in a folder with a single directory scan, indexed by shot number.
+
+    Parameters:
+    -----------
+    channels : iterable of str
+        The channel identifiers used to filter the files.
+    folder : str
+        The name of the folder containing the CSV files, relative to the 'data' directory, or of an archive of it.
+
+    Returns:
+    --------
+    dict
+        Mapping from every channel to a mapping from shot number to the path of its file (the member name
+        for an archive), sorted by shot number.
+
+    Notes:
+    ------
+    - Background files (containing "BG" in their names) are excluded.
+    - Files whose name does not end with a shot number are reported and skipped.
+    """
+
+    folder = data_folder(folder)
+    if archive.is_archive(folder):
+        return archive.list_members(folder, channels)
+    files = {channel: {} for channel in channels}
+    for i in os.listdir(folder):
+        channel = i.split("-")[0]
+        if channel not in files or "BG" in i:
+            continue
+        try:
+            files[channel][int(i.split("--")[-1].split(".")[0])] = str(folder / i)
+        except ValueError:
+            print(f"Error: No shot number in the file name '{i}'.")
+    return {channel: dict(sorted(f.items())) for channel, f in files.items()}
+
+
+def list_files(channel: str, folder: str) -> dict:
+    """
+    Lists the files of a channel in a folder, indexed by shot number.
+
+    Parameters:
+    -----------
+    channel : str
+        The channel identifier used to filter the files.
+    folder : str
+        The name of the folder containing the CSV files, relative to the 'data' directory.
+
+    Returns:
+    --------
+    dict
+        Mapping from every shot number to the path of its file, sorted by shot number.
+    """
+
+    return list_channel_files((channel,), folder)[channel]
+
+
+class LazyChannel:
+    """
+    Handle on the files of one channel that only parses the shots actually requested.
+
+    Parameters:
+    -----------
+    channel : str
+        The channel identifier used to filter the files to be read.
+    folder : str
+        The name of the folder containing the CSV files, or of an archive of it.
+    compact : bool, optional
+        If True, the amplitudes are stored as float32 and the file numbers in a narrow integer type, see 'get_df'.
+    time_window, sample_window : tuple, optional
+        Window of samples parsed from every file, see 'reader'.
+    regular : bool, optional
+        If True, 'load' returns a 'ragged.Regular' container with an implicit time axis, see 'get_df'.
+    files : dict, optional
+        Mapping from shot number to file path from an earlier scan (see 'list_channel_files').
+        If None, the folder is listed.
+
+    Notes:
+    ------
+    - Only the directory is listed when the handle is created; files are parsed by 'load'.
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        folder: str,
+        compact: bool = False,
+        time_window=None,
+        sample_window=None,
+        files: dict | None = None,
+        regular: bool = False,
+    ):
+        self.channel = channel
+        self.folder = folder
+        self.compact = compact
+        self.time_window = time_window
+        self.sample_window = sample_window
+        self.regular = regular
+        self.archive = data_folder(folder) if archive.is_archive(data_folder(folder)) else None
+        self.files = list_files(channel, folder) if files is None else files
+
+    @property
+    def shots(self) -> list:
+        """
+        Sorted shot numbers available for the channel.
+        """
+
+        return list(self.files)
+
+    def load(self, shots=None) -> pd.DataFrame | Regular:
+        """
+        Reads the requested shots into a single DataFrame.
+
+        Parameters:
+        -----------
+        shots : iterable of int, optional
+            The shot numbers to read. If None, all the shots of the channel are read.
+            Shots without a file are ignored.
+
+        Returns:
+        --------
+        pd.DataFrame
+            A DataFrame with columns ['file_number', 'time', 'amplitude'] sorted by shot and time.
+
+        Notes:
+        ------
+        - The shot order comes from sorting the shot numbers. The samples are preallocated once from the
+          'SegmentSize' of the first file and every file is copied into its slot (see 'assemble'),
+          instead of concatenating per-file DataFrames and sorting the result.
+        """
+
+        if shots is None:
+            selected = list(self.files)
+        else:
+            selected = [i for i in sorted(set(int(j) for j in shots)) if i in self.files]
+        if not selected:
+            raise ValueError(f"No file of channel {self.channel} to read")
+        file_list = [self.files[i] for i in selected]
+
+        content = None
+        if self.archive is not None:
+            content = next(archive.read_members(self.archive, file_list[:1]))[1]
+        capacity = slot_capacity(file_list[0], self.time_window, self.sample_window, content)
+        buffers = allocate(len(file_list), capacity, self.compact, self.regular)
+
+        read = partial(
+            reader,
+            compact=self.compact,
+            time_window=self.time_window,
+            sample_window=self.sample_window,
         )
-    return dfs
+        slots = {name: (buffers, row) for row, name in enumerate(file_list)}
+        read_files(file_list, partial(fill_slot, slots=slots, read=read), self.archive)
+        return assemble(selected, buffers, self.compact)
 
 
-# @cache.memoize()
-def get_df(channel: str, folder: str) -> pd.DataFrame:
+# @cache.memoize("load")
+def get_df(
+    channel: str,
+    folder: str,
+    compact: bool = False,
+    shots=None,
+    lazy: bool = False,
+    time_window=None,
+    sample_window=None,
+    regular: bool = False,
+) -> pd.DataFrame | Regular | LazyChannel:
     """
     Creates a single concatenated DataFrame from multiple CSV files associated with a specific channel.
 
@@ -112,17 +638,34 @@ def get_df(channel: str, folder: str) -> pd.DataFrame:
     channel : str
         The channel identifier used to filter the files to be read.
     folder : str
-        The name of the folder containing the CSV files.
+        The name of the folder containing the CSV files, or of a zip or tar archive of it
+        (see 'archive.SUFFIXES'), whose members are parsed without being extracted.
+    compact : bool, optional
+        If True, the amplitudes are stored as float32 and the file numbers in the narrowest
+        unsigned integer type that holds them, roughly halving the memory of the DataFrame. Default is False.
+    shots : iterable of int, optional
+        The shot numbers to read. If None (default), all the files of the channel are read.
+    lazy : bool, optional
+        If True, returns a 'LazyChannel' handle instead of reading the files, default is False.
+    time_window : tuple of float, optional
+        (t_min, t_max) in seconds; only the samples within the window are parsed. The pipeline
+        stages need the full record and leave it to None.
+    sample_window : tuple of int, optional
+        (first, last) sample indices to parse, 'last' excluded.
+    regular : bool, optional
+        If True, returns a 'ragged.Regular' container storing only the first time and the timestep of every shot
+        instead of a time column, default is False. The records must be uniformly sampled, as LeCroy records are.
 
     Returns:
     --------
-    pd.DataFrame
+    pd.DataFrame, Regular or LazyChannel
         A concatenated DataFrame containing the time series data from all relevant files,
-        with columns ['file_number', 'time', 'amplitude'].
+        with columns ['file_number', 'time', 'amplitude'], the same samples in a 'Regular' container,
+        or a handle whose 'load' method reads them on demand.
 
     Side Effects:
     -------------
-    - Reads all files matching the 'channel' identifier in the specified folder.
+    - Reads all files matching the 'channel' identifier (and 'shots', if given) in the specified folder.
     - Concatenates the DataFrames from all files and resets the index.
 
     Notes:
@@ -131,22 +674,20 @@ def get_df(channel: str, folder: str) -> pd.DataFrame:
     - Uses the 'create_dfs' function to read and process the files in parallel.
     """
 
-    folder = Path(__file__).parent.parent.parent / Path("data") / folder
-    file_list = tuple(
-        [str(folder / i) for i in os.listdir(folder) if i.split("-")[0] == channel]
+    channel_files = LazyChannel(
+        channel,
+        folder,
+        compact=compact,
+        time_window=time_window,
+        sample_window=sample_window,
+        regular=regular,
     )
-    # print(file_list)
-    dfs = create_dfs(file_list)
-    df = pd.concat(dfs)
-    df.index.name = "file_number"
-    df.set_index("Time", append=True, inplace=True)
-    df.sort_index(inplace=True)
-    df.reset_index(inplace=True)
-    df.columns = ["file_number", "time", "amplitude"]
-    return df
+    if lazy:
+        return channel_files
+    return channel_files.load(shots)
 
 
-# @memory.cache
+# @cache.memoize("avg")
 def avg_amplitude(df: pd.DataFrame, window_size: int):
     """
     Computes the rolling average of the amplitude column in the provided DataFrame and adds it as a new column.
@@ -171,14 +712,22 @@ def avg_amplitude(df: pd.DataFrame, window_size: int):
     Notes:
     ------
     - The rolling average is computed with a minimum of 3 data points to avoid incomplete windows.
+    - The rolling average keeps the dtype of the 'amplitude' column, so float32 data stays float32.
     - The function resets the 'file_number' index before adding the new column to the original DataFrame.
+    - A 'ragged.Regular' container gets an 'avg_amplitude' column as well.
     """
 
+    if isinstance(df, Regular):
+        frame = pd.DataFrame({"file_number": df.repeat(df.shots), "amplitude": df["amplitude"]})
+        df.columns["avg_amplitude"] = avg_amplitude(frame, window_size).avg_amplitude.to_numpy()
+        return df
+
     df_avg = (
         df.groupby("file_number")
         .amplitude.rolling(window=window_size, min_periods=3)
         .mean()
         .bfill()
+        .astype(df.amplitude.dtype)
         .to_frame("avg_amplitude")
     )
     df_avg.reset_index(level="file_number", inplace=True)
@@ -220,3 +769,267 @@ def inverted_bkgd(
     df.to_csv(path_to_write, sep=";", index=False, mode="a")
 
     return print(f"Background wrote to {path_to_write}")
+
+
+@cache.memoize("avg")
+def bkgd_template(channel: str, data_path: str) -> pd.DataFrame:
+    """
+    Averages all the background files ('BG*') of a channel into a single template.
+
+    Parameters:
+    -----------
+    channel : str
+        The channel identifier.
+    data_path : str
+        The relative path to the folder containing the background files.
+
+    Returns:
+    --------
+    pd.DataFrame
+        DataFrame with the columns 'time' and 'amplitude', the amplitude being the mean over all background files.
+
+    Notes:
+    ------
+    - The result is cached on disk, so the background files are only read once per folder.
+    - All background files are assumed to share the time axis of the first one.
+    """
+
+    path = Path(__file__).parent.parent / Path("data") / Path(data_path)
+    filenames = sorted(
+        str(path / i) for i in os.listdir(path) if i.split("-")[0] == channel if "BG" in i
+    )
+    amplitudes = np.stack(
+        [
+            pd.read_csv(filename, skiprows=4, delimiter=";").iloc[:, 1].values
+            for filename in filenames
+        ]
+    )
+    time = pd.read_csv(filenames[0], skiprows=4, delimiter=";").iloc[:, 0].values
+    return pd.DataFrame({"time": time, "amplitude": amplitudes.mean(axis=0)})
+
+
+def baseline_offsets(df: pd.DataFrame, t_bgd: float = 0) -> pd.Series:
+    """
+    Computes the baseline offset of every shot at once, as 'offset_substraction' does in the Fortran code.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        DataFrame with the columns 'file_number', 'time' and 'amplitude', sorted by shot and time.
+    t_bgd : float, optional
+        The time until which the signal is considered to be background only, default is 0.
+
+    Returns:
+    --------
+    pd.Series
+        The mean amplitude of the first int(t_bgd / timestep) + 1 samples of every shot, indexed by file number.
+    """
+
+    shots, starts, counts = np.unique(
+        df.file_number.values, return_index=True, return_counts=True
+    )
+    time = df.time.values
+    timestep = time[1] - time[0]
+    n_bgd = int(t_bgd / timestep) + 1
+
+    # Position of every sample within its shot
+    sample = np.arange(len(df)) - np.repeat(starts, counts)
+    inside = sample < n_bgd
+    position = np.repeat(np.arange(len(shots)), counts)[inside]
+    offsets = np.bincount(
+        position, weights=df.amplitude.values[inside], minlength=len(shots)
+    ) / np.bincount(position, minlength=len(shots))
+    return pd.Series(offsets, index=pd.Index(shots, name="file_number"))
+
+
+def subtract_background(
+    df: pd.DataFrame,
+    template: pd.DataFrame | None = None,
+    t_bgd: float | None = 0,
+    shift: float = 0,
+    invert: bool = False,
+) -> pd.DataFrame:
+    """
+    Subtracts the baseline offset of every shot and a background template from the amplitudes in one operation.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        DataFrame with the columns 'file_number', 'time' and 'amplitude', sorted by shot and time.
+    template : pd.DataFrame, optional
+        Background template with the columns 'time' and 'amplitude', e.g. from 'bkgd_template'.
+    t_bgd : float or None, optional
+        See 'baseline_offsets'; None skips the offset subtraction. Default is 0.
+    shift : float, optional
+        Time shift applied to the template, e.g. df_discharge.time.max() - df_discharge_bkgd.time.iloc[0]
+        as in 'inverted_bkgd'. Default is 0.
+    invert : bool, optional
+        If True, the template amplitude is inverted as in 'inverted_bkgd', default is False.
+
+    Returns:
+    --------
+    pd.DataFrame
+        The input DataFrame with the corrected 'amplitude' column.
+
+    Notes:
+    ------
+    - Replaces writing a shifted background file with 'inverted_bkgd': the template is interpolated
+      onto the time of every sample and subtracted in memory, together with the per-shot offsets.
+    """
+
+    correction = np.zeros(len(df))
+    if t_bgd is not None:
+        offsets = baseline_offsets(df, t_bgd)
+        correction += offsets.reindex(df.file_number.values).values
+    if template is not None:
+        sign = -1 if invert else 1
+        correction += sign * np.interp(
+            df.time.values,
+            template.time.values + shift,
+            template.amplitude.values,
+            left=0,
+            right=0,
+        )
+    df["amplitude"] = (df.amplitude.values - correction).astype(df.amplitude.dtype)
+    return df
+
+
+def report_missing(missing: dict, message: str):
+    """
+    Prints the shots of a 'missing' report of 'get_channels' with the channels they lack.
+    """
+
+    if missing:
+        print(f"Warning: {len(missing)} shots {message}:")
+        for shot, absent in missing.items():
+            print(f"  shot {shot}: {', '.join(absent)}")
+
+
+def get_channels(
+    channels,
+    folder: str,
+    compact: bool = False,
+    shots=None,
+    lazy: bool = False,
+    time_window=None,
+    sample_window=None,
+):
+    """
+    Reads several channels of a folder in one pass and returns their DataFrames aligned by shot.
+
+    Parameters:
+    -----------
+    channels : iterable of str
+        The channel identifiers to read, e.g. ("C1", "C2", "C3").
+    folder : str
+        The name of the folder containing the CSV files, or of an archive of it (see 'get_df').
+    compact : bool, optional
+        If True, the amplitudes are stored as float32 and the file numbers in a narrow integer type, see 'get_df'.
+    shots : iterable of int, optional
+        The shot numbers to read. If None (default), all the shots found are read.
+    lazy : bool, optional
+        If True, 'dfs' holds a 'LazyChannel' handle per channel, all built from the same directory scan,
+        default is False.
+    time_window, sample_window : tuple, optional
+        Window of samples parsed from every file, see 'reader'.
+
+    Returns:
+    --------
+    tuple
+        (dfs, missing) where 'dfs' maps every channel to a DataFrame with columns ['file_number', 'time', 'amplitude']
+        holding the same shots in the same order, and 'missing' maps every incomplete shot to the list of channels
+        that could not be read. With 'lazy=True', 'dfs' maps every channel to its 'LazyChannel' handle and
+        'missing' lists the channels without a file for the shot, since no file is read.
+
+    Side Effects:
+    -------------
+    - Lists the folder once and reads the files of all channels with a single thread pool.
+    - Prints the shots that miss at least one channel.
+
+    Notes:
+    ------
+    - Only shots present in every channel are kept, so the DataFrames are aligned row by row per shot.
+    - The samples of every channel are preallocated and filled in place, see 'assemble'; dropping incomplete
+      shots costs one copy of the kept samples.
+    """
+
+    channels = tuple(channels)
+    files = list_channel_files(channels, folder)
+    all_shots = set().union(*(f.keys() for f in files.values()))
+    if shots is not None:
+        all_shots &= set(int(i) for i in shots)
+    all_shots = sorted(all_shots)
+    if lazy:
+        handles = {
+            channel: LazyChannel(
+                channel,
+                folder,
+                compact=compact,
+                time_window=time_window,
+                sample_window=sample_window,
+                files=files[channel],
+            )
+            for channel in channels
+        }
+        missing = {}
+        for shot in all_shots:
+            absent = [channel for channel in channels if shot not in files[channel]]
+            if absent:
+                missing[shot] = absent
+        report_missing(missing, "miss the file of at least one channel")
+        return handles, missing
+
+    tasks = [
+        (channel, shot) for shot in all_shots for channel in channels if shot in files[channel]
+    ]
+
+    path = data_folder(folder)
+    archive_path = path if archive.is_archive(path) else None
+    file_list = [files[channel][shot] for channel, shot in tasks]
+    if not file_list:
+        raise ValueError(f"No file of channels {', '.join(channels)} to read")
+
+    # One preallocated (shots, samples) pair of arrays per channel, sized from its first file
+    first = {}
+    for channel, shot in tasks:
+        first.setdefault(channel, files[channel][shot])
+    contents = {}
+    if archive_path is not None:
+        contents = dict(archive.read_members(archive_path, list(first.values())))
+    buffers = {
+        channel: allocate(
+            len(all_shots),
+            slot_capacity(name, time_window, sample_window, contents.get(name)),
+            compact,
+        )
+        for channel, name in first.items()
+    }
+    del contents
+    row = {shot: i for i, shot in enumerate(all_shots)}
+    slots = {
+        files[channel][shot]: (buffers[channel], row[shot]) for channel, shot in tasks
+    }
+
+    read = partial(
+        reader, compact=compact, time_window=time_window, sample_window=sample_window
+    )
+    read_files(file_list, partial(fill_slot, slots=slots, read=read), archive_path)
+
+    missing = {}
+    for shot in all_shots:
+        absent = [
+            channel
+            for channel in channels
+            if channel not in buffers or buffers[channel]["counts"][row[shot]] == 0
+        ]
+        if absent:
+            missing[shot] = absent
+    report_missing(missing, "miss at least one channel and were skipped")
+
+    keep = np.array([shot not in missing for shot in all_shots])
+    if not keep.any():
+        raise ValueError(f"No shot has all the channels {', '.join(channels)}")
+    dfs = {
+        channel: assemble(all_shots, buffers[channel], compact, keep) for channel in channels
+    }
+    return dfs, missing
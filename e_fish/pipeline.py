@@ -0,0 +1,854 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+from pathlib import Path
+from time import perf_counter
+import pandas as pd
+from . import load, time, transmitted, signals, for_compiler, store, streaming, shards
+from .for_compiler import input_folder
+
+
+# Parameters of a run; a config file only needs the values that differ
+DEFAULTS = {
+    "data_path": "2024_05_16\\pos2_27kV\\pos2_27kV",
+    "trigger_up": 0.15,
+    "window_size": 10,
+    "n_elements": 2002,
+    "bin_width": 0.2,
+    "compact": False,
+    "fortran_folder": "FORTRAN",
+    "fortran_profile": "reference",
+    "threads": None,
+    "streaming": False,
+    "subtract_offsets": True,
+    "parallel": False,
+    "workers": None,
+    "shards": None,
+    "checkpoint_dir": None,
+}
+
+# Names computed by 'settings' from 'data_path'
+DERIVED = ("date", "pos_volt", "voltage", "joined_date")
+
+
+def settings(config: dict | None = None) -> dict:
+    """
+    Completes a configuration with the defaults and the names derived from 'data_path'.
+
+    Parameters:
+    -----------
+    config : dict, optional
+        The parameters of the run, see 'DEFAULTS'. Unknown keys raise a ValueError.
+        The names of 'DERIVED' are recomputed, so a completed configuration can be passed again.
+
+    Returns:
+    --------
+    dict
+        The parameters plus 'date', 'pos_volt', 'voltage' and 'joined_date', as computed by 'scripts/run.py'.
+    """
+
+    config = {i: v for i, v in (config or {}).items() if i not in DERIVED}
+    unknown = set(config) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+    config = DEFAULTS | config
+    data_path = config["data_path"]
+    config["date"] = data_path.split("\\")[0]
+    config["pos_volt"] = data_path.split("\\")[1].split("k")[0]
+    config["voltage"] = data_path.split("\\")[1].split("_")[1].split("k")[0]
+    config["joined_date"] = "".join(config["date"].split("_"))
+    return config
+
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    Parameters:
+    -----------
+    name : str
+        The name of the stage, also the name of its checkpoint.
+    function : callable
+        Called as 'function(config, *results)' with the results of the stages in 'requires', in that order.
+        It returns a DataFrame, a JSON-serializable value, or None for stages that only write files.
+    requires : tuple of str, optional
+        The stages whose results are needed.
+    params : tuple of str, optional
+        The configuration keys the stage depends on.
+    raw : tuple of str, optional
+        The oscilloscope channels read by the stage; a change of their files invalidates the stage.
+    products : callable, optional
+        Called as 'products(config)', returns the files the stage writes. The stage is rerun if one is missing.
+    writes : bool, optional
+        If True, the function returns the list of the files it wrote, e.g. by 'for_compiler.write_files',
+        or a DataFrame whose '*_file' columns hold them, and the stage is rerun if one of them is missing.
+    sources : callable, optional
+        Called as 'sources(config)', returns the source files the stage compiles; a change of their size or
+        modification time invalidates the stage.
+    executor : str, optional
+        Where 'run' with 'parallel' calls the function: "thread" (default) in a thread pool, or "process" in a
+        process pool for stages holding the GIL, whose results are then pickled back.
+        Coroutine functions, which wait for subprocesses, are awaited on the event loop in both modes.
+    """
+
+    def __init__(
+        self,
+        name,
+        function,
+        requires=(),
+        params=(),
+        raw=(),
+        products=None,
+        writes=False,
+        sources=None,
+        executor="thread",
+    ):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor: {executor}")
+        self.name = name
+        self.function = function
+        self.requires = tuple(requires)
+        self.params = tuple(params)
+        self.raw = tuple(raw)
+        self.products = products
+        self.writes = writes
+        self.sources = sources
+        self.executor = executor
+
+
+def _missing(config):
+    # Shots lacking the file of a channel, from the directory scan alone; the report is printed and checkpointed
+    _, missing = load.get_channels(("C1", "C2", "C3"), Path(config["data_path"]), lazy=True)
+    return {str(shot): channels for shot, channels in missing.items()}
+
+
+def _per_shot(config, stage, frames, *args, ignore_index=False):
+    # With 'shards', the per-shot stages run on blocks of shots in a pool of 'workers' processes
+    if config["shards"]:
+        return shards.run_sharded(
+            stage,
+            frames,
+            *args,
+            n_shards=config["shards"],
+            max_workers=config["workers"],
+            ignore_index=ignore_index,
+        )
+    return stage(*frames, *args)
+
+
+def _c1(config):
+    df = load.get_df(
+        channel="C1", folder=Path(config["data_path"]), compact=config["compact"]
+    )
+    return _per_shot(config, load.avg_amplitude, (df,), config["window_size"])
+
+
+def _time(config, df_1):
+    return time.calculate_df_time(df_1, config["trigger_up"], -config["trigger_up"])
+
+
+def _pulse(df_1, df_time):
+    df_shifted = time.shift_reflected_pulse(df_1, df_time)
+    return transmitted.compute_pulse(df_1, df_shifted, df_time)
+
+
+def _transmitted(config, df_1, df_time):
+    return _per_shot(config, _pulse, (df_1, df_time), ignore_index=True)
+
+
+def _discharge(config, df_transmitted):
+    return _per_shot(
+        config,
+        transmitted.get_discharge_times,
+        (df_transmitted,),
+        config["trigger_up"],
+        ignore_index=True,
+    )
+
+
+def _c2(config, df_discharge):
+    return load.get_df(
+        channel="C2",
+        folder=Path(config["data_path"]),
+        compact=config["compact"],
+        shots=df_discharge.file_number,
+    )
+
+
+def _c3(config, df_discharge):
+    # The SHG code reads the C33 files of every shot between the first and last discharge
+    df_3 = load.get_df(
+        channel="C3",
+        folder=Path(config["data_path"]),
+        compact=config["compact"],
+        shots=range(
+            int(df_discharge.file_number.iloc[0]), int(df_discharge.file_number.iloc[-1]) + 1
+        ),
+    )
+    df_3["amplitude"] = -df_3["amplitude"]
+    return df_3
+
+
+def _intervals(config, df_2, df_3):
+    df_3_max = signals.find_pmt_max(df_3)
+    return {
+        "fwhm": float(time.calculate_int_interval(df_2)),
+        "t_diff": float(time.calculate_pd_pmt_diff(df_3_max, df_2)),
+    }
+
+
+# Background time of the SHG input file; with 'subtract_offsets' the offsets of the written files are
+# subtracted here over the same samples as 'offset_substraction', and the SHG code is built with -DCORRECTED
+T_BGD = 0
+
+
+def _corrected(config, df):
+    if config["subtract_offsets"]:
+        return load.subtract_background(df, t_bgd=T_BGD)
+    return df
+
+
+def _shg_defines(config):
+    return ("CORRECTED",) if config["subtract_offsets"] else ()
+
+
+def _write_c11(config, df_1):
+    df_1 = df_1.drop(columns="amplitude").rename(columns={"avg_amplitude": "amplitude"})
+    df_1["amplitude"] = -df_1["amplitude"]
+    df_1 = _corrected(config, df_1)
+    return for_compiler.write_files(df_1, channel="C11", pos_path=config["data_path"])
+
+
+def _write_c33(config, df_3):
+    # The C3 frame is also read by 'intervals', possibly at the same time, so it is corrected on a copy
+    df_3 = _corrected(config, df_3.copy()) if config["subtract_offsets"] else df_3
+    return for_compiler.write_files(df_3, channel="C33", pos_path=config["data_path"])
+
+
+def _write_c44(config, df_transmitted):
+    df_transmitted = transmitted.complete_signal(
+        df_transmitted, n_elements=config["n_elements"]
+    )
+    df_transmitted.rename(columns={"transmitted": "amplitude"}, inplace=True)
+    df_transmitted = _corrected(config, df_transmitted)
+    return for_compiler.write_files(df_transmitted, channel="C44", pos_path=config["data_path"])
+
+
+def _input(config, df_discharge, intervals):
+    name = f"{config['joined_date']}_Air150mbar_{config['voltage']}kV--"
+    for_compiler.write_input(
+        first_osc=int(df_discharge.file_number.iloc[0]),
+        last_osc=int(df_discharge.file_number.iloc[-1]),
+        delta_t=intervals["fwhm"],
+        t_diff=intervals["t_diff"],
+        pos_path=config["data_path"],
+        input_path=f"{config['date']}/input_{config['pos_volt']}.dat",
+        t_bgd=T_BGD,
+        bcs1_gen_name=f"C11--{name}",
+        bcs2_gen_name=f"C44--{name}",
+        pd_gen_name=f"C2--{name}",
+        pmt_gen_name=f"C33--{name}",
+        n_elements=config["n_elements"],
+        trigger=config["trigger_up"],
+    )
+
+
+def _ssc_profile(config):
+    # SSC has no parallel loop, so the "openmp" profile runs the "performance" build of it
+    return "reference" if config["fortran_profile"] == "reference" else "performance"
+
+
+def _shg_sources(config):
+    source = for_compiler.folder / config["fortran_folder"]
+    return [source / for_compiler.module, source / for_compiler.code]
+
+
+def _ssc_sources(config):
+    source = for_compiler.folder / config["fortran_folder"]
+    return [source / "ssc.f90", source / "stud_stat_calc.f90"]
+
+
+async def _build_shg(config):
+    executable = await for_compiler.build_fortran_async(
+        config["fortran_folder"],
+        for_compiler.module,
+        for_compiler.code,
+        "second_harmonic_generation",
+        config["fortran_profile"],
+        defines=_shg_defines(config),
+    )
+    return str(executable)
+
+
+def _shg_files(config):
+    folder = input_folder / config["date"]
+    return folder / f"input_{config['pos_volt']}.dat", folder / f"output_{config['pos_volt']}.dat"
+
+
+def _ssc_files(config):
+    folder = input_folder / config["date"]
+    return folder / f"input_{config['pos_volt']}_SSC.dat", folder / f"output_{config['pos_volt']}_SSC.dat"
+
+
+async def _shg(config, executable, *_):
+    input_file, output_file = _shg_files(config)
+    await for_compiler.run_fortran_async(
+        Path(executable), input_file, output_file, threads=config["threads"]
+    )
+
+
+def _ssc_input(config, _):
+    path = f"{config['date']}/e_fish_signal_{config['pos_volt']}.dat"
+    for_compiler.write_shg_for_ssc(
+        path_to_write=path,
+        path_to_read=f"{config['date']}/output_{config['pos_volt']}.dat",
+    )
+    for_compiler.write_input_for_ssc(
+        path=f"{config['date']}/input_{config['pos_volt']}_SSC.dat",
+        n_files=len(pd.read_csv(str(input_folder / path), delimiter=";")),
+        path_to_data=f"e_fish_signal_{config['pos_volt']}.dat",
+        bin_width=config["bin_width"],
+    )
+
+
+async def _build_ssc(config):
+    executable = await for_compiler.build_fortran_async(
+        config["fortran_folder"], "ssc.f90", "stud_stat_calc.f90", "stud_stat_calc", _ssc_profile(config)
+    )
+    return str(executable)
+
+
+async def _ssc(config, executable, _):
+    input_file, output_file = _ssc_files(config)
+    await for_compiler.run_fortran_async(
+        Path(executable), input_file, output_file, student_file=for_compiler.student_table
+    )
+
+
+def _store(config, df_time, df_discharge, _):
+    store.append_run(
+        date=config["date"],
+        position=config["pos_volt"].split("_")[0],
+        voltage=int(config["voltage"]),
+        df_time=df_time,
+        df_discharge=df_discharge,
+        path_to_output=f"{config['date']}/output_{config['pos_volt']}.dat",
+    )
+
+
+STAGES = [
+    Stage("missing", _missing, params=("data_path",), raw=("C1", "C2", "C3")),
+    Stage("c1", _c1, params=("data_path", "compact", "window_size"), raw=("C1",)),
+    Stage("time", _time, requires=("c1",), params=("trigger_up",)),
+    Stage("transmitted", _transmitted, requires=("c1", "time")),
+    Stage("discharge", _discharge, requires=("transmitted",), params=("trigger_up",)),
+    Stage("c2", _c2, requires=("discharge",), params=("compact",), raw=("C2",)),
+    Stage("c3", _c3, requires=("discharge",), params=("compact",), raw=("C3",)),
+    Stage("intervals", _intervals, requires=("c2", "c3")),
+    Stage(
+        "write_c11",
+        _write_c11,
+        requires=("c1",),
+        params=("subtract_offsets",),
+        writes=True,
+    ),
+    Stage(
+        "write_c33",
+        _write_c33,
+        requires=("c3",),
+        params=("subtract_offsets",),
+        writes=True,
+    ),
+    # 'complete_signal' is pandas work holding the GIL while the C2 and C3 files are parsed in threads
+    Stage(
+        "write_c44",
+        _write_c44,
+        requires=("transmitted",),
+        params=("n_elements", "subtract_offsets"),
+        writes=True,
+        executor="process",
+    ),
+    Stage(
+        "input",
+        _input,
+        requires=("discharge", "intervals"),
+        params=("n_elements", "trigger_up"),
+        products=lambda c: [_shg_files(c)[0]],
+    ),
+    Stage(
+        "build_shg",
+        _build_shg,
+        params=("fortran_folder", "fortran_profile", "subtract_offsets"),
+        products=lambda c: [
+            for_compiler.executable_path(
+                c["fortran_folder"],
+                "second_harmonic_generation",
+                c["fortran_profile"],
+                _shg_defines(c),
+            )
+        ],
+        sources=_shg_sources,
+    ),
+    Stage(
+        "shg",
+        _shg,
+        requires=("build_shg", "write_c11", "write_c33", "write_c44", "input"),
+        products=lambda c: [_shg_files(c)[1]],
+    ),
+    Stage(
+        "ssc_input",
+        _ssc_input,
+        requires=("shg",),
+        params=("bin_width",),
+        products=lambda c: [
+            input_folder / c["date"] / f"e_fish_signal_{c['pos_volt']}.dat",
+            _ssc_files(c)[0],
+        ],
+    ),
+    Stage(
+        "build_ssc",
+        _build_ssc,
+        params=("fortran_folder", "fortran_profile"),
+        products=lambda c: [
+            for_compiler.executable_path(c["fortran_folder"], "stud_stat_calc", _ssc_profile(c))
+        ],
+        sources=_ssc_sources,
+    ),
+    Stage("ssc", _ssc, requires=("build_ssc", "ssc_input"), products=lambda c: [_ssc_files(c)[1]]),
+    Stage("store", _store, requires=("time", "discharge", "shg")),
+]
+
+
+def _shots(config):
+    records = streaming.c1_shots(
+        Path(config["data_path"]),
+        trigger_up=config["trigger_up"],
+        window_size=config["window_size"],
+        n_elements=config["n_elements"],
+        compact=config["compact"],
+        pos_path=config["data_path"],
+        subtract_offsets=config["subtract_offsets"],
+    )
+    return streaming.shot_table(records)
+
+
+def _shot_times(config, df_shots):
+    return streaming.shot_times(df_shots)
+
+
+def _shot_discharges(config, df_shots):
+    return streaming.shot_discharges(df_shots)
+
+
+def _features(config, df_discharge):
+    records = streaming.laser_shots(
+        Path(config["data_path"]),
+        df_discharge,
+        compact=config["compact"],
+        pos_path=config["data_path"],
+        subtract_offsets=config["subtract_offsets"],
+    )
+    return streaming.shot_table(records)
+
+
+def _feature_intervals(config, df_features):
+    return streaming.intervals(df_features)
+
+
+# Same run, but the C1, C2 and C3 shots flow one at a time through the per-shot stages, which keep only
+# per-shot results; the C11, C33 and C44 files are written on the way under their final names
+STREAMING_STAGES = [
+    *[i for i in STAGES if i.name == "missing"],
+    Stage(
+        "shots",
+        _shots,
+        params=(
+            "data_path",
+            "compact",
+            "window_size",
+            "trigger_up",
+            "n_elements",
+            "subtract_offsets",
+        ),
+        raw=("C1",),
+        writes=True,
+    ),
+    Stage("time", _shot_times, requires=("shots",)),
+    Stage("discharge", _shot_discharges, requires=("shots",)),
+    Stage(
+        "features",
+        _features,
+        requires=("discharge",),
+        params=("compact", "subtract_offsets"),
+        raw=("C2", "C3"),
+        writes=True,
+    ),
+    Stage("intervals", _feature_intervals, requires=("features",)),
+    *[i for i in STAGES if i.name in ("input", "build_shg")],
+    Stage(
+        "shg",
+        _shg,
+        requires=("build_shg", "shots", "features", "input"),
+        products=lambda c: [_shg_files(c)[1]],
+    ),
+    *[i for i in STAGES if i.name in ("ssc_input", "build_ssc", "ssc", "store")],
+]
+
+
+def stage_list(config: dict) -> list:
+    """
+    Returns the stages of a run: 'STREAMING_STAGES' if its 'streaming' parameter is set, else 'STAGES'.
+    """
+
+    return STREAMING_STAGES if settings(config)["streaming"] else STAGES
+
+
+def checkpoint_dir(config: dict) -> Path:
+    """
+    Returns the folder of the checkpoints of a run, by default 'data/<date>/checkpoints/<pos_volt>'.
+    """
+
+    if config.get("checkpoint_dir"):
+        return Path(config["checkpoint_dir"])
+    return input_folder / config["date"] / "checkpoints" / config["pos_volt"]
+
+
+def fingerprint(folder: Path, channels: tuple) -> str:
+    """
+    Hashes the names, sizes and modification times of the files of some channels in a folder,
+    or the size and modification time of an archive of the folder.
+
+    Notes:
+    ------
+    - Only the files of 'channels' are hashed, so the C11/C33/C44 files written in the same folder
+      do not invalidate the stages reading the raw channels.
+    """
+
+    digest = hashlib.sha256()
+    if folder.is_file():  # an archive of the folder
+        stat = folder.stat()
+        digest.update(f"{folder.name};{stat.st_size};{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()
+    with os.scandir(folder) as entries:
+        files = sorted(
+            (i.name, i.stat().st_size, i.stat().st_mtime_ns)
+            for i in entries
+            if i.is_file() and i.name.split("-")[0] in channels
+        )
+    for name, size, mtime in files:
+        digest.update(f"{name};{size};{mtime}\n".encode())
+    return digest.hexdigest()
+
+
+def stage_keys(config: dict, stages: list | None = None) -> dict:
+    """
+    Computes the key of every stage from its parameters, the keys of the stages it requires
+    and the fingerprint of the raw files it reads.
+
+    Returns:
+    --------
+    dict
+        Mapping from stage name to key; a checkpoint is valid if it was written with the same key.
+    """
+
+    config = settings(config)
+    keys = {}
+    for stage in stages or stage_list(config):
+        content = {
+            "stage": stage.name,
+            "params": {i: config[i] for i in stage.params},
+            "requires": [keys[i] for i in stage.requires],
+        }
+        if stage.raw:
+            content["raw"] = fingerprint(input_folder / Path(config["data_path"]), stage.raw)
+        if stage.sources:
+            content["sources"] = [
+                (str(i), i.stat().st_size, i.stat().st_mtime_ns) if i.exists() else str(i)
+                for i in map(Path, stage.sources(config))
+            ]
+        keys[stage.name] = hashlib.sha256(
+            json.dumps(content, sort_keys=True, default=str).encode()
+        ).hexdigest()
+    return keys
+
+
+def _valid(stage: Stage, config: dict, key: str) -> bool:
+    path = checkpoint_dir(config) / f"{stage.name}.json"
+    if not path.exists():
+        return False
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint["key"] != key:
+        return False
+    frame = checkpoint_dir(config) / f"{stage.name}.parquet"
+    if checkpoint["kind"] == "frame" and not frame.exists():
+        return False
+    written = checkpoint.get("files") if checkpoint["kind"] == "frame" else checkpoint["value"]
+    if stage.writes and (written is None or not all(Path(i).exists() for i in written)):
+        return False
+    return all(Path(i).exists() for i in (stage.products(config) if stage.products else []))
+
+
+def _save(stage: Stage, config: dict, key: str, result):
+    folder = checkpoint_dir(config)
+    folder.mkdir(parents=True, exist_ok=True)
+    checkpoint = {"key": key}
+    if isinstance(result, pd.DataFrame):
+        result.to_parquet(folder / f"{stage.name}.parquet")
+        checkpoint["kind"] = "frame"
+        if stage.writes:
+            columns = [i for i in result.columns if i.endswith("_file")]
+            checkpoint["files"] = [i for column in columns for i in result[column].dropna()]
+    else:
+        checkpoint["kind"] = "value"
+        checkpoint["value"] = result
+    # The marker is written last, so an interrupted save leaves no valid checkpoint
+    with open(folder / f"{stage.name}.json.tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(folder / f"{stage.name}.json.tmp", folder / f"{stage.name}.json")
+
+
+def _restore(stage: Stage, config: dict):
+    folder = checkpoint_dir(config)
+    with open(folder / f"{stage.name}.json") as f:
+        checkpoint = json.load(f)
+    if checkpoint["kind"] == "frame":
+        return pd.read_parquet(folder / f"{stage.name}.parquet")
+    return checkpoint["value"]
+
+
+def status(config: dict | None = None, stages: list | None = None) -> pd.DataFrame:
+    """
+    Reports which stages have a valid checkpoint.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per stage with its requirements and whether it would be skipped by 'run'.
+    """
+
+    config = settings(config)
+    stages = stages or stage_list(config)
+    keys = stage_keys(config, stages)
+    return pd.DataFrame(
+        {
+            "stage": [i.name for i in stages],
+            "requires": [", ".join(i.requires) for i in stages],
+            "checkpoint": [_valid(i, config, keys[i.name]) for i in stages],
+        }
+    )
+
+
+def _call(stage: Stage, config: dict, *args):
+    if inspect.iscoroutinefunction(stage.function):
+        return asyncio.run(stage.function(config, *args))
+    return stage.function(config, *args)
+
+
+def ancestors(stages: list, name: str) -> set:
+    """
+    Returns the names of the stages 'name' depends on, directly or not, and 'name' itself.
+    """
+
+    by_name = {i.name: i for i in stages}
+    selected, pending = set(), [name]
+    while pending:
+        stage = pending.pop()
+        if stage not in selected:
+            selected.add(stage)
+            pending.extend(by_name[stage].requires)
+    return selected
+
+
+def critical_path(stages: list, durations: dict) -> tuple:
+    """
+    Finds the chain of dependent stages with the longest total duration, which bounds the wall time of a parallel run.
+
+    Parameters:
+    -----------
+    stages : list of Stage
+        The stages in dependency order.
+    durations : dict
+        Mapping from stage name to duration in seconds; stages missing from it count as 0.
+
+    Returns:
+    --------
+    tuple
+        (names of the stages of the path in order, total duration in seconds).
+    """
+
+    finish, previous = {}, {}
+    for stage in stages:
+        before = max(
+            (i for i in stage.requires if i in finish), key=finish.get, default=None
+        )
+        previous[stage.name] = before
+        finish[stage.name] = durations.get(stage.name, 0.0) + (finish[before] if before else 0.0)
+    if not finish:
+        return [], 0.0
+    name = max(finish, key=finish.get)
+    total, path = finish[name], []
+    while name is not None:
+        path.append(name)
+        name = previous[name]
+    return path[::-1], total
+
+
+async def _run_graph(config, stages, keys, force, workers) -> tuple:
+    """
+    Runs every stage as soon as the stages it requires are done; see 'run'.
+
+    Returns:
+    --------
+    tuple
+        (mapping from stage name to "cached" or "ran", mapping from stage name to duration in seconds).
+    """
+
+    loop = asyncio.get_running_loop()
+    by_name = {i.name: i for i in stages}
+    results, restoring, tasks = {}, {}, {}
+    report, durations = {}, {}
+
+    async def result(name, threads):
+        if name not in results:
+            if name not in restoring:
+                restoring[name] = loop.run_in_executor(threads, _restore, by_name[name], config)
+            results[name] = await restoring[name]
+        return results[name]
+
+    async def execute(stage, threads, processes):
+        # True if the stage ran, so that the stages depending on it run as well
+        reran = await asyncio.gather(*(tasks[i] for i in stage.requires))
+        if stage.name not in force and not any(reran):
+            if _valid(stage, config, keys[stage.name]):
+                report[stage.name] = "cached"
+                print(f"[{stage.name}] checkpoint is up to date, skipped")
+                return False
+        args = [await result(i, threads) for i in stage.requires]
+        print(f"[{stage.name}] running")
+        start = perf_counter()
+        if inspect.iscoroutinefunction(stage.function):
+            value = await stage.function(config, *args)
+        else:
+            pool = processes if stage.executor == "process" else threads
+            value = await loop.run_in_executor(pool, stage.function, config, *args)
+        durations[stage.name] = perf_counter() - start
+        results[stage.name] = value
+        await loop.run_in_executor(threads, _save, stage, config, keys[stage.name], value)
+        report[stage.name] = "ran"
+        print(f"[{stage.name}] done in {durations[stage.name]:.1f} s")
+        return True
+
+    # Worker processes are spawned rather than forked, since the reader threads of other stages may hold locks
+    with concurrent.futures.ThreadPoolExecutor(workers) as threads, concurrent.futures.ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context("spawn")
+    ) as processes:
+        for stage in stages:
+            tasks[stage.name] = asyncio.ensure_future(execute(stage, threads, processes))
+        outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    # The checkpoints of the stages that succeeded are saved, so the next run resumes after them
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+    return report, durations
+
+
+def run(
+    config: dict | None = None,
+    stages: list | None = None,
+    force: tuple = (),
+    until: str | None = None,
+    parallel: bool | None = None,
+) -> dict:
+    """
+    Runs the pipeline, skipping the stages whose checkpoint matches their inputs and parameters.
+
+    Parameters:
+    -----------
+    config : dict, optional
+        The parameters of the run, see 'DEFAULTS'.
+    stages : list of Stage, optional
+        The stages in dependency order, default is 'STAGES', or 'STREAMING_STAGES' with the 'streaming' parameter.
+    force : tuple of str, optional
+        Stages to rerun even if their checkpoint is valid; the stages depending on them are rerun too.
+    until : str, optional
+        Stops after this stage, default runs every stage.
+    parallel : bool, optional
+        If True, every stage starts as soon as the stages it requires are done, so that independent stages
+        (e.g. the C11, C33 and C44 writes, the C2 and C3 loads and the Fortran builds) overlap. Default is the
+        'parallel' parameter of the configuration; its 'workers' parameter sets the size of the pools.
+
+    Returns:
+    --------
+    dict
+        Mapping from stage name to "cached" or "ran".
+
+    Side Effects:
+    -------------
+    - Writes the checkpoint of every stage that ran into 'checkpoint_dir(config)': a parquet file for
+      DataFrames, otherwise the value in the JSON marker of the stage.
+    - In parallel, prints the critical path: the chain of dependent stages with the longest duration,
+      to be compared with the wall time and the total time of the stages.
+
+    Notes:
+    ------
+    - After a failure, running again with the same configuration resumes at the failed stage, since the
+      checkpoints of the completed stages are still valid. In parallel, the stages not depending on the
+      failed one still run to completion before the error is raised.
+    - The results of skipped stages are only read back from their checkpoint if a later stage needs them.
+    - In parallel, 'until' runs only the stages it depends on, instead of every stage listed before it.
+    """
+
+    config = settings(config)
+    stages = stages or stage_list(config)
+    by_name = {i.name: i for i in stages}
+    keys = stage_keys(config, stages)
+    if until is not None and until not in by_name:
+        raise ValueError(f"Unknown stage: {until}")
+
+    if config["parallel"] if parallel is None else parallel:
+        if until is not None:
+            selected = ancestors(stages, until)
+            stages = [i for i in stages if i.name in selected]
+        start = perf_counter()
+        report, durations = asyncio.run(
+            _run_graph(config, stages, keys, set(force), config["workers"])
+        )
+        wall = perf_counter() - start
+        path, length = critical_path(stages, durations)
+        if path:
+            print(
+                f"Critical path: {' -> '.join(path)} ({length:.1f} s); wall time {wall:.1f} s, "
+                f"sum of the stages {sum(durations.values()):.1f} s"
+            )
+        return {i.name: report[i.name] for i in stages}
+
+    results = {}
+    report = {}
+    rerun = set(force)
+
+    def result(name):
+        if name not in results:
+            results[name] = _restore(by_name[name], config)
+        return results[name]
+
+    for stage in stages:
+        if stage.name not in rerun and not rerun & set(stage.requires):
+            if _valid(stage, config, keys[stage.name]):
+                report[stage.name] = "cached"
+                print(f"[{stage.name}] checkpoint is up to date, skipped")
+                if stage.name == until:
+                    break
+                continue
+        rerun.add(stage.name)
+        print(f"[{stage.name}] running")
+        results[stage.name] = _call(stage, config, *[result(i) for i in stage.requires])
+        _save(stage, config, keys[stage.name], results[stage.name])
+        report[stage.name] = "ran"
+        if stage.name == until:
+            break
+    return report
@@ -1,22 +1,35 @@
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+from pathlib import Path
+import os
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from . import decimate
+
+# Above this number of points per line, plots are decimated with 'decimate.minmax'
+MAX_POINTS = 20000
 
 
 def plot_signals(df: pd.DataFrame, file_number: int):
     df = df.query(f"file_number=={file_number}")
+    # Lines are decimated above MAX_POINTS points
+    lines = {
+        column: decimate.minmax(df.time.values * 1e9, df[column].values, MAX_POINTS)
+        for column in ("incident", "reflected", "transmitted")
+    }
 
     plt.figure(figsize=(10, 5))
     plt.plot(
-        df.time * 1e9,
-        df.incident,
+        *lines["incident"],
         color="#D17E00",
         linestyle="-",
         linewidth=3,
         label="Incident",
     )
     plt.plot(
-        df.time * 1e9,
-        df.reflected,
+        *lines["reflected"],
         color="#4A90E2",
         linestyle="-",
         linewidth=3,
@@ -30,9 +43,7 @@ def plot_signals(df: pd.DataFrame, file_number: int):
         linestyle="-.",
         label="Trigger value",
     )
-    plt.plot(
-        df.time * 1e9, df.transmitted, color="g", linestyle="--", label="Deposited"
-    )
+    plt.plot(*lines["transmitted"], color="g", linestyle="--", label="Deposited")
     plt.legend(loc="best", fontsize=15)
     # plt.grid(True, which="both", linestyle="--", linewidth=0.5)
     plt.xticks(fontsize=18)
@@ -44,8 +55,117 @@ def plot_signals(df: pd.DataFrame, file_number: int):
     return 0
 
 
+def _render_shots(args):
+    """
+    Renders the diagnostic plots of a block of shots, reusing a single Agg figure and its artists.
+    """
+
+    shots, blocks, path, fmt, trigger = args
+
+    fig = Figure(figsize=(10, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    (incident,) = ax.plot([], [], color="#D17E00", linestyle="-", linewidth=3, label="Incident")
+    (reflected,) = ax.plot([], [], color="#4A90E2", linestyle="-", linewidth=3, label="Reflected")
+    (trigger_line,) = ax.plot([], [], color="k", linestyle="-.", label="Trigger value")
+    (transmitted,) = ax.plot([], [], color="g", linestyle="--", label="Deposited")
+    ax.legend(loc="best", fontsize=15)
+    ax.tick_params(labelsize=18)
+    ax.set_xlabel("Time, ns", fontsize=20)
+    ax.set_ylabel("Voltage, a.u.", fontsize=20)
+    title = ax.set_title("", fontsize=25)
+    fig.tight_layout()
+
+    written = []
+    for shot, (time, incident_values, reflected_values, transmitted_values) in zip(
+        shots, blocks
+    ):
+        time = time * 1e9
+        incident.set_data(time, incident_values)
+        reflected.set_data(time, reflected_values)
+        transmitted.set_data(time, transmitted_values)
+        trigger_line.set_data([time.min(), time.max()], [trigger, trigger])
+        title.set_text(f"Shot {shot}")
+        ax.relim()
+        ax.autoscale_view()
+        filename = Path(path) / f"shot_{shot:05d}.{fmt}"
+        fig.savefig(filename)
+        written.append(filename)
+    return written
+
+
+def plot_signals_batch(
+    df: pd.DataFrame,
+    file_numbers,
+    path: str,
+    fmt: str = "png",
+    trigger: float = 0.05,
+    max_workers: int | None = None,
+) -> list:
+    """
+    Exports the diagnostic plot of 'plot_signals' for many shots at once.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        DataFrame with the columns 'file_number', 'time', 'incident', 'reflected' and 'transmitted',
+        e.g. the output of 'transmitted.compute_pulse'.
+    file_numbers : iterable of int
+        The shots to plot.
+    path : str
+        The directory where the plots are saved as 'shot_#####.<fmt>'.
+    fmt : str, optional
+        The image format, e.g. "png" or "pdf", default is "png".
+    trigger : float, optional
+        The trigger value drawn as a horizontal line, default is 0.05.
+    max_workers : int, optional
+        Number of worker processes, default is the number of processors.
+
+    Returns:
+    --------
+    list
+        The paths of the written files.
+
+    Notes:
+    ------
+    - The DataFrame is indexed once by shot instead of being queried for every shot.
+    - Every worker creates one Agg figure, without pyplot, and only updates its artists with 'set_data',
+      so no figure is leaked.
+    """
+
+    Path(path).mkdir(parents=True, exist_ok=True)
+
+    # Index the shots once
+    order = np.argsort(df.file_number.values, kind="stable")
+    numbers = df.file_number.values[order]
+    columns = [df[i].values[order] for i in ("time", "incident", "reflected", "transmitted")]
+    shots = [i for i in dict.fromkeys(int(j) for j in file_numbers)]
+    starts = np.searchsorted(numbers, shots, side="left")
+    ends = np.searchsorted(numbers, shots, side="right")
+    blocks = [tuple(c[a:b] for c in columns) for a, b in zip(starts, ends)]
+    selected = [(i, b) for i, b in zip(shots, blocks) if len(b[0])]
+    shots = [i for i, _ in selected]
+    blocks = [b for _, b in selected]
+
+    n_workers = max_workers or os.cpu_count() or 1
+    chunk = max(1, -(-len(shots) // n_workers))
+    tasks = [
+        (shots[i : i + chunk], blocks[i : i + chunk], path, fmt, trigger)
+        for i in range(0, len(shots), chunk)
+    ]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        written = [f for files in executor.map(_render_shots, tasks) for f in files]
+    return written
+
+
 # Simple name for a proper namespace
-def e_fish(df_signal: pd.DataFrame, df_stat: pd.DataFrame, position: int, voltage: int):
+def e_fish(
+    df_signal: pd.DataFrame,
+    df_stat: pd.DataFrame,
+    position: int,
+    voltage: int,
+    error_source: str = "student",
+):
     """
     Plots the E-FISH signal as a function of time with data points and statistical averages, including error bars.
 
@@ -60,10 +180,13 @@ def e_fish(df_signal: pd.DataFrame, df_stat: pd.DataFrame, position: int, voltag
         - 'binns': Time bins in nanoseconds.
         - 'mean': Mean E-FISH signal for each bin.
         - 'error': Standard error for each bin.
+        With 'error_source="bootstrap"', the columns 'lower' and 'upper' of 'stats.bootstrap' are used instead of 'error'.
     position : int
         The point at which measurements where performed in the experimental setup.
     voltage : int
         The applied voltage in kilovolts (kV) during the measurement.
+    error_source : str, optional
+        Either "student" (SSC error, default) or "bootstrap" (bootstrap confidence interval).
 
     Returns:
     --------
@@ -81,8 +204,23 @@ def e_fish(df_signal: pd.DataFrame, df_stat: pd.DataFrame, position: int, voltag
     - The plot title indicates the position and voltage used in the experiment.
     - The function modifies the appearance of the plot by hiding the top and right spines and positioning the bottom and left spines outward.
     - Tick labels and axis labels are styled with increased font sizes for better readability.
+    - Above 'MAX_POINTS' data points, only the minimum and maximum of every time bucket are drawn.
     """
 
+    if error_source == "bootstrap":
+        yerr = [df_stat["mean"] - df_stat["lower"], df_stat["upper"] - df_stat["mean"]]
+    elif error_source == "student":
+        yerr = df_stat["error"]
+    else:
+        raise ValueError(f"Unknown error source: {error_source}")
+
+    if len(df_signal) > MAX_POINTS:
+        df_signal = df_signal.sort_values("timens")
+        timens, shg_single = decimate.minmax(
+            df_signal.timens.values, df_signal.shg_single.values, MAX_POINTS
+        )
+        df_signal = pd.DataFrame({"timens": timens, "shg_single": shg_single})
+
     plt.figure(figsize=(10, 5))
     plt.plot(df_signal.timens, df_signal.shg_single, "k.", label="Data points")
     # Adding error bars with enhanced style
@@ -90,7 +228,7 @@ def e_fish(df_signal: pd.DataFrame, df_stat: pd.DataFrame, position: int, voltag
         df_stat.binns,
         df_stat["mean"],
         xerr=0.2,
-        yerr=df_stat["error"],
+        yerr=yerr,
         ecolor="green",
         fmt=".",
         color="green",
@@ -121,3 +259,50 @@ def e_fish(df_signal: pd.DataFrame, df_stat: pd.DataFrame, position: int, voltag
     plt.legend(loc="best", fontsize="15")
 
     plt.tight_layout()
+
+
+def overlay(
+    df: pd.DataFrame | None = None,
+    column: str = "amplitude",
+    t_min: float | None = None,
+    t_max: float | None = None,
+    pyramid: decimate.Pyramid | None = None,
+    max_points: int = MAX_POINTS,
+) -> decimate.Pyramid:
+    """
+    Plots the waveforms of all the shots of a channel on top of each other.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame, optional
+        DataFrame with the columns 'file_number', 'time' and 'column'. Not needed if 'pyramid' is given.
+    column : str, optional
+        The column to plot, default is "amplitude".
+    t_min, t_max : float, optional
+        The time window in seconds, default is the whole record.
+    pyramid : decimate.Pyramid, optional
+        A pyramid returned by an earlier call, so zooming does not rebuild it.
+    max_points : int, optional
+        The maximum number of points drawn over all shots, default is 'MAX_POINTS'.
+
+    Returns:
+    --------
+    decimate.Pyramid
+        The pyramid of the channel, to be passed to later calls with other time windows.
+
+    Notes:
+    ------
+    - Only the level of detail needed for the time window is fetched from the pyramid, see 'decimate.Pyramid.view'.
+    """
+
+    if pyramid is None:
+        pyramid = decimate.Pyramid.from_frame(df, column)
+    time, values = pyramid.view(t_min, t_max, max_points=max_points)
+
+    plt.figure(figsize=(10, 5))
+    plt.plot(time.T * 1e9, values.T, linewidth=0.5, alpha=0.5)
+    plt.xlabel("Time, ns", fontsize=20)
+    plt.ylabel("Voltage, a.u.", fontsize=20)
+    plt.tick_params(labelsize=18)
+    plt.tight_layout()
+    return pyramid
@@ -0,0 +1,273 @@
+import numpy as np
+import pandas as pd
+
+
+class Ragged:
+    """
+    CSR-style container for shots of different lengths.
+
+    The samples of all shots are stored in flat column buffers, shot after shot. The samples of the i-th shot
+    are 'offsets[i]:offsets[i + 1]' and its file number is 'shots[i]'. Per-shot reductions use
+    'ufunc.reduceat' on the offsets instead of a pandas groupby.
+
+    Parameters:
+    -----------
+    columns : dict
+        Mapping from column name to a flat array holding the samples of all shots.
+    offsets : np.ndarray
+        Start of every shot in the flat arrays, followed by the total number of samples.
+    shots : np.ndarray
+        The file number of every shot.
+    """
+
+    def __init__(self, columns: dict, offsets: np.ndarray, shots: np.ndarray):
+        self.columns = columns
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.shots = np.asarray(shots)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns=None) -> "Ragged":
+        """
+        Builds the container from a DataFrame with a 'file_number' column.
+
+        Parameters:
+        -----------
+        df : pd.DataFrame
+            The DataFrame, sorted by 'file_number' (otherwise it is stably reordered by shot).
+        columns : list of str, optional
+            The columns to keep, default is every column except 'file_number'.
+
+        Returns:
+        --------
+        Ragged
+            The container, with the shots in increasing file number.
+        """
+
+        if columns is None:
+            columns = [i for i in df.columns if i != "file_number"]
+        file_number = df.file_number.values
+        order = None
+        if len(file_number) and np.any(np.diff(file_number) < 0):
+            order = np.argsort(file_number, kind="stable")
+            file_number = file_number[order]
+        shots, starts = np.unique(file_number, return_index=True)
+        return cls(
+            {
+                i: df[i].values if order is None else df[i].values[order]
+                for i in columns
+            },
+            np.append(starts, len(file_number)),
+            shots,
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the samples as a DataFrame with a 'file_number' column followed by the other columns.
+        """
+
+        return pd.DataFrame(
+            {"file_number": self.repeat(self.shots)} | dict(self.columns)
+        )
+
+    def __len__(self) -> int:
+        return len(self.shots)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def time_at(self, index: np.ndarray) -> np.ndarray:
+        """
+        Returns the time of the samples at some flat positions.
+        """
+
+        return self.columns["time"][index]
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self.offsets[:-1]
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def segment_ids(self) -> np.ndarray:
+        """
+        Position of the shot of every sample.
+        """
+
+        return np.repeat(np.arange(len(self.shots)), self.lengths)
+
+    def repeat(self, values: np.ndarray) -> np.ndarray:
+        """
+        Broadcasts one value per shot to every sample of the shot.
+        """
+
+        return np.repeat(np.asarray(values), self.lengths)
+
+    def reduce(self, ufunc: np.ufunc, column: str | np.ndarray) -> np.ndarray:
+        """
+        Reduces a column (or a flat array) over every shot with 'ufunc.reduceat', e.g. np.minimum.
+
+        Notes:
+        ------
+        - Every shot must hold at least one sample.
+        """
+
+        values = self.columns[column] if isinstance(column, str) else column
+        return ufunc.reduceat(values, self.starts)
+
+    def mean(self, column: str | np.ndarray) -> np.ndarray:
+        """
+        Mean of a column over every shot, ignoring NaN as pandas does.
+        """
+
+        values = self.columns[column] if isinstance(column, str) else column
+        valid = ~np.isnan(values)
+        return self.reduce(np.add, np.where(valid, values, 0)) / self.reduce(
+            np.add, valid.astype(np.int64)
+        )
+
+    def select(self, mask: np.ndarray) -> "Ragged":
+        """
+        Keeps the samples where 'mask' is True; shots left without samples are dropped.
+        """
+
+        lengths = np.bincount(self.segment_ids[mask], minlength=len(self.shots))
+        keep = lengths > 0
+        return Ragged(
+            {i: v[mask] for i, v in self.columns.items()},
+            np.append(0, np.cumsum(lengths[keep])),
+            self.shots[keep],
+        )
+
+
+class Regular(Ragged):
+    """
+    Ragged container of uniformly sampled shots whose time axis is implicit.
+
+    Every shot stores only its first time 't0[i]' and its timestep 'dt[i]', the number of samples being its
+    length: the time of its k-th sample is 't0[i] + k * dt[i]', as the Fortran code assumes with
+    'timestep=(signalwbgd(2,1)-signalwbgd(1,1))'. Shifting a shot in time updates 't0' without touching the
+    columns, and aligning two shots on the same timestep is index arithmetic.
+
+    Parameters:
+    -----------
+    columns : dict
+        Mapping from column name to a flat array holding the samples of all shots; there is no 'time' column.
+    offsets, shots : np.ndarray
+        See 'Ragged'.
+    t0, dt : np.ndarray
+        The first time and the timestep of every shot.
+
+    Notes:
+    ------
+    - 'self["time"]' builds the time column on demand, so the methods of 'Ragged' keep working;
+      use 'time_at' to get the time of a few samples only.
+    """
+
+    def __init__(self, columns, offsets, shots, t0, dt):
+        super().__init__(columns, offsets, shots)
+        self.t0 = np.asarray(t0, dtype=np.float64)
+        self.dt = np.asarray(dt, dtype=np.float64)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns=None, rtol: float = 1e-2) -> "Regular":
+        """
+        Builds the container from a DataFrame with the columns 'file_number' and 'time'.
+
+        Parameters:
+        -----------
+        df : pd.DataFrame
+            The DataFrame, sorted by 'file_number' and by time within every shot.
+        columns : list of str, optional
+            The columns to keep, default is every column except 'file_number' and 'time'.
+        rtol : float, optional
+            Largest deviation of a time from the regular axis, as a fraction of the timestep. Default is 1e-2,
+            which absorbs the rounding of the times printed in the exported CSV files.
+
+        Exceptions:
+        -----------
+        ValueError
+            Raised if a shot is not uniformly sampled.
+        """
+
+        if columns is None:
+            columns = [i for i in df.columns if i not in ("file_number", "time")]
+        signal = Ragged.from_frame(df, ["time"] + list(columns))
+        time = signal.columns.pop("time")
+        t0 = time[signal.starts]
+        last = time[signal.offsets[1:] - 1]
+        dt = np.where(signal.lengths > 1, (last - t0) / np.maximum(signal.lengths - 1, 1), 1.0)
+        regular = cls(signal.columns, signal.offsets, signal.shots, t0, dt)
+        deviation = np.abs(time - regular["time"]) / regular.repeat(dt)
+        if len(deviation) and deviation.max() > rtol:
+            shot = regular.shots[regular.segment_ids[np.argmax(deviation)]]
+            raise ValueError(f"Shot {shot} is not uniformly sampled")
+        return regular
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the samples as a DataFrame with the columns 'file_number', 'time' and the other columns.
+        """
+
+        return pd.DataFrame(
+            {"file_number": self.repeat(self.shots), "time": self["time"]} | dict(self.columns)
+        )
+
+    @property
+    def positions(self) -> np.ndarray:
+        """
+        Position of every sample within its shot.
+        """
+
+        return np.arange(self.offsets[-1]) - self.repeat(self.starts)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        if column == "time":
+            return self.repeat(self.t0) + self.repeat(self.dt) * self.positions
+        return self.columns[column]
+
+    def time_at(self, index: np.ndarray) -> np.ndarray:
+        """
+        Returns the time of the samples at some flat positions, without building the time column.
+        """
+
+        segment = np.searchsorted(self.offsets, index, side="right") - 1
+        return self.t0[segment] + self.dt[segment] * (index - self.starts[segment])
+
+    def shift(self, offset) -> "Regular":
+        """
+        Returns the shots shifted in time by 'offset' (a scalar or one value per shot); the columns are shared.
+        """
+
+        return Regular(self.columns, self.offsets, self.shots, self.t0 + offset, self.dt)
+
+    def window(self, first: np.ndarray, stop: np.ndarray) -> "Regular":
+        """
+        Keeps the samples 'first[i]:stop[i]' of every shot, which stay uniformly sampled;
+        shots left without samples are dropped.
+        """
+
+        first = np.clip(first, 0, self.lengths)
+        stop = np.clip(stop, first, self.lengths)
+        keep = stop > first
+        first, stop = first[keep], stop[keep]
+        lengths = stop - first
+        offsets = np.append(0, np.cumsum(lengths))
+        index = np.arange(offsets[-1]) + np.repeat(self.starts[keep] + first - offsets[:-1], lengths)
+        return Regular(
+            {i: v[index] for i, v in self.columns.items()},
+            offsets,
+            self.shots[keep],
+            self.t0[keep] + first * self.dt[keep],
+            self.dt[keep],
+        )
+
+    def select(self, mask: np.ndarray) -> Ragged:
+        """
+        Keeps the samples where 'mask' is True. The result is a 'Ragged' container with an explicit time column,
+        since an arbitrary selection is not uniformly sampled; see 'window' for contiguous selections.
+        """
+
+        return Ragged(self.columns | {"time": self["time"]}, self.offsets, self.shots).select(mask)
@@ -0,0 +1,98 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+import numpy as np
+import pandas as pd
+from . import shm
+
+
+def _run_shard(task):
+    """
+    Rebuilds the frames of one block of shots in a worker and runs the stage on them.
+    """
+
+    stage, frames, args, kwargs = task
+    rebuilt = [shm.read_frame(frame) if kind == "rows" else frame for kind, frame in frames]
+    # Stages building new frames align by position, so the block gets a RangeIndex as a whole frame would
+    index = next(frame.index for (kind, _), frame in zip(frames, rebuilt) if kind == "rows")
+    for (kind, _), frame in zip(frames, rebuilt):
+        if kind == "rows":
+            frame.reset_index(drop=True, inplace=True)
+    result = stage(*rebuilt, *args, **kwargs)
+    if isinstance(result, pd.DataFrame) and len(result) == len(index):
+        result.index = index
+    return result
+
+
+def run_sharded(
+    stage,
+    frames: tuple,
+    *args,
+    n_shards: int | None = None,
+    max_workers: int | None = None,
+    ignore_index: bool = False,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    Runs a per-shot stage on contiguous blocks of shots in a process pool and reassembles the results in shot order.
+
+    Parameters:
+    -----------
+    stage : callable
+        A module-level function taking the frames followed by '*args' and '**kwargs', e.g. 'load.avg_amplitude',
+        'time.shift_reflected_pulse', 'transmitted.compute_pulse' or 'transmitted.get_discharge_times'.
+        Every shot must be processed independently of the others.
+    frames : tuple of pd.DataFrame
+        The DataFrames passed first to the stage. Frames with a 'file_number' column are split by rows;
+        the others (e.g. 'df_time') must be indexed by file number and are split with '.loc'.
+    *args, **kwargs
+        Further arguments passed to the stage.
+    n_shards : int, optional
+        Number of blocks of shots, default is the number of workers.
+    max_workers : int, optional
+        Number of worker processes, default is the number of processors.
+    ignore_index : bool, optional
+        If True, the concatenated result gets a new RangeIndex, as for stages returning a new number of rows,
+        e.g. 'transmitted.compute_pulse' and 'transmitted.get_discharge_times'. Default is False.
+
+    Returns:
+    --------
+    pd.DataFrame
+        The concatenated results of all blocks, in shot order.
+
+    Notes:
+    ------
+    - The columns of the row-split frames are copied once into shared memory with 'shm'; workers only receive
+      the descriptors of the blocks and their row range instead of a pickled DataFrame.
+    - Row-split frames are passed to the stage with a RangeIndex, as a whole frame read by 'load.get_df', so
+      stages building a new frame and assigning columns to it align them, e.g. 'time.shift_reflected_pulse'.
+      A result with the rows of the first row-split frame gets the original index of the block back.
+    - Row-split frames must be sorted by 'file_number', as the output of 'load.get_df', and hold numeric columns.
+    """
+
+    n_shards = n_shards or max_workers or os.cpu_count() or 1
+    sharded = [i for i in frames if "file_number" in i.columns]
+    shots = np.unique(np.concatenate([i.file_number.values for i in sharded]))
+    blocks = [i for i in np.array_split(shots, min(n_shards, len(shots))) if len(i)]
+
+    with shm.session() as segments:
+        published = [
+            shm.publish_frame(frame, segments) if "file_number" in frame.columns else frame
+            for frame in frames
+        ]
+
+        tasks = []
+        for block in blocks:
+            shard_frames = []
+            for frame in published:
+                if isinstance(frame, dict):
+                    shard_frames.append(("rows", shm.frame_rows(frame, block[0], block[-1])))
+                else:
+                    shard_frames.append(
+                        ("index", frame.loc[frame.index.intersection(block)])
+                    )
+            tasks.append((stage, shard_frames, args, kwargs))
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_run_shard, tasks))
+
+    return pd.concat(results, ignore_index=ignore_index)
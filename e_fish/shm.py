@@ -0,0 +1,182 @@
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+
+# Blocks attached by this process, by name; a worker attaches every block once and keeps it until 'detach'
+_attached = {}
+
+
+@contextmanager
+def session():
+    """
+    Context manager owning the shared memory blocks published within it.
+
+    Yields:
+    -------
+    list
+        The list of blocks to pass to 'publish'.
+
+    Side Effects:
+    -------------
+    - On exit, also on error, every block is closed and unlinked: its name disappears at once and the memory
+      is released when the last worker mapping it exits.
+
+    Notes:
+    ------
+    - Worker pools using the blocks must be shut down inside the session, e.g. with a nested
+      'with ProcessPoolExecutor() as executor:'.
+    """
+
+    blocks = []
+    try:
+        yield blocks
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def publish(array: np.ndarray, blocks: list) -> dict:
+    """
+    Copies an array into a new shared memory block and returns its descriptor.
+
+    Parameters:
+    -----------
+    array : np.ndarray
+        A numeric array, e.g. a column of the DataFrame of a channel.
+    blocks : list
+        The blocks of the current 'session', to which the new block is added.
+
+    Returns:
+    --------
+    dict
+        The descriptor of the array: 'name' of the block, 'shape', 'dtype', the rows 'start' and 'stop'
+        handed to a worker (all of them here) and the 'shots' (first, last) they hold, None if not known.
+        It is a few hundred bytes whatever the size of the array.
+
+    Exceptions:
+    -----------
+    ValueError
+        Raised for object arrays, which cannot be shared.
+    """
+
+    array = np.ascontiguousarray(array)
+    if array.dtype.hasobject:
+        raise ValueError("Object arrays cannot be published in shared memory")
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    blocks.append(block)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    return {
+        "name": block.name,
+        "shape": array.shape,
+        "dtype": array.dtype.str,
+        "start": 0,
+        "stop": array.shape[0] if array.ndim else 1,
+        "shots": None,
+    }
+
+
+def rows(descriptor: dict, start: int, stop: int, shots: tuple | None = None) -> dict:
+    """
+    Returns the descriptor of the rows 'start:stop' of a published array, holding the shots (first, last).
+    """
+
+    return descriptor | {"start": int(start), "stop": int(stop), "shots": shots}
+
+
+def shot_rows(file_number: np.ndarray, first: int, last: int) -> tuple:
+    """
+    Returns the (start, stop) rows of the shots 'first' to 'last' in a sorted 'file_number' column.
+    """
+
+    return (
+        int(np.searchsorted(file_number, first, side="left")),
+        int(np.searchsorted(file_number, last, side="right")),
+    )
+
+
+def view(descriptor: dict) -> np.ndarray:
+    """
+    Returns the rows of a descriptor as a read-only array mapping the shared memory, without copy.
+
+    Notes:
+    ------
+    - The block is attached on the first call of the process and stays attached, so a worker handling
+      thousands of shots opens every block once.
+    - The view stays valid after the owner's session has unlinked the block, until 'detach'.
+    """
+
+    name = descriptor["name"]
+    if name not in _attached:
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(
+        descriptor["shape"], dtype=np.dtype(descriptor["dtype"]), buffer=_attached[name].buf
+    )[descriptor["start"] : descriptor["stop"]]
+    array.flags.writeable = False
+    return array
+
+
+def read(descriptor: dict) -> np.ndarray:
+    """
+    Returns a writable copy of the rows of a descriptor.
+    """
+
+    return view(descriptor).copy()
+
+
+def detach():
+    """
+    Closes the blocks attached by this process. The views returned by 'view' must have been dropped.
+    """
+
+    while _attached:
+        _attached.popitem()[1].close()
+
+
+def publish_frame(frame: pd.DataFrame, blocks: list) -> dict:
+    """
+    Publishes the index and every column of a DataFrame sorted by 'file_number'.
+
+    Returns:
+    --------
+    dict
+        'index' and 'columns' (name to descriptor), plus the 'file_number' array kept by the owner
+        to cut the frame into shot ranges with 'frame_rows'.
+    """
+
+    return {
+        "file_number": frame.file_number.to_numpy(),
+        "index": publish(frame.index.to_numpy(), blocks),
+        "columns": {name: publish(frame[name].to_numpy(), blocks) for name in frame.columns},
+    }
+
+
+def frame_rows(published: dict, first: int, last: int) -> dict:
+    """
+    Returns the descriptors of the shots 'first' to 'last' of a frame published with 'publish_frame',
+    without the 'file_number' array, to be sent to a worker.
+    """
+
+    start, stop = shot_rows(published["file_number"], first, last)
+    return {
+        "index": rows(published["index"], start, stop, (first, last)),
+        "columns": {
+            name: rows(d, start, stop, (first, last)) for name, d in published["columns"].items()
+        },
+    }
+
+
+def read_frame(descriptors: dict, copy: bool = True) -> pd.DataFrame:
+    """
+    Rebuilds in a worker the DataFrame described by 'frame_rows', keeping its original index.
+    With 'copy=False' the columns are read-only views of the shared memory.
+    """
+
+    get = read if copy else view
+    return pd.DataFrame(
+        {name: get(d) for name, d in descriptors["columns"].items()},
+        index=get(descriptors["index"]),
+        copy=False,
+    )
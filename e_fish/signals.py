@@ -1,5 +1,5 @@
 import pandas as pd
-from sklearn.neighbors import LocalOutlierFactor
+from .ragged import Regular
 
 
 def shift_laser_signal(df: pd.DataFrame, df_discharge: pd.DataFrame) -> pd.DataFrame:
@@ -12,8 +12,15 @@ def shift_laser_signal(df: pd.DataFrame, df_discharge: pd.DataFrame) -> pd.DataF
         DataFrame containing the laser signal data.
     df_discharge : pd.DataFrame
         DataFrame containing the discharge.
+
+    Notes:
+    ------
+    - A 'ragged.Regular' container is shifted by updating the first time of every shot.
     """
 
+    if isinstance(df, Regular):
+        return df.shift(-df_discharge.set_index("file_number").time.reindex(df.shots).values)
+
     df.loc[:, "time"] = (
         df["time"]
         - df_discharge.time.repeat(df.file_number.value_counts().sort_index()).values
@@ -90,13 +97,32 @@ def remove_outliers(df: pd.DataFrame) -> pd.DataFrame:
     - Outliers are labeled as -1, while inliers (non-outliers) are labeled as 1.
     """
 
+    # Filter out the outliers, keeping only the inliers (where label == 1)
+    df = df[outlier_labels(df) == 1]
+    return df
+
+
+def outlier_labels(df: pd.DataFrame):
+    """
+    Labels the rows of a DataFrame with the Local Outlier Factor (LOF) method used by 'remove_outliers'.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        The input DataFrame containing numerical data.
+
+    Returns:
+    --------
+    np.ndarray
+        -1 for outliers and 1 for inliers, one label per row.
+    """
+
+    # scikit-learn is only imported when outliers are actually removed
+    from sklearn.neighbors import LocalOutlierFactor
+
     lof = LocalOutlierFactor(
         n_neighbors=100, contamination="auto"
     )  # Adjust parameters as needed
 
     # Fit the model and predict outliers
-    outlier_labels = lof.fit_predict(df)
-
-    # Filter out the outliers, keeping only the inliers (where label == 1)
-    df = df[outlier_labels == 1]
-    return df
+    return lof.fit_predict(df)
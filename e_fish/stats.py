@@ -0,0 +1,353 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+def assign_bins(timens: np.ndarray, bin_width: float, origin: float) -> np.ndarray:
+    """
+    Assigns each time value to a bin of width 'bin_width' starting at 'origin'.
+
+    Parameters:
+    -----------
+    timens : np.ndarray
+        Time values in nanoseconds.
+    bin_width : float
+        The bin width in nanoseconds.
+    origin : float
+        The start time of the first bin.
+
+    Returns:
+    --------
+    np.ndarray
+        The integer bin index of every time value, bin 0 covering [origin, origin + bin_width).
+    """
+
+    return np.floor((np.asarray(timens, dtype=float) - origin) / bin_width).astype(np.int64)
+
+
+def student_coefficients(n: np.ndarray, t_student: str | None = None, probability: float = 0.95) -> np.ndarray:
+    """
+    Returns the Student coefficients used by the SSC code for bins holding 'n' points.
+
+    Parameters:
+    -----------
+    n : np.ndarray
+        Number of points in each bin.
+    t_student : str, optional
+        Path to the 't_student.dat' table read by the Fortran code (one header line, then 'n t' rows).
+        If None, the coefficients are computed with scipy for 'n - 1' degrees of freedom.
+    probability : float, optional
+        Confidence level used when no table is given, default is 0.95.
+
+    Returns:
+    --------
+    np.ndarray
+        The Student coefficient of every bin, 0 for bins with less than two points.
+    """
+
+    n = np.asarray(n, dtype=np.int64)
+    coefficients = np.zeros(len(n))
+    valid = n > 1
+    if t_student is not None:
+        table = np.loadtxt(t_student, skiprows=1, ndmin=2)
+        lookup = dict(zip(table[:, 0].astype(np.int64), table[:, 1]))
+        coefficients[valid] = [lookup[i] for i in n[valid]]
+    else:
+        from scipy import stats
+
+        coefficients[valid] = stats.t.ppf((1 + probability) / 2, n[valid] - 1)
+    return coefficients
+
+
+class BinnedStatistics:
+    """
+    Incremental per-bin statistics of the E-FISH signal ('timens', 'shg_single').
+
+    Keeps the count, mean and sum of squared deviations (M2) of every time bin using
+    Welford's algorithm, so new shots can be added, and accumulators from other acquisitions
+    or workers can be merged, without re-reading the data already accumulated.
+
+    Parameters:
+    -----------
+    bin_width : float, optional
+        The bin width in nanoseconds, default is 0.2 ns as in the SSC stage.
+    origin : float, optional
+        The start time of the first bin. If None, it is set to the earliest time of the first update,
+        which reproduces the binning of the SSC code for a single acquisition.
+        Accumulators can only be merged if they share 'bin_width' and 'origin'.
+    """
+
+    def __init__(self, bin_width: float = 0.2, origin: float | None = None):
+        self.bin_width = bin_width
+        self.origin = origin
+        self.bins = np.empty(0, dtype=np.int64)
+        self.count = np.empty(0, dtype=np.int64)
+        self.mean = np.empty(0)
+        self.m2 = np.empty(0)
+
+    def update(self, df: pd.DataFrame):
+        """
+        Adds single-shot values to the accumulator.
+
+        Parameters:
+        -----------
+        df : pd.DataFrame
+            DataFrame with the columns 'timens' and 'shg_single', e.g. the output of 'write_shg_for_ssc'.
+
+        Returns:
+        --------
+        BinnedStatistics
+            The updated accumulator.
+        """
+
+        if df.empty:
+            return self
+        if self.origin is None:
+            self.origin = float(df.timens.min())
+
+        bins, inverse = np.unique(
+            assign_bins(df.timens.values, self.bin_width, self.origin),
+            return_inverse=True,
+        )
+        values = df.shg_single.values.astype(float)
+        count = np.bincount(inverse)
+        mean = np.bincount(inverse, weights=values) / count
+        m2 = np.bincount(inverse, weights=(values - mean[inverse]) ** 2)
+
+        self._combine(bins, count, mean, m2)
+        return self
+
+    def merge(self, other: "BinnedStatistics"):
+        """
+        Folds another accumulator into this one.
+
+        Parameters:
+        -----------
+        other : BinnedStatistics
+            Accumulator with the same 'bin_width' and 'origin'.
+
+        Returns:
+        --------
+        BinnedStatistics
+            The updated accumulator.
+        """
+
+        if other.origin is None:
+            return self
+        if self.origin is None:
+            self.origin = other.origin
+        if self.bin_width != other.bin_width or self.origin != other.origin:
+            raise ValueError("Accumulators with different bin_width or origin cannot be merged.")
+
+        self._combine(other.bins, other.count, other.mean, other.m2)
+        return self
+
+    def _combine(self, bins, count, mean, m2):
+        # Chan et al. pairwise update, aligned on the union of both sets of bins
+        all_bins = np.union1d(self.bins, bins)
+        n_a = np.zeros(len(all_bins), dtype=np.int64)
+        mean_a = np.zeros(len(all_bins))
+        m2_a = np.zeros(len(all_bins))
+        position = np.searchsorted(all_bins, self.bins)
+        n_a[position] = self.count
+        mean_a[position] = self.mean
+        m2_a[position] = self.m2
+
+        n_b = np.zeros(len(all_bins), dtype=np.int64)
+        mean_b = np.zeros(len(all_bins))
+        m2_b = np.zeros(len(all_bins))
+        position = np.searchsorted(all_bins, bins)
+        n_b[position] = count
+        mean_b[position] = mean
+        m2_b[position] = m2
+
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        self.bins = all_bins
+        self.count = n
+        self.mean = mean_a + delta * n_b / n
+        self.m2 = m2_a + m2_b + delta**2 * n_a * n_b / n
+
+    def to_frame(self, t_student: str | None = None) -> pd.DataFrame:
+        """
+        Returns the binned statistics in the format written by the SSC code.
+
+        Parameters:
+        -----------
+        t_student : str, optional
+            Path to the Student coefficients table, see 'student_coefficients'.
+
+        Returns:
+        --------
+        pd.DataFrame
+            DataFrame with the columns 'binns' (bin centre in ns), 'mean', 'error' and 'histogram'.
+
+        Notes:
+        ------
+        - As in 'binner_sinner', the error is sqrt(M2 / (n * (n - 1))) times the Student coefficient,
+          and it is zero for bins with a single point.
+        """
+
+        error = np.zeros(len(self.bins))
+        valid = self.count > 1
+        error[valid] = np.sqrt(
+            self.m2[valid] / (self.count[valid] * (self.count[valid] - 1))
+        )
+        error *= student_coefficients(self.count, t_student=t_student)
+
+        origin = 0.0 if self.origin is None else self.origin
+        return pd.DataFrame(
+            {
+                "binns": origin + self.bin_width * (self.bins + 0.5),
+                "mean": self.mean,
+                "error": error,
+                "histogram": self.count,
+            }
+        )
+
+    def save(self, path: str):
+        """
+        Saves the state of the accumulator to a '.npz' file.
+        """
+
+        np.savez(
+            path,
+            bin_width=self.bin_width,
+            origin=np.nan if self.origin is None else self.origin,
+            bins=self.bins,
+            count=self.count,
+            mean=self.mean,
+            m2=self.m2,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BinnedStatistics":
+        """
+        Loads an accumulator saved with 'save'.
+        """
+
+        with np.load(path) as data:
+            origin = float(data["origin"])
+            accumulator = cls(
+                bin_width=float(data["bin_width"]),
+                origin=None if np.isnan(origin) else origin,
+            )
+            accumulator.bins = data["bins"]
+            accumulator.count = data["count"]
+            accumulator.mean = data["mean"]
+            accumulator.m2 = data["m2"]
+        return accumulator
+
+
+def bootstrap(
+    df: pd.DataFrame,
+    bin_width: float = 0.2,
+    origin: float | None = None,
+    n_boot: int = 10000,
+    confidence: float = 0.95,
+    seed: int | None = None,
+    chunk_size: int = 1000,
+) -> pd.DataFrame:
+    """
+    Computes bootstrap confidence intervals of the mean E-FISH signal in every time bin.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        DataFrame with the columns 'timens' and 'shg_single'.
+    bin_width : float, optional
+        The bin width in nanoseconds, default is 0.2 ns.
+    origin : float, optional
+        The start time of the first bin, default is the earliest time as in the SSC code.
+    n_boot : int, optional
+        Number of bootstrap replicates, default is 10000.
+    confidence : float, optional
+        Confidence level of the percentile interval, default is 0.95.
+    seed : int, optional
+        Seed of the random generator.
+    chunk_size : int, optional
+        Number of replicates drawn at once, to bound the memory used by the index matrix.
+
+    Returns:
+    --------
+    pd.DataFrame
+        DataFrame with the columns 'binns', 'mean', 'lower', 'upper' and 'histogram'.
+
+    Notes:
+    ------
+    - All bins are resampled together: every row of the index matrix holds one replicate of every bin,
+      the columns of a bin drawing uniformly among that bin's points, and the replicate means are obtained
+      with 'np.add.reduceat'.
+    - Bins with a single point have a zero-width interval.
+    """
+
+    if origin is None:
+        origin = float(df.timens.min())
+    bins = assign_bins(df.timens.values, bin_width, origin)
+    order = np.argsort(bins, kind="stable")
+    bins = bins[order]
+    values = df.shg_single.values.astype(float)[order]
+
+    unique_bins, starts, counts = np.unique(bins, return_index=True, return_counts=True)
+    column_start = np.repeat(starts, counts)
+    column_count = np.repeat(counts, counts)
+
+    rng = np.random.default_rng(seed)
+    replicates = np.empty((n_boot, len(unique_bins)))
+    for first in range(0, n_boot, chunk_size):
+        last = min(first + chunk_size, n_boot)
+        index = column_start + (
+            rng.random((last - first, len(values))) * column_count
+        ).astype(np.int64)
+        replicates[first:last] = np.add.reduceat(values[index], starts, axis=1) / counts
+
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(replicates, [alpha, 1 - alpha], axis=0)
+
+    return pd.DataFrame(
+        {
+            "binns": origin + bin_width * (unique_bins + 0.5),
+            "mean": np.add.reduceat(values, starts) / counts,
+            "lower": lower,
+            "upper": upper,
+            "histogram": counts,
+        }
+    )
+
+
+def _bootstrap_position(args):
+    df, kwargs = args
+    return bootstrap(df, **kwargs)
+
+
+def bootstrap_positions(
+    dfs: dict, max_workers: int | None = None, seed: int | None = None, **kwargs
+) -> dict:
+    """
+    Runs 'bootstrap' for several positions in parallel.
+
+    Parameters:
+    -----------
+    dfs : dict
+        Mapping from a position label to its DataFrame with the columns 'timens' and 'shg_single'.
+    max_workers : int, optional
+        Number of worker processes, default is the number of processors.
+    seed : int, optional
+        Seed from which an independent random stream is spawned for every position.
+    **kwargs
+        Further arguments passed to 'bootstrap'.
+
+    Returns:
+    --------
+    dict
+        Mapping from every position label to its bootstrap DataFrame.
+    """
+
+    seeds = np.random.SeedSequence(seed).spawn(len(dfs))
+    tasks = [
+        (df, {**kwargs, "seed": int(s.generate_state(1)[0])})
+        for df, s in zip(dfs.values(), seeds)
+    ]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(_bootstrap_position, tasks))
+    return dict(zip(dfs.keys(), results))
@@ -0,0 +1,194 @@
+import sqlite3
+from datetime import datetime
+import pandas as pd
+from . import signals
+from .for_compiler import input_folder
+
+
+# Default location of the results store, next to the data folders
+default_path = input_folder / "e_fish_results.sqlite"
+
+columns = {
+    "date": "TEXT NOT NULL",
+    "position": "TEXT NOT NULL",
+    "voltage": "INTEGER NOT NULL",
+    "file_number": "INTEGER NOT NULL",
+    "delta_t": "REAL",
+    "discharge_time": "REAL",
+    "timens": "REAL",
+    "pd_max": "REAL",
+    "pd_integral": "REAL",
+    "pmt_noise_max": "REAL",
+    "pmt_max": "REAL",
+    "pmt_integral": "REAL",
+    "shg_single": "REAL",
+    "outlier": "INTEGER",
+    "run_at": "TEXT",
+}
+
+
+def connect(path: str | None = None) -> sqlite3.Connection:
+    """
+    Opens the results store, creating the table and its indexes if needed.
+
+    Parameters:
+    -----------
+    path : str, optional
+        Path to the SQLite file, default is 'default_path'.
+
+    Returns:
+    --------
+    sqlite3.Connection
+        The connection to the store.
+    """
+
+    connection = sqlite3.connect(str(path or default_path))
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS shots ("
+        + ", ".join(f"{name} {kind}" for name, kind in columns.items())
+        + ", PRIMARY KEY (date, position, voltage, file_number))"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS shots_campaign ON shots (date, position, voltage)"
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS shots_voltage ON shots (voltage)")
+    connection.execute("CREATE INDEX IF NOT EXISTS shots_position ON shots (position)")
+    return connection
+
+
+def shot_results(
+    df_time: pd.DataFrame, df_discharge: pd.DataFrame, path_to_output: str
+) -> pd.DataFrame:
+    """
+    Gathers the per-shot results of a pipeline run.
+
+    Parameters:
+    -----------
+    df_time : pd.DataFrame
+        Output of 'time.calculate_df_time', indexed by file number with a 'delta_t' column.
+    df_discharge : pd.DataFrame
+        Output of 'transmitted.get_discharge_times'.
+    path_to_output : str
+        Relative path to the file written by the SHG code ('output_*.dat').
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per shot of 'df_time' with the columns of the store except the campaign keys.
+
+    Notes:
+    ------
+    - The outlier flag is computed with 'signals.outlier_labels' on the 'timens'/'shg_single' values,
+      as done by 'for_compiler.write_shg_for_ssc'.
+    """
+
+    df_shg = pd.read_csv(str(input_folder / path_to_output), delimiter=";")
+    df_shg.drop(df_shg.index[-1], inplace=True)  # last line holds the latest plasma mode
+    df_shg.columns = [
+        "timens",
+        "pmt_noise_max",
+        "pmt_max",
+        "pmt_integral",
+        "pd_max",
+        "pd_integral",
+        "shg_single",
+        "file_number",
+    ]
+    df_shg["file_number"] = df_shg.file_number.astype(int)
+    df_shg["pmt_integral"] = df_shg.pmt_integral**2  # the SHG code writes sqrt(pmt)
+    df_shg["outlier"] = (
+        signals.outlier_labels(df_shg[["timens", "shg_single"]]) == -1
+    ).astype(int)
+
+    df = (
+        df_time[["delta_t"]]
+        .rename_axis("file_number")
+        .join(df_discharge.set_index("file_number").time.rename("discharge_time"))
+        .join(df_shg.set_index("file_number"))
+        .reset_index()
+    )
+    df["file_number"] = df.file_number.astype(int)
+    return df
+
+
+def append_run(
+    date: str,
+    position: str,
+    voltage: int,
+    df_time: pd.DataFrame,
+    df_discharge: pd.DataFrame,
+    path_to_output: str,
+    path: str | None = None,
+):
+    """
+    Appends the per-shot results of a pipeline run to the store.
+
+    Parameters:
+    -----------
+    date : str
+        Date of the campaign, e.g. "2024_05_16".
+    position : str
+        Measurement position, e.g. "pos2".
+    voltage : int
+        Applied voltage in kV.
+    df_time, df_discharge, path_to_output
+        See 'shot_results'.
+    path : str, optional
+        Path to the SQLite file, default is 'default_path'.
+
+    Side Effects:
+    -------------
+    - Replaces the rows of shots already stored for the same date, position and voltage.
+    """
+
+    df = shot_results(df_time, df_discharge, path_to_output)
+    df.insert(0, "date", date)
+    df.insert(1, "position", position)
+    df.insert(2, "voltage", int(voltage))
+    df["run_at"] = datetime.now().isoformat(timespec="seconds")
+    df = df[list(columns)]
+
+    with connect(path) as connection:
+        connection.executemany(
+            f"INSERT OR REPLACE INTO shots ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            df.astype(object).where(df.notna(), None).itertuples(index=False),
+        )
+    connection.close()
+    return print(f"{len(df)} shots stored for {date} {position} {voltage}kV")
+
+
+def query(path: str | None = None, **filters) -> pd.DataFrame:
+    """
+    Reads per-shot results from the store.
+
+    Parameters:
+    -----------
+    path : str, optional
+        Path to the SQLite file, default is 'default_path'.
+    **filters
+        Equality filters on the columns, e.g. date="2024_05_16", voltage=27. A list selects several values.
+
+    Returns:
+    --------
+    pd.DataFrame
+        The matching rows.
+    """
+
+    conditions = []
+    parameters = []
+    for name, value in filters.items():
+        if name not in columns:
+            raise ValueError(f"Unknown column: {name}")
+        values = value if isinstance(value, (list, tuple)) else [value]
+        conditions.append(f"{name} IN ({', '.join('?' * len(values))})")
+        parameters += list(values)
+    sql = "SELECT * FROM shots"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+
+    connection = connect(path)
+    try:
+        return pd.read_sql_query(sql, connection, params=parameters)
+    finally:
+        connection.close()
@@ -0,0 +1,283 @@
+import concurrent.futures
+from collections import deque
+from functools import partial
+import numpy as np
+import pandas as pd
+from . import load, time, transmitted, archive, for_compiler
+
+
+# Files read ahead of the shot being processed; it bounds the memory held by the reader threads
+PREFETCH = 4
+
+
+def read_shots(
+    channel: str, folder: str, compact: bool = False, shots=None, prefetch: int = PREFETCH
+):
+    """
+    Reads the files of a channel one shot at a time.
+
+    Parameters:
+    -----------
+    channel : str
+        The channel identifier used to filter the files to be read.
+    folder : str
+        The name of the folder containing the CSV files, or of an archive of it (see 'load.get_df').
+    compact : bool, optional
+        If True, the amplitudes are read as float32, see 'load.get_df'. Default is False.
+    shots : iterable of int, optional
+        The shot numbers to read. If None (default), all the files of the channel are read.
+    prefetch : int, optional
+        Number of files read ahead by a thread pool while the current shot is processed, default is 'PREFETCH'.
+
+    Yields:
+    -------
+    pd.DataFrame
+        The samples of one shot with columns ['file_number', 'time', 'amplitude'], in increasing shot order
+        (archive order for an archive). Files that cannot be read are skipped.
+
+    Notes:
+    ------
+    - At most 'prefetch' + 1 files are held in memory, whatever the number of shots.
+    """
+
+    channel_files = load.LazyChannel(channel, folder, compact=compact)
+    selected = channel_files.shots
+    if shots is not None:
+        selected = [i for i in sorted(set(int(j) for j in shots)) if i in channel_files.files]
+    if not selected:
+        return
+    names = [channel_files.files[i] for i in selected]
+    dtype = np.min_scalar_type(max(selected)) if compact else np.int64
+    read = partial(load.reader, compact=compact)
+
+    def frame(future) -> pd.DataFrame | None:
+        df = future.result()
+        if df is None or df.empty:
+            return None
+        return pd.DataFrame(
+            {
+                "file_number": np.full(len(df), df.index[0], dtype=dtype),
+                "time": df.iloc[:, 0].to_numpy(),
+                "amplitude": df.iloc[:, 1].to_numpy(),
+            }
+        )
+
+    with concurrent.futures.ThreadPoolExecutor(max(prefetch, 1)) as executor:
+        if channel_files.archive is None:
+            futures = (executor.submit(read, name) for name in names)
+        else:
+            futures = (
+                executor.submit(read, name, content=content)
+                for name, content in archive.read_members(channel_files.archive, names)
+            )
+        pending = deque()
+        for future in futures:
+            pending.append(future)
+            if len(pending) > prefetch:
+                df = frame(pending.popleft())
+                if df is not None:
+                    yield df
+        while pending:
+            df = frame(pending.popleft())
+            if df is not None:
+                yield df
+
+
+def c1_shots(
+    folder: str,
+    trigger_up: float = 0.15,
+    window_size: int = 10,
+    n_elements: int = 2002,
+    compact: bool = False,
+    pos_path: str | None = None,
+    subtract_offsets: bool = False,
+):
+    """
+    Runs the back current shunt chain on every C1 shot: 'load.avg_amplitude', 'time.calculate_df_time',
+    'time.shift_reflected_pulse', 'transmitted.compute_pulse' and 'transmitted.get_discharge_times'.
+
+    Parameters:
+    -----------
+    folder : str
+        The name of the folder containing the oscilloscope files.
+    trigger_up : float, optional
+        The trigger level of the BCS signals, default is 0.15.
+    window_size : int, optional
+        The window of the rolling average of the amplitude, default is 10.
+    n_elements : int, optional
+        The number of samples of the C44 files, see 'transmitted.complete_signal'. Default is 2002.
+    compact : bool, optional
+        If True, the amplitudes are read as float32. Default is False.
+    pos_path : str, optional
+        If given, the C11 (inverted averaged incident pulse) and C44 (completed transmitted pulse) files
+        of every shot are written there, under their final zero-padded names.
+    subtract_offsets : bool, optional
+        If True, the baseline offset of the written files is subtracted first, see 'load.subtract_background'.
+
+    Yields:
+    -------
+    dict
+        One record per shot: 'file_number', 'time_bcs', 'time_electrode', 'delta_t', and the 'discharge_time'
+        and 'discharge_transmitted' of the discharge. Values not found are NaN.
+        With 'pos_path', also 'c11_file' and 'c44_file', the paths of the written files (None if not written).
+
+    Notes:
+    ------
+    - Only the samples of the current shot are held in memory; see 'shot_times' and 'shot_discharges'
+      to turn the records into the 'df_time' and 'df_discharge' of the whole-campaign stages.
+    """
+
+    for df in read_shots("C1", folder, compact=compact):
+        shot = int(df.file_number.iloc[0])
+        record = dict.fromkeys(
+            ["time_bcs", "time_electrode", "delta_t", "discharge_time", "discharge_transmitted"],
+            np.nan,
+        )
+        record["file_number"] = shot
+        if pos_path is not None:
+            record.update(c11_file=None, c44_file=None)
+        df = load.avg_amplitude(df=df, window_size=window_size)
+        if pos_path is not None:
+            df_11 = pd.DataFrame(
+                {"file_number": df.file_number, "time": df.time, "amplitude": -df.avg_amplitude}
+            )
+            if subtract_offsets:
+                df_11 = load.subtract_background(df_11, t_bgd=0)
+            record["c11_file"] = for_compiler.write_shot(df_11, channel="C11", pos_path=pos_path)
+
+        df_time = time.calculate_df_time(df, trigger_up, -trigger_up)
+        if df_time.empty:
+            yield record
+            continue
+        record.update(df_time.iloc[0][["time_bcs", "time_electrode", "delta_t"]].to_dict())
+        if not np.isfinite(record["delta_t"]):
+            yield record
+            continue
+
+        df_shifted = time.shift_reflected_pulse(df, df_time)
+        df_transmitted = transmitted.compute_pulse(df, df_shifted, df_time)
+        if df_transmitted.empty:
+            yield record
+            continue
+        if pos_path is not None:
+            df_44 = transmitted.complete_signal(df_transmitted, n_elements=n_elements)
+            df_44.rename(columns={"transmitted": "amplitude"}, inplace=True)
+            if subtract_offsets:
+                df_44 = load.subtract_background(df_44, t_bgd=0)
+            record["c44_file"] = for_compiler.write_shot(df_44, channel="C44", pos_path=pos_path)
+
+        df_discharge = transmitted.get_discharge_times(df_transmitted, trigger_up)
+        if not df_discharge.empty:
+            record["discharge_time"] = df_discharge.time.iloc[0]
+            record["discharge_transmitted"] = df_discharge.transmitted.iloc[0]
+        yield record
+
+
+def laser_shots(
+    folder: str,
+    df_discharge: pd.DataFrame,
+    compact: bool = False,
+    pos_path: str | None = None,
+    subtract_offsets: bool = False,
+):
+    """
+    Extracts the features of the PMT (C3) and photodiode (C2) signals used to set the SHG integration.
+
+    Parameters:
+    -----------
+    folder : str
+        The name of the folder containing the oscilloscope files.
+    df_discharge : pd.DataFrame
+        The discharges, see 'shot_discharges'. C2 is read for these shots, C3 for every shot
+        between the first and the last of them, as the SHG code reads them.
+    compact : bool, optional
+        If True, the amplitudes are read as float32. Default is False.
+    pos_path : str, optional
+        If given, the inverted C3 signal of every shot is written there as C33 files.
+    subtract_offsets : bool, optional
+        If True, the baseline offset of the C33 files is subtracted first; the features keep the raw signal.
+
+    Yields:
+    -------
+    dict
+        For C3 shots: 'file_number', 'pmt_max' (maximum of the inverted signal) and 'pmt_time' (its first time),
+        and with 'pos_path' the path of the C33 file as 'c33_file'.
+        For C2 shots: 'file_number', 'pd_max', 'pd_time' and 'pd_fwhm' (span of the samples above half the maximum).
+    """
+
+    first, last = int(df_discharge.file_number.iloc[0]), int(df_discharge.file_number.iloc[-1])
+    for df in read_shots("C3", folder, compact=compact, shots=range(first, last + 1)):
+        df["amplitude"] = -df["amplitude"]
+        if pos_path is not None:
+            df_33 = load.subtract_background(df.copy(), t_bgd=0) if subtract_offsets else df
+            path = for_compiler.write_shot(df_33, channel="C33", pos_path=pos_path)
+        amplitude = df.amplitude.to_numpy()
+        record = {
+            "file_number": int(df.file_number.iloc[0]),
+            "pmt_max": amplitude.max(),
+            "pmt_time": df.time.to_numpy()[amplitude.argmax()],
+        }
+        if pos_path is not None:
+            record["c33_file"] = path
+        yield record
+
+    for df in read_shots("C2", folder, compact=compact, shots=df_discharge.file_number):
+        amplitude, t = df.amplitude.to_numpy(), df.time.to_numpy()
+        above = t[amplitude >= amplitude.max() / 2.0]
+        yield {
+            "file_number": int(df.file_number.iloc[0]),
+            "pd_max": amplitude.max(),
+            "pd_time": t[amplitude.argmax()],
+            "pd_fwhm": above.max() - above.min(),
+        }
+
+
+def shot_table(records) -> pd.DataFrame:
+    """
+    Collects the records of 'c1_shots' or 'laser_shots' into one row per shot, indexed by file number.
+    """
+
+    df = pd.DataFrame.from_records(list(records))
+    if df.empty:
+        return df
+    return df.groupby("file_number").first().sort_index()
+
+
+def shot_times(df_shots: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the 'df_time' of 'time.calculate_df_time' from the table of 'c1_shots'.
+    """
+
+    return df_shots.loc[df_shots.time_bcs.notna(), ["time_bcs", "time_electrode", "delta_t"]]
+
+
+def shot_discharges(df_shots: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the 'df_discharge' of 'transmitted.get_discharge_times' from the table of 'c1_shots'.
+    """
+
+    df = df_shots.loc[df_shots.discharge_time.notna(), ["discharge_time", "discharge_transmitted"]]
+    df = df.reset_index()
+    df.columns = ["file_number", "time", "transmitted"]
+    return df
+
+
+def intervals(df_features: pd.DataFrame, n_largest: int = 20) -> dict:
+    """
+    Computes the global integration parameters from the per-shot features of 'laser_shots'.
+
+    Returns:
+    --------
+    dict
+        'fwhm': the median PD FWHM of the 'n_largest' shots with the highest PD maxima, as 'time.calculate_int_interval';
+        't_diff': the median delay between the PMT and PD maxima of the 'n_largest' shots with the highest PMT maxima,
+        as 'time.calculate_pd_pmt_diff' applied to 'signals.find_pmt_max'.
+    """
+
+    pd_top = df_features.pd_max.dropna().nlargest(n_largest).index
+    pmt_top = df_features.pmt_max.dropna().nlargest(n_largest).index
+    delay = (df_features.pmt_time - df_features.pd_time)[pmt_top].dropna()
+    return {
+        "fwhm": float(df_features.pd_fwhm[pd_top].median()),
+        "t_diff": float(np.median(delay)),
+    }
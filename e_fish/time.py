@@ -1,8 +1,14 @@
-from scipy.signal import find_peaks_cwt
 import pandas as pd
 import numpy as np
+from .ragged import Regular
 
 
+# Time window [s] searched for the crossing of the incident pulse at the back current shunt.
+# It only restricts the search: C1 is still loaded in full, since the electrode candidates come from the reflected
+# pulse after this window, the shifted pulse and the transmitted signal cover the whole record and the C11/C44 files
+# read by the Fortran code must keep every sample. Do not pass it as 'time_window' to the C1 load of the pipeline.
+BCS_WINDOW = (None, 1e-7)
+
 
 def calculate_df_time(
     df: pd.DataFrame, trigger_up: float, trigger_down: float
@@ -33,35 +39,38 @@ def calculate_df_time(
     - 'time_bcs' represents the time when the pulse reaches the bqck current shunt.
     - 'time_electrode' represents the time when thereflected pulse reaches the back curren shunt.
     - The time difference 'delta_t' is calculated as half the difference between 'time_bcs' and 'time_electrode'.
+    - A 'ragged.Regular' container is accepted; its time column is only built for the duration of the call.
     """
+
+    if isinstance(df, Regular):
+        df = df.to_frame()
     
-    # Identify candidates where the amplitude falls below trigger_down or exceeds trigger_up within a short time.
-    df.loc[
-        (((df.avg_amplitude <= trigger_down) | (df.avg_amplitude >= trigger_up)))
-        & (df.time < 1e-7),
-        "bcs_candidates",
-    ] = (trigger_down - df["avg_amplitude"]).abs()  # Compute the absolute difference for BCS candidates.
-
-    # Identify candidates where amplitude either falls below trigger_down or exceeds trigger_up.
-    df.loc[
-        ((df.avg_amplitude <= trigger_down) | (df.avg_amplitude >= trigger_up)),
-        "electrode_candidates",
-    ] = (-trigger_up + df["avg_amplitude"]).abs()  # Compute the absolute difference for electrode candidates.
+    # Identify candidates where the amplitude falls below trigger_down or exceeds trigger_up.
+    # The candidate distances are kept as Series aligned on df instead of helper columns of df.
+    candidates = (df.avg_amplitude <= trigger_down) | (df.avg_amplitude >= trigger_up)
+
+    # BCS candidates are restricted to a short time, with the absolute difference to trigger_down.
+    bcs_candidates = (trigger_down - df["avg_amplitude"]).abs().where(
+        candidates & (df.time < BCS_WINDOW[1])
+    )
+
+    # Electrode candidates use the absolute difference to trigger_up.
+    electrode_candidates = (-trigger_up + df["avg_amplitude"]).abs().where(candidates)
 
     # Select the 5 smallest differences for electrode candidates, grouped by file_number.
     df_electrode = df.loc[
-        df.groupby("file_number")["electrode_candidates"]
+        electrode_candidates.groupby(df.file_number)
         .nsmallest(5)
-        .droplevel("file_number")
+        .droplevel(0)
         .index,
         ["file_number", "time"],
     ].rename(columns={"time": "time_electrode"})  # Rename time column to indicate electrode event times.
 
     # Select the 5 smallest differences for BCS candidates, grouped by file_number.
     df_bcs = df.loc[
-        df.groupby("file_number")["bcs_candidates"]
+        bcs_candidates.groupby(df.file_number)
         .nsmallest(5)
-        .droplevel("file_number")
+        .droplevel(0)
         .index,
         ["file_number", "time"],
     ].rename(columns={"time": "time_bcs"})  # Rename time column to indicate BCS event times.
@@ -112,7 +121,15 @@ def shift_reflected_pulse(df: pd.DataFrame, df_time: pd.DataFrame) -> pd.DataFra
     -----
     - The time shift is calculated as 'time - 2 * delta_t' for each corresponding file number.
     - The amplitude is inverted by multiplying the original average amplitude by -1.
+    - If 'df' is a 'ragged.Regular' container, so is the result: the shift only moves the first time of every shot
+      and no time column is written.
     """
+
+    if isinstance(df, Regular):
+        delta_t = df_time.delta_t.reindex(df.shots).values
+        return Regular(
+            {"amplitude": -df["avg_amplitude"]}, df.offsets, df.shots, df.t0 - 2 * delta_t, df.dt
+        )
     
     # Create an empty DataFrame to store the shifted and inverted pulse data.
     df_shifted = pd.DataFrame()
@@ -1,27 +1,87 @@
 import pandas as pd
 import numpy as np
-from pathlib import Path
-import os
-import joblib
+from .ragged import Ragged, Regular
+from . import kernels
 
 
-# If a cache is desired
-cache_dis = Path(__file__).parent / "cache_dis"
-os.makedirs(cache_dis, exist_ok=True)
-memory_dis = joblib.Memory(location=cache_dis, verbose=0)
+# If a cache is desired, import 'cache' and uncomment the decorator of a stage; the store is created on first call
 
-cache_transmitted = Path(__file__).parent / "cache_transmitted"
-os.makedirs(cache_transmitted, exist_ok=True)
-memory = joblib.Memory(location=cache_transmitted, verbose=0)
+# Time window [s] searched for the discharge in the transmitted signal.
+# The transmitted signal is derived from C1 and the reflected pulse shifted by 2 * delta_t, which is only known once
+# the shot is read, so this window cannot bound the C1 load; it only restricts the search.
+DISCHARGE_WINDOW = (None, 0.95e-7)
 
-cache_complete = Path(__file__).parent / "cache_complete"
-os.makedirs(cache_complete, exist_ok=True)
-memory_complete = joblib.Memory(location=cache_complete, verbose=0)
+
+def _regular_pulse(
+    incident: Regular, reflected: Regular, df_time: pd.DataFrame, method: str
+) -> Regular | None:
+    """
+    'compute_pulse' on uniformly sampled shots: the reflected sample matching the k-th incident sample is
+    'k + (t0_incident - t0_reflected) / dt', so the alignment is index arithmetic. Returns None if the
+    timesteps of the two signals differ.
+    """
+
+    common = np.intersect1d(
+        incident.shots[np.isfinite(incident.t0)], reflected.shots[np.isfinite(reflected.t0)]
+    )
+    inc = np.searchsorted(incident.shots, common)
+    ref = np.searchsorted(reflected.shots, common)
+    dt = incident.dt[inc]
+    if not np.allclose(dt, reflected.dt[ref], rtol=1e-9, atol=0):
+        return None
+
+    # As on the time columns: incident samples up to the last reflected time,
+    # reflected samples from the first incident time
+    eps = 1e-9
+    u = np.zeros(len(incident))
+    u[inc] = (incident.t0[inc] - reflected.t0[ref]) / dt
+    n_reflected = np.zeros(len(incident), dtype=np.int64)
+    n_reflected[inc] = reflected.lengths[ref]
+    stop = np.zeros(len(incident), dtype=np.int64)
+    stop[inc] = np.floor(n_reflected[inc] - 1 - u[inc] + eps).astype(np.int64) + 1
+    kept = incident.window(np.zeros(len(incident), dtype=np.int64), stop)
+    segment = kept.segment_ids
+    position = np.searchsorted(incident.shots, kept.shots)
+    low = np.maximum(np.ceil(u[position] - eps), 0)[segment]
+    high = (n_reflected[position] - 1)[segment]
+    start = reflected.starts[np.searchsorted(reflected.shots, kept.shots)][segment]
+
+    # Fractional position of every kept incident sample in the reflected shot
+    x = kept.positions + u[position][segment]
+    backward = np.floor(x + eps).astype(np.int64)
+    fraction = np.clip(x - backward, 0, None)
+    has_backward = (backward >= low) & (backward <= high)
+    has_forward = (backward + 1 >= low) & (backward + 1 <= high)
+    matched = has_backward | has_forward
+    # As merge_asof with direction="nearest", ties go to the earlier sample
+    nearest = np.where(has_backward & (~has_forward | (fraction <= 0.5)), backward, backward + 1)
+
+    amplitude = reflected["amplitude"]
+    reflected_amplitude = np.full(len(x), np.nan)
+    reflected_amplitude[matched] = amplitude[start[matched] + nearest[matched]]
+    if method == "linear":
+        both = has_backward & has_forward
+        lower = amplitude[start[both] + backward[both]]
+        upper = amplitude[start[both] + backward[both] + 1]
+        reflected_amplitude[both] = lower + fraction[both] * (upper - lower)
+
+    incident_amplitude = kept["avg_amplitude"]
+    return Regular(
+        {
+            "incident": incident_amplitude,
+            "reflected": reflected_amplitude,
+            "transmitted": -(incident_amplitude - reflected_amplitude),
+        },
+        kept.offsets,
+        kept.shots,
+        kept.t0 + df_time.delta_t.reindex(kept.shots).values,
+        kept.dt,
+    )
 
 
-# @memory.cache
+# @cache.memoize("transmitted")
 def compute_pulse(
-    df: pd.DataFrame, df_shifted: pd.DataFrame, df_time: pd.DataFrame
+    df: pd.DataFrame, df_shifted: pd.DataFrame, df_time: pd.DataFrame, method: str = "nearest"
 ) -> pd.DataFrame:
     """
     Computes the transmitted pulse from incident and reflected pulses measured by the back current shunt.
@@ -34,6 +94,9 @@ def compute_pulse(
         DataFrame containing shifted reflected pulse data with columns: 'file_number', 'time', and 'amplitude'.
     df_time : pd.DataFrame
         DataFrame containing the time shift for each 'file_number' with a column 'delta_t'.
+    method : str, optional
+        For 'ragged.Regular' inputs, "nearest" (default) takes the reflected sample nearest in time and
+        "linear" interpolates between the two reflected samples around the incident time.
 
     Returns:
     --------
@@ -48,36 +111,76 @@ def compute_pulse(
     Notes:
     ------
     - The transmitted pulse is computed as the negative difference between the incident and reflected pulses.
-    - The function aligns and merges the incident and reflected pulses using 'pd.merge_asof()', which finds the closest matching times between the two DataFrames.
+    - The incident and reflected pulses are aligned on the nearest time within each shot, as 'pd.merge_asof(direction="nearest")'
+      would, but on the flat arrays of a 'Ragged' container with a single 'np.searchsorted' instead of one merge per shot.
     - The time is corrected by adding the time shift ('delta_t') from the 'df_time' DataFrame.
+    - If 'df' and 'df_shifted' are 'ragged.Regular' containers (see 'time.shift_reflected_pulse'), the alignment is
+      done on sample indices and a 'Regular' container is returned, with the same columns but an implicit time.
+      Shots whose timesteps differ fall back to the nearest-time alignment on the time columns.
     """
 
-    # Group by file number
-    df_grouped = df.groupby("file_number")
-    df_shifted_grouped = df_shifted.groupby("file_number")
-
-    # Merge the incident and reflected data, aligning by the nearest time points
-    df_transmitted = pd.concat(
-        [
-            pd.merge_asof(
-                # Select incident data within the time range of the corresponding shifted data
-                group.loc[
-                    group.time <= df_shifted_grouped.get_group(number).time.max()
-                ][["file_number", "time", "avg_amplitude"]],
-                # Select reflected data within the time range of the corresponding incident data
-                df_shifted_grouped.get_group(number).loc[
-                    df_shifted_grouped.get_group(number).time >= group.time.min()
-                ][["file_number", "time", "amplitude"]],
-                by="file_number",  # Merge on file_number
-                on="time",
-                direction="nearest",  # Merge based on nearest time
-            )
-            for number, group in df_grouped
-        ]
-    )
+    if isinstance(df, Regular) and isinstance(df_shifted, Regular):
+        result = _regular_pulse(df, df_shifted, df_time, method)
+        if result is not None:
+            return result
+        df, df_shifted = df.to_frame(), df_shifted.to_frame()
 
-    # Rename columns for clarity
-    df_transmitted.columns = ["file_number", "time", "incident", "reflected"]
+    incident = Ragged.from_frame(df, ["time", "avg_amplitude"])
+    reflected = Ragged.from_frame(
+        df_shifted[df_shifted.file_number.isin(incident.shots)], ["time", "amplitude"]
+    )
+    incident = incident.select(np.isin(incident.repeat(incident.shots), reflected.shots))
+
+    # Select incident data within the time range of the corresponding shifted data,
+    # and reflected data within the time range of the corresponding incident data
+    t_max = reflected.reduce(np.maximum, "time")
+    t_min = incident.reduce(np.minimum, "time")
+    keep_incident = np.flatnonzero(incident["time"] <= incident.repeat(t_max))
+    keep_reflected = np.flatnonzero(reflected["time"] >= reflected.repeat(t_min))
+    segment_incident = incident.segment_ids[keep_incident]
+    segment_reflected = reflected.segment_ids[keep_reflected]
+    time_incident = incident["time"][keep_incident]
+    time_reflected = reflected["time"][keep_reflected]
+
+    # Align by the nearest time within each shot: the kept times of shot i lie in [t_min, t_max],
+    # so they are mapped to i + [0, 0.5] and a single searchsorted covers all the shots
+    span = np.where(t_max > t_min, t_max - t_min, 1.0)
+    key_incident = segment_incident + 0.5 * (
+        time_incident - t_min[segment_incident]
+    ) / span[segment_incident]
+    key_reflected = segment_reflected + 0.5 * (
+        time_reflected - t_min[segment_reflected]
+    ) / span[segment_reflected]
+
+    forward = np.searchsorted(key_reflected, key_incident, side="left")
+    backward = forward - 1
+    first = np.searchsorted(segment_reflected, segment_incident, side="left")
+    last = np.searchsorted(segment_reflected, segment_incident, side="right")
+    has_backward = backward >= first
+    has_forward = forward < last
+    padded = np.append(time_reflected, np.inf)
+    distance_backward = np.where(
+        has_backward, time_incident - padded[np.maximum(backward, 0)], np.inf
+    )
+    distance_forward = np.where(has_forward, padded[forward] - time_incident, np.inf)
+
+    # As merge_asof with direction="nearest", ties go to the earlier sample
+    nearest = np.where(distance_backward <= distance_forward, backward, forward)
+    matched = has_backward | has_forward
+    reflected_amplitude = np.full(len(time_incident), np.nan)
+    reflected_amplitude[matched] = reflected["amplitude"][keep_reflected][
+        nearest[matched]
+    ]
+    shots = incident.shots[segment_incident]
+
+    df_transmitted = pd.DataFrame(
+        {
+            "file_number": shots,
+            "time": time_incident,
+            "incident": incident["avg_amplitude"][keep_incident],
+            "reflected": reflected_amplitude,
+        }
+    )
 
     # Calculate the transmitted pulse as the negative difference between incident and reflected pulses
     df_transmitted["transmitted"] = -(
@@ -86,10 +189,7 @@ def compute_pulse(
 
     # Correct the time by adding the delta_t for each file_number
     df_transmitted["time"] = (
-        df_transmitted["time"].values
-        + df_time.delta_t.repeat(
-            df_transmitted.file_number.value_counts().sort_index()
-        ).values
+        df_transmitted["time"].values + df_time.delta_t.reindex(shots).values
     )
 
     return df_transmitted
@@ -107,7 +207,7 @@ def compute_pulse_lap(df_shifted: pd.DataFrame, df_time: pd.DataFrame) -> pd.Dat
     return df_shifted
 
 
-# @memory_complete.cache
+# @cache.memoize("complete")
 def complete_signal(df: pd.DataFrame, n_elements: int = 2002) -> pd.DataFrame:
     """
     Complete the signal data by adding rows to each 'file_number' group
@@ -129,34 +229,43 @@ def complete_signal(df: pd.DataFrame, n_elements: int = 2002) -> pd.DataFrame:
 
     Notes
     -----
-    - The added rows contain 'transmitted' values set to zero
+    - The added rows contain 'transmitted' values set to zero, the other columns are NaN.
+    - The added rows are spaced by 1e-10 s before the first time of their 'file_number'.
+    - A 'ragged.Regular' container is accepted and converted to a DataFrame.
     """
-    # Count occurrences of each file_number
-    grouped = df.groupby("file_number").size()
-    additional_rows = n_elements - grouped
-
-    # Create arrays for the additional rows
-    file_numbers = np.repeat(grouped.index, additional_rows)
-    min_times = df.groupby("file_number")["time"].min().reindex(file_numbers).values
-    times = (
-        min_times
-        - (np.arange(additional_rows.sum()) % additional_rows.max() + 1) * 1e-10
+    if isinstance(df, Regular):
+        df = df.to_frame()
+    signal = Ragged.from_frame(df.sort_values(["file_number", "time"], kind="stable"))
+
+    # Number of rows to add to each file_number, placed before the first time
+    additional_rows = np.clip(n_elements - signal.lengths, 0, None)
+    lengths = signal.lengths + additional_rows
+    offsets = np.append(0, np.cumsum(lengths))
+
+    # Positions of the original rows and of the additional rows in the completed arrays
+    original = np.arange(len(signal.segment_ids)) + signal.repeat(
+        offsets[:-1] + additional_rows - signal.starts
     )
-    transmitted_values = np.zeros_like(times)
+    added = np.ones(offsets[-1], dtype=bool)
+    added[original] = False
 
-    # Create the dataframe for the additional rows
-    df_additional = pd.DataFrame(
-        {"file_number": file_numbers, "time": times, "transmitted": transmitted_values}
-    )
+    # The additional rows step back by 1e-10 s from the first time of their file_number
+    position = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    steps = np.repeat(additional_rows, lengths) - position
 
-    # Concatenate the additional rows with the original dataframe
-    df = pd.concat([df, df_additional], ignore_index=True)
-    df.sort_values(["file_number", "time"], inplace=True)
+    columns = {}
+    for name, values in signal.columns.items():
+        completed = np.full(offsets[-1], 0 if name == "transmitted" else np.nan)
+        completed[original] = values
+        columns[name] = completed
+    columns["time"][added] = (
+        np.repeat(signal.reduce(np.minimum, "time"), lengths) - steps * 1e-10
+    )[added]
 
-    return df
+    return Ragged(columns, offsets, signal.shots).to_frame()
 
 
-# @memory_dis.cache
+# @cache.memoize("dis")
 def get_discharge_times(df: pd.DataFrame, trigger: float) -> pd.DataFrame:
     """
     Identify the discharge times based on the transmitted signal and a given trigger level.
@@ -184,42 +293,37 @@ def get_discharge_times(df: pd.DataFrame, trigger: float) -> pd.DataFrame:
       * The time is less than or equal to 0.95e-7 seconds.
     - The closest transmitted signal to the trigger level is selected as the discharge event.
     - Only one discharge event per 'file_number' is returned.
+    - A 'ragged.Regular' container is accepted as is.
     """
 
-    # Compute the threshold for each 'file_number' as the mean transmitted signal
-    df["threshold"] = (
-        (df.groupby("file_number").transmitted.mean().to_frame("threshold"))
-        .threshold.repeat(df.file_number.value_counts().sort_index())
-        .values
-    )
+    signal = df if isinstance(df, Regular) else Ragged.from_frame(df, ["time", "transmitted"])
 
-    # Reset the index to ensure compatibility with further operations
-    df.reset_index(drop=True, inplace=True)
+    # Compute the threshold for each 'file_number' as the mean transmitted signal
+    threshold = signal.mean("transmitted")
 
     # Identify discharge candidates based on the transmitted signal:
     # - Condition 1: The threshold must be >= 0.05 (to avoid noise or artifacts).
     # - Condition 2: The time must be <= 0.95e-7 seconds (to limit the search window, arbitrary).
     # The absolute difference between the transmitted signal and the trigger is used
     # to find the closest value to the trigger level.
-    df.loc[(df.threshold >= 0.05) & (df.time <= 0.95e-7), "dis_candidates"] = (
-        -trigger + df["transmitted"]
-    ).abs()
-
-    # Drop rows that do not meet the conditions
-    df = df.dropna()
-
-    # Group by 'file_number' and select the minimum candidate value (closest to the trigger)
-    df_grouped = (
-        df.groupby("file_number")["dis_candidates"].min().to_frame().reset_index()
+    dis_candidates = np.abs(-trigger + signal["transmitted"])
+    valid = (
+        signal.repeat(threshold >= 0.05)
+        & (signal["time"] <= DISCHARGE_WINDOW[1])
+        & ~np.isnan(dis_candidates)
     )
 
-    # Merge the selected minimum candidate back with the original DataFrame to retrieve
-    # the corresponding 'time' and 'transmitted' values
-    df = df_grouped.merge(df, on=["file_number", "dis_candidates"], how="left")[
-        ["file_number", "time", "transmitted"]
-    ]
-
-    # Drop duplicate rows, retaining only the first discharge event for each 'file_number'
-    df = df.drop_duplicates(subset="file_number")
+    # Select the first minimum candidate value (closest to the trigger) of each 'file_number'
+    closest = kernels.segment_argmin(dis_candidates, signal.offsets, valid)
+    segments = np.flatnonzero(closest >= 0)
+    index = signal.starts[segments] + closest[segments]
+
+    df = pd.DataFrame(
+        {
+            "file_number": signal.shots[segments],
+            "time": signal.time_at(index),
+            "transmitted": signal["transmitted"][index],
+        }
+    )
 
     return df
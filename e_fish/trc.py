@@ -0,0 +1,165 @@
+import mmap
+import struct
+import numpy as np
+
+
+# Offsets of the fields used from the WAVEDESC block of a LeCroy binary file (template LECROY_2_3)
+COMM_TYPE = 32  # int16, 0: one byte per sample, 1: two bytes
+COMM_ORDER = 34  # int16, 0: big endian, 1: little endian
+WAVE_DESCRIPTOR = 36  # int32, length of the WAVEDESC block
+USER_TEXT = 40  # int32, length of the user text block
+TRIGTIME_ARRAY = 48  # int32, length of the trigger time array
+RIS_TIME_ARRAY = 52  # int32, length of the RIS time array
+WAVE_ARRAY_1 = 60  # int32, length of the sample block in bytes
+WAVE_ARRAY_COUNT = 116  # int32, number of samples
+SUBARRAY_COUNT = 144  # int32, number of acquired segments
+VERTICAL_GAIN = 156  # float32
+VERTICAL_OFFSET = 160  # float32
+NOM_SUBARRAY_COUNT = 174  # int16, number of segments requested
+HORIZ_INTERVAL = 176  # float32, sampling interval [s]
+HORIZ_OFFSET = 180  # float64, time of the first sample [s]
+
+
+def header(buffer) -> dict:
+    """
+    Parses the WAVEDESC block of a LeCroy binary ('.trc') file.
+
+    Parameters:
+    -----------
+    buffer : bytes, mmap or memoryview
+        The content of the file.
+
+    Returns:
+    --------
+    dict
+        The fields needed to decode the samples: 'byte_order', 'dtype', 'n_samples', 'wave_bytes', 'n_segments',
+        'nominal_segments', 'gain', 'offset', 'dt', 't0', 'trigtime' (position of the trigger time array),
+        'trigtime_length' and 'data' (position of the sample block).
+
+    Exceptions:
+    -----------
+    ValueError
+        Raised if the file has no WAVEDESC block.
+    """
+
+    start = bytes(buffer[:64]).find(b"WAVEDESC")
+    if start < 0:
+        raise ValueError("No WAVEDESC block, not a LeCroy binary file")
+    order = "<" if struct.unpack_from("<h", buffer, start + COMM_ORDER)[0] == 1 else ">"
+
+    def field(fmt, offset):
+        return struct.unpack_from(order + fmt, buffer, start + offset)[0]
+
+    word = field("h", COMM_TYPE) == 1
+    trigtime = start + field("l", WAVE_DESCRIPTOR) + field("l", USER_TEXT)
+    data = trigtime + field("l", TRIGTIME_ARRAY) + field("l", RIS_TIME_ARRAY)
+    return {
+        "byte_order": order,
+        "dtype": np.dtype(order + ("i2" if word else "i1")),
+        "n_samples": field("l", WAVE_ARRAY_COUNT),
+        "wave_bytes": field("l", WAVE_ARRAY_1),
+        "n_segments": max(field("l", SUBARRAY_COUNT), 1),
+        "nominal_segments": field("h", NOM_SUBARRAY_COUNT),
+        "gain": field("f", VERTICAL_GAIN),
+        "offset": field("f", VERTICAL_OFFSET),
+        "dt": field("f", HORIZ_INTERVAL),
+        "t0": field("d", HORIZ_OFFSET),
+        "trigtime": trigtime,
+        "trigtime_length": field("l", TRIGTIME_ARRAY),
+        "data": data,
+    }
+
+
+def raw_samples(buffer, desc: dict) -> np.ndarray:
+    """
+    Returns the ADC codes of a file as an array of shape (segments, samples per segment),
+    a view of 'buffer' without copy.
+    """
+
+    n = min(desc["n_samples"], desc["wave_bytes"] // desc["dtype"].itemsize)
+    codes = np.frombuffer(buffer, dtype=desc["dtype"], count=n, offset=desc["data"])
+    return codes.reshape(desc["n_segments"], -1)
+
+
+def segment_offsets(buffer, desc: dict) -> np.ndarray:
+    """
+    Returns the time of the first sample of every segment: the trigger offsets of the trigger time
+    array for sequence acquisitions, else the horizontal offset.
+    """
+
+    if desc["n_segments"] > 1 and desc["trigtime_length"] >= 16 * desc["n_segments"]:
+        times = np.frombuffer(
+            buffer,
+            dtype=np.dtype(desc["byte_order"] + "f8"),
+            count=2 * desc["n_segments"],
+            offset=desc["trigtime"],
+        )
+        return times[1::2].copy()  # (trigger time, trigger offset) pairs
+    return np.full(desc["n_segments"], desc["t0"])
+
+
+def sample_range(desc: dict, time_window=None, sample_window=None) -> tuple:
+    """
+    Converts a time window and/or a sample-index window into the (first, last) samples to decode,
+    with one extra sample on each side of the time window as 'load.sample_range'.
+    """
+
+    first, last = (0, None) if sample_window is None else sample_window
+    first = first or 0
+    if time_window is not None:
+        t_min, t_max = time_window
+        if t_min is not None and np.isfinite(t_min):
+            first = max(first, int(np.floor((t_min - desc["t0"]) / desc["dt"])) - 1)
+        if t_max is not None and np.isfinite(t_max):
+            time_last = max(int(np.ceil((t_max - desc["t0"]) / desc["dt"])) + 2, 0)
+            last = time_last if last is None else min(last, time_last)
+    return max(first, 0), last
+
+
+def read(
+    filename=None, content=None, time_window=None, sample_window=None, dtype=np.float64
+) -> tuple:
+    """
+    Reads a LeCroy binary ('.trc') file.
+
+    Parameters:
+    -----------
+    filename : str, optional
+        The path to the file, mapped in memory.
+    content : bytes, optional
+        The content of the file, e.g. an archive member, used instead of 'filename'.
+    time_window : tuple of float, optional
+        (t_min, t_max) in seconds; only the samples within the window are decoded.
+    sample_window : tuple of int, optional
+        (first, last) sample indices to decode, 'last' excluded; either bound may be None.
+    dtype : np.dtype, optional
+        Type of the returned amplitudes, default is float64. Times are always float64.
+
+    Returns:
+    --------
+    tuple
+        (time, amplitude, desc): arrays of shape (segments, samples) and the parsed header (see 'header').
+        The amplitude is 'VERTICAL_GAIN * code - VERTICAL_OFFSET' and the time 'HORIZ_INTERVAL * i' plus
+        the offset of the segment.
+
+    Notes:
+    ------
+    - The samples are decoded straight from the memory map; only the decoded window is allocated.
+    """
+
+    if content is None:
+        with open(filename, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        buffer = content
+
+    desc = header(buffer)
+    first, last = sample_range(desc, time_window, sample_window)
+    codes = raw_samples(buffer, desc)[:, first:last]
+    index = np.arange(first, first + codes.shape[1])
+
+    amplitude = np.empty(codes.shape, dtype=dtype)
+    np.multiply(codes, desc["gain"], out=amplitude, casting="unsafe")
+    amplitude -= desc["offset"]
+    time = segment_offsets(buffer, desc)[:, np.newaxis] + desc["dt"] * index[np.newaxis]
+    return time, amplitude, desc
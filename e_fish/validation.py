@@ -0,0 +1,399 @@
+import importlib.util
+import subprocess
+import tempfile
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+import numpy as np
+import pandas as pd
+from . import load, time, transmitted, kernels
+from . import for_compiler
+from .for_compiler import input_folder
+from .ragged import Regular
+
+
+def _early_stages(
+    folder: str, trigger_up: float, window_size: int, compact: bool, regular: bool = False
+):
+    """
+    Runs the C1 stages of the pipeline up to the discharge detection and measures the peak memory.
+    """
+
+    tracemalloc.start()
+    df = load.get_df(channel="C1", folder=folder, compact=compact, regular=regular)
+    df = load.avg_amplitude(df=df, window_size=window_size)
+    df_time = time.calculate_df_time(df, trigger_up, -trigger_up)
+    df_shifted = time.shift_reflected_pulse(df, df_time)
+    df_transmitted = transmitted.compute_pulse(df, df_shifted, df_time)
+    df_discharge = transmitted.get_discharge_times(df_transmitted, trigger_up)
+    if isinstance(df, Regular):
+        memory = sum(i.nbytes for i in df.columns.values()) + df.t0.nbytes + df.dt.nbytes
+        memory += df.offsets.nbytes + df.shots.nbytes
+    else:
+        memory = df.memory_usage(deep=True).sum()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return df_time, df_discharge, memory, peak
+
+
+def _difference(quantity: str, reference: pd.Series, compact: pd.Series, tolerance: float) -> dict:
+    reference, compact = reference.align(compact, join="outer")
+    difference = (reference.astype(float) - compact.astype(float)).abs()
+    return {
+        "quantity": quantity,
+        "n_reference": int(reference.notna().sum()),
+        "n_compact": int(compact.notna().sum()),
+        "max_abs_diff": difference.max(),
+        "tolerance": tolerance,
+        "passed": bool(
+            reference.notna().equals(compact.notna()) and (difference.dropna() <= tolerance).all()
+        ),
+    }
+
+
+def compact_report(
+    folder: str,
+    trigger_up: float = 0.15,
+    window_size: int = 10,
+    shg_reference: str | None = None,
+    shg_compact: str | None = None,
+    time_tolerance: float = 1e-10,
+    amplitude_tolerance: float = 1e-3,
+    shg_tolerance: float = 1e-3,
+) -> pd.DataFrame:
+    """
+    Compares the results of the compact-memory mode of 'load.get_df' with the default float64 mode.
+
+    Parameters:
+    -----------
+    folder : str
+        The name of the folder containing the oscilloscope files, as passed to 'load.get_df'.
+    trigger_up : float, optional
+        The trigger level of the BCS signals, default is 0.15.
+    window_size : int, optional
+        The window of the rolling average, default is 10.
+    shg_reference : str, optional
+        Relative path to the SHG output file ('output_*.dat') of a run in the default mode.
+    shg_compact : str, optional
+        Relative path to the SHG output file of a run in the compact mode.
+    time_tolerance : float, optional
+        Tolerance on 'delta_t' and the discharge times in seconds, default is one sample (1e-10 s).
+    amplitude_tolerance : float, optional
+        Tolerance on the transmitted amplitude at the discharge time, default is 1e-3.
+    shg_tolerance : float, optional
+        Relative tolerance on 'shg_single', default is 1e-3.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per compared quantity with the maximum absolute difference, the tolerance and whether it passed,
+        followed by the memory used by the C1 DataFrame and the peak memory of both modes.
+
+    Side Effects:
+    -------------
+    - Reads the C1 files of the folder twice.
+    - Prints the report.
+
+    Notes:
+    ------
+    - The SHG values are only compared if both output files are given, since producing them requires running the
+      Fortran code on the files written by each mode.
+    """
+
+    df_time_ref, df_discharge_ref, memory_ref, peak_ref = _early_stages(
+        folder, trigger_up, window_size, compact=False
+    )
+    df_time_cmp, df_discharge_cmp, memory_cmp, peak_cmp = _early_stages(
+        folder, trigger_up, window_size, compact=True
+    )
+    df_discharge_ref = df_discharge_ref.set_index("file_number")
+    df_discharge_cmp = df_discharge_cmp.set_index("file_number")
+    df_discharge_cmp.index = df_discharge_cmp.index.astype(df_discharge_ref.index.dtype)
+    df_time_cmp.index = df_time_cmp.index.astype(df_time_ref.index.dtype)
+
+    rows = [
+        _difference("delta_t", df_time_ref.delta_t, df_time_cmp.delta_t, time_tolerance),
+        _difference(
+            "discharge time", df_discharge_ref.time, df_discharge_cmp.time, time_tolerance
+        ),
+        _difference(
+            "discharge amplitude",
+            df_discharge_ref.transmitted,
+            df_discharge_cmp.transmitted,
+            amplitude_tolerance,
+        ),
+    ]
+
+    if shg_reference is not None and shg_compact is not None:
+        shg = [
+            pd.read_csv(input_folder / path, delimiter=";")
+            .iloc[:-1]
+            .astype({"osc": int})
+            .set_index("osc")
+            .shg_single
+            for path in (shg_reference, shg_compact)
+        ]
+        row = _difference("shg_single", shg[0], shg[1], np.nan)
+        relative = ((shg[0] - shg[1]).abs() / shg[0].abs()).max()
+        row.update(
+            max_abs_diff=relative,
+            tolerance=shg_tolerance,
+            passed=row["n_reference"] == row["n_compact"] and relative <= shg_tolerance,
+        )
+        rows.append(row)
+
+    rows += [
+        {"quantity": "C1 DataFrame bytes", "n_reference": memory_ref, "n_compact": memory_cmp},
+        {"quantity": "peak traced bytes", "n_reference": peak_ref, "n_compact": peak_cmp},
+    ]
+    report = pd.DataFrame(rows)
+    print(report.to_string(index=False))
+    return report
+
+
+def regular_report(
+    folder: str,
+    trigger_up: float = 0.15,
+    window_size: int = 10,
+    time_tolerance: float = 1e-10,
+    amplitude_tolerance: float = 1e-6,
+) -> pd.DataFrame:
+    """
+    Compares the C1 stages run on a 'ragged.Regular' container (implicit time axis, 'load.get_df(regular=True)')
+    with the same stages run on the DataFrame of 'load.get_df'.
+
+    Parameters:
+    -----------
+    folder : str
+        The name of the folder containing the oscilloscope files, as passed to 'load.get_df'.
+    trigger_up : float, optional
+        The trigger level of the BCS signals, default is 0.15.
+    window_size : int, optional
+        The window of the rolling average, default is 10.
+    time_tolerance : float, optional
+        Tolerance on 'delta_t' and the discharge times in seconds, default is one sample (1e-10 s).
+    amplitude_tolerance : float, optional
+        Tolerance on the transmitted amplitude at the discharge time, default is 1e-6.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per compared quantity as 'compact_report', followed by the memory used by the C1 samples
+        and the peak memory of both paths; the 'n_compact' column holds the regular path.
+
+    Side Effects:
+    -------------
+    - Reads the C1 files of the folder twice.
+    - Prints the report.
+
+    Notes:
+    ------
+    - The regular path matches the reflected and incident pulses on the nearest sample as 'pd.merge_asof',
+      so both paths agree except for times lying exactly halfway between two samples.
+    """
+
+    df_time_ref, df_discharge_ref, memory_ref, peak_ref = _early_stages(
+        folder, trigger_up, window_size, compact=False
+    )
+    df_time_reg, df_discharge_reg, memory_reg, peak_reg = _early_stages(
+        folder, trigger_up, window_size, compact=False, regular=True
+    )
+    df_discharge_ref = df_discharge_ref.set_index("file_number")
+    df_discharge_reg = df_discharge_reg.set_index("file_number")
+
+    rows = [
+        _difference("delta_t", df_time_ref.delta_t, df_time_reg.delta_t, time_tolerance),
+        _difference(
+            "discharge time", df_discharge_ref.time, df_discharge_reg.time, time_tolerance
+        ),
+        _difference(
+            "discharge amplitude",
+            df_discharge_ref.transmitted,
+            df_discharge_reg.transmitted,
+            amplitude_tolerance,
+        ),
+        {"quantity": "C1 samples bytes", "n_reference": memory_ref, "n_compact": memory_reg},
+        {"quantity": "peak traced bytes", "n_reference": peak_ref, "n_compact": peak_reg},
+    ]
+    report = pd.DataFrame(rows)
+    print(report.to_string(index=False))
+    return report
+
+
+def backend_report(n_shots: int = 500, n_elements: int = 2002, seed: int = 0) -> pd.DataFrame:
+    """
+    Checks that the numba and numpy backends of 'kernels.segment_argmin' give identical results.
+
+    Parameters:
+    -----------
+    n_shots : int, optional
+        Number of synthetic shots, default is 500.
+    n_elements : int, optional
+        Maximum number of samples per shot, default is 2002.
+    seed : int, optional
+        Seed of the random generator, default is 0.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per kernel with the number of shots whose results differ between the backends.
+        Without numba, the differences are None and the 'compared' column says the backends were not compared.
+
+    Side Effects:
+    -------------
+    - Prints the report.
+
+    Notes:
+    ------
+    - The synthetic shots have random lengths, quantized amplitudes (so ties occur) and NaN samples.
+    """
+
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, n_elements + 1, n_shots)
+    offsets = np.append(0, np.cumsum(lengths))
+    bcs4 = np.round(rng.normal(0, 0.1, offsets[-1]), 2)
+    bcs4[rng.random(offsets[-1]) < 0.01] = np.nan
+    mask = rng.random(offsets[-1]) < 0.5
+
+    def run(backend):
+        return {
+            "segment_argmin": kernels.segment_argmin(
+                np.abs(bcs4 - 0.15), offsets, mask, backend=backend
+            )
+        }
+
+    reference = run("numpy")
+    if importlib.util.find_spec("numba") is None:
+        differences, compared = [None] * len(reference), "not compared, numba is not installed"
+    else:
+        jit = run("numba")
+        differences = [int((reference[i] != jit[i]).sum()) for i in reference]
+        compared = "numpy vs numba"
+    report = pd.DataFrame(
+        {
+            "kernel": list(reference),
+            "shots": n_shots,
+            "differences": differences,
+            "compared": compared,
+        }
+    )
+    print(report.to_string(index=False))
+    return report
+
+
+def _run_fortran(executable: Path, *args) -> float:
+    """
+    Runs a Fortran executable and returns its wall time in seconds.
+    """
+
+    start = perf_counter()
+    command = for_compiler.fortran_command(executable, *args)
+    subprocess.run(command, shell=True, check=True, capture_output=True)
+    return perf_counter() - start
+
+
+def fortran_report(
+    shg_input: str,
+    ssc_input: str | None = None,
+    student_file: str = "t_student.dat",
+    path_folder: str = "FORTRAN",
+    profile: str = "performance",
+    rtol: float = 1e-6,
+) -> pd.DataFrame:
+    """
+    Compares a build profile of the Fortran codes with the quadruple-precision reference build.
+
+    Both builds are compiled and run on the same input files; their outputs are written to a temporary folder.
+
+    Parameters:
+    -----------
+    shg_input : str
+        The input file of 'second_harmonic_generation', as written by 'write_input'.
+    ssc_input : str, optional
+        The input file of 'stud_stat_calc', as written by 'write_input_for_ssc'. The SSC is skipped if not given.
+    student_file : str, optional
+        The table of Student coefficients read by 'stud_stat_calc', default is "t_student.dat".
+    path_folder : str, optional
+        The folder containing the FORTRAN source files, default is "FORTRAN".
+    profile : str, optional
+        The build profile compared with "reference", default is "performance".
+    rtol : float, optional
+        The largest relative difference accepted on every output column, default is 1e-6.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per compared quantity with the maximum relative difference, the tolerance and whether it passed,
+        followed by the run times of both builds and the speedup.
+
+    Side Effects:
+    -------------
+    - Compiles both builds of the codes and prints the report.
+
+    Notes:
+    ------
+    - The shots passing the SHG selection must be the same in both builds, as well as the latest plasma mode.
+    - Quantities obtained with 'int()' of a ratio of times (the PMT integration window) can jump by one sample
+      between precisions when the ratio is close to an integer; a difference of a few percent on 'max(pmt)' alone
+      points to such a shot rather than to a loss of precision.
+    """
+
+    programs = [("shg", for_compiler.module, for_compiler.code, "second_harmonic_generation", shg_input)]
+    if ssc_input is not None:
+        programs.append(("ssc", "ssc.f90", "stud_stat_calc.f90", "stud_stat_calc", ssc_input))
+
+    rows, timings = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for program, module, code, executable, input_file in programs:
+            outputs, times = {}, {}
+            for build in ("reference", profile):
+                path = for_compiler.build_fortran(path_folder, module, code, executable, build, verbosity=0)
+                outputs[build] = Path(tmp) / f"output_{program}_{build}.dat"
+                extra = [student_file] if program == "ssc" else []
+                times[build] = _run_fortran(path, input_file, outputs[build], *extra)
+            timings.append(
+                {
+                    "quantity": f"{program} run time [s]",
+                    "reference": times["reference"],
+                    profile: times[profile],
+                    "speedup": times["reference"] / times[profile],
+                }
+            )
+
+            reference, other = [pd.read_csv(outputs[i], sep=";") for i in ("reference", profile)]
+            if program == "shg":
+                # The last row holds the latest plasma mode
+                modes = [int(i.iloc[-1, 0]) for i in (reference, other)]
+                rows.append(
+                    {
+                        "quantity": "latest_plasma_mode",
+                        "max_rel_diff": float(modes[0] != modes[1]),
+                        "tolerance": 0.0,
+                        "passed": modes[0] == modes[1],
+                    }
+                )
+                reference, other = [i.iloc[:-1].set_index("osc") for i in (reference, other)]
+                key = "shots"
+            else:
+                reference, other = [i.set_index("binns") for i in (reference, other)]
+                key = "bins"
+            same = reference.index.equals(other.index)
+            rows.append(
+                {"quantity": key, "max_rel_diff": float(not same), "tolerance": 0.0, "passed": same}
+            )
+            reference, other = reference.align(other, join="inner")
+            for column in reference.columns:
+                a, b = reference[column].astype(float), other[column].astype(float)
+                relative = ((a - b).abs() / a.abs().where(a != 0, 1)).max()
+                rows.append(
+                    {
+                        "quantity": f"{program} {column}",
+                        "max_rel_diff": relative,
+                        "tolerance": rtol,
+                        "passed": bool(relative <= rtol),
+                    }
+                )
+
+    report = pd.concat([pd.DataFrame(rows), pd.DataFrame(timings)], ignore_index=True)
+    print(report.to_string(index=False))
+    return report
@@ -0,0 +1,72 @@
+"""
+Measures the import time of the e_fish modules used by the pipeline with 'python -X importtime'.
+
+Usage: python scripts/import_time.py [budget_ms]
+
+The totals include the interpreter startup. The time spent importing numpy and pandas is reported separately and excluded from the budget (200 ms by default),
+since every stage needs them. The script exits with status 1 if the budget is exceeded or if importing the
+modules created a cache directory.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+modules = (
+    "e_fish.load",
+    "e_fish.time",
+    "e_fish.transmitted",
+    "e_fish.signals",
+    "e_fish.stats",
+    "e_fish.for_compiler",
+    "e_fish.store",
+)
+baseline = ("numpy", "pandas")
+budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as cache_dir:
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                f"import {', '.join(baseline)}; import {', '.join(modules)}",
+            ],
+            cwd=Path(__file__).parent.parent,
+            env=os.environ | {"E_FISH_CACHE_DIR": cache_dir},
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            sys.exit(result.stderr)
+        created = os.listdir(cache_dir)
+
+    # The baseline is imported first so its time is not counted inside the e_fish modules.
+    # Lines read "import time: self [us] | cumulative | imported package", nesting shown by indentation
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, time_us, name = line.split("|")
+        if name[1:] == name[1:].lstrip():  # top-level import
+            package = name.strip().split(".")[0]
+            cumulative[package] = cumulative.get(package, 0) + int(time_us) / 1000
+
+    total = sum(cumulative.values())
+    baseline_ms = sum(cumulative.get(i, 0) for i in baseline)
+    for package, time_ms in sorted(cumulative.items(), key=lambda i: -i[1])[:15]:
+        print(f"{package:<30}{time_ms:>10.1f} ms")
+    print(f"{'total':<30}{total:>10.1f} ms")
+    print(
+        f"{'excluding ' + ', '.join(baseline):<30}{total - baseline_ms:>10.1f} ms"
+        f" (budget {budget_ms:.0f} ms)"
+    )
+
+    if created:
+        sys.exit(f"Importing e_fish created cache entries: {created}")
+    if total - baseline_ms > budget_ms:
+        sys.exit(1)
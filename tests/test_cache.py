@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("joblib")
+pytest.importorskip("pandas")
+
+from e_fish import cache
+
+calls = []
+
+
+@cache.memoize("square")
+def _square(folder, x):
+    calls.append(x)
+    return [x**2] * 1000
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    cache.set_cache_dir(tmp_path)
+    calls.clear()
+    yield tmp_path
+    cache.set_cache_dir(None)
+    cache._stores.clear()
+
+
+def test_memoize_hits_and_info(cache_dir):
+    assert _square("run_a", 3) == [9] * 1000
+    assert _square("run_a", 3) == [9] * 1000
+    _square("run_b", 4)
+    assert calls == [3, 4]
+
+    report = cache.info().set_index("store")
+    assert report.loc["square", "kind"] == "joblib"
+    assert report.loc["square", "entries"] == 2
+    assert report.loc["square", "bytes"] > 0
+    assert report.loc["square", "hits"] == 1
+    assert report.loc["square", "misses"] == 2
+
+
+def test_invalidate_removes_results_of_folder(cache_dir):
+    _square("run_a", 3)
+    _square("run_b", 4)
+    assert cache.invalidate("run_a") == 1
+    assert cache.info().set_index("store").loc["square", "entries"] == 1
+
+    calls.clear()
+    _square("run_a", 3)
+    _square("run_b", 4)
+    assert calls == [3]
+
+
+def test_prune_enforces_budget(cache_dir):
+    _square("run_a", 3)
+    _square("run_b", 4)
+    size = cache.info().set_index("store").loc["square", "bytes"]
+    assert cache.prune(size - 1) > 0
+    assert cache.info().set_index("store").loc["square", "entries"] == 1
+    assert cache.prune(0) > 0
+    assert cache.info().set_index("store").loc["square", "entries"] == 0
+
+
+def test_parse_size():
+    np = pytest.importorskip("numpy")
+    assert cache.parse_size("1.5K") == 1536
+    assert cache.parse_size(" 20gb ") == 20 * 1024**3
+    assert cache.parse_size(np.int64(4248)) == 4248
+    assert cache.parse_size(np.float32(2.0)) == 2
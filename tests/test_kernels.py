@@ -0,0 +1,48 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from e_fish import kernels
+
+
+def _ragged_shots(seed=0, n_shots=200, n_elements=300):
+    # Random lengths (some empty), quantized values so that ties occur, and NaN samples
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(0, n_elements + 1, n_shots)
+    offsets = np.append(0, np.cumsum(lengths))
+    values = np.abs(np.round(rng.normal(0, 0.1, offsets[-1]), 2) - 0.15)
+    values[rng.random(offsets[-1]) < 0.01] = np.nan
+    mask = rng.random(offsets[-1]) < 0.5
+    return values, offsets, mask
+
+
+def _reference(values, offsets, mask):
+    result = np.full(len(offsets) - 1, -1)
+    for s, (a, b) in enumerate(zip(offsets[:-1], offsets[1:])):
+        best = np.inf
+        for i in range(a, b):
+            if mask[i] and values[i] < best:
+                best, result[s] = values[i], i - a
+    return result
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_numpy_backend_matches_loop(seed):
+    values, offsets, mask = _ragged_shots(seed)
+    result = kernels.segment_argmin(values, offsets, mask, backend="numpy")
+    np.testing.assert_array_equal(result, _reference(values, offsets, mask))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_backends_are_identical(seed):
+    pytest.importorskip("numba")
+    values, offsets, mask = _ragged_shots(seed)
+    np.testing.assert_array_equal(
+        kernels.segment_argmin(values, offsets, mask, backend="numba"),
+        kernels.segment_argmin(values, offsets, mask, backend="numpy"),
+    )
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        kernels.set_backend("fortran")
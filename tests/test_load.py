@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip("pandas")
+
+from e_fish import load
+
+
+def test_lazy_get_channels_reports_missing_files(tmp_path):
+    for name in ["C1--run--1.txt", "C2--run--1.txt", "C1--run--2.txt", "C2--run--3.txt", "C2--BG--4.txt"]:
+        (tmp_path / name).write_text("")
+
+    handles, missing = load.get_channels(("C1", "C2"), tmp_path, lazy=True)
+    assert set(handles) == {"C1", "C2"}
+    assert handles["C1"].shots == [1, 2]
+    assert handles["C2"].shots == [1, 3]
+    assert missing == {2: ["C2"], 3: ["C1"]}
+
+    _, missing = load.get_channels(("C1", "C2"), tmp_path, shots=[1, 2], lazy=True)
+    assert missing == {2: ["C2"]}
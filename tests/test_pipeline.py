@@ -0,0 +1,178 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from e_fish import pipeline
+
+calls = []
+
+
+def _first(config):
+    calls.append("first")
+    return 1
+
+
+def _second(config, first):
+    calls.append("second")
+    return first + 1
+
+
+def _other(config):
+    calls.append("other")
+    return {"value": config["bin_width"]}
+
+
+def _last(config, second, other):
+    calls.append("last")
+    return second + other["value"]
+
+
+def _write(config, first):
+    calls.append("write")
+    path = f"{config['checkpoint_dir']}/C11--{first}.txt"
+    with open(path, "w") as f:
+        f.write("time;amplitude\n")
+    return [path]
+
+
+def _fail(config, first):
+    raise RuntimeError("stage failed")
+
+
+STUBS = [
+    pipeline.Stage("first", _first),
+    pipeline.Stage("second", _second, requires=("first",)),
+    pipeline.Stage("other", _other, params=("bin_width",)),
+    pipeline.Stage("last", _last, requires=("second", "other")),
+]
+
+
+@pytest.fixture
+def config(tmp_path):
+    calls.clear()
+    return {"checkpoint_dir": str(tmp_path)}
+
+
+def test_settings_is_idempotent(config):
+    completed = pipeline.settings(config)
+    assert pipeline.settings(completed) == completed
+    assert completed["date"] == "2024_05_16"
+    assert completed["pos_volt"] == "pos2_27"
+    with pytest.raises(ValueError):
+        pipeline.settings({"unknown": 1})
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_run_resumes_from_checkpoints(config, parallel):
+    report = pipeline.run(config, stages=STUBS, parallel=parallel)
+    assert report == dict.fromkeys(["first", "second", "other", "last"], "ran")
+    assert sorted(calls) == ["first", "last", "other", "second"]
+
+    calls.clear()
+    report = pipeline.run(config, stages=STUBS, parallel=parallel)
+    assert set(report.values()) == {"cached"}
+    assert calls == []
+    assert pipeline._restore(STUBS[-1], pipeline.settings(config)) == 2.2
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_force_and_parameters_rerun_dependents(config, parallel):
+    pipeline.run(config, stages=STUBS, parallel=parallel)
+
+    calls.clear()
+    report = pipeline.run(config, stages=STUBS, force=("second",), parallel=parallel)
+    assert report == {"first": "cached", "second": "ran", "other": "cached", "last": "ran"}
+    assert sorted(calls) == ["last", "second"]
+
+    calls.clear()
+    report = pipeline.run(config | {"bin_width": 0.5}, stages=STUBS, parallel=parallel)
+    assert report == {"first": "cached", "second": "cached", "other": "ran", "last": "ran"}
+    assert pipeline._restore(STUBS[-1], pipeline.settings(config)) == 2.5
+
+
+def test_until_stops_after_stage(config):
+    report = pipeline.run(config, stages=STUBS, until="second")
+    assert report == {"first": "ran", "second": "ran"}
+    report = pipeline.run(config, stages=STUBS, until="second", parallel=True)
+    assert report == {"first": "cached", "second": "cached"}
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_failure_keeps_completed_checkpoints(config, parallel):
+    stages = [STUBS[0], pipeline.Stage("second", _fail, requires=("first",)), STUBS[2]]
+    with pytest.raises(RuntimeError):
+        pipeline.run(config, stages=stages, parallel=parallel)
+    status = pipeline.status(config, stages).set_index("stage").checkpoint
+    assert status["first"] and not status["second"]
+    assert status["other"] == parallel  # the sequential run stops at the failure
+
+
+def test_missing_written_file_reruns_stage(config, tmp_path):
+    stages = [STUBS[0], pipeline.Stage("write", _write, requires=("first",), writes=True)]
+    pipeline.run(config, stages=stages)
+    assert pipeline.run(config, stages=stages)["write"] == "cached"
+
+    (tmp_path / "C11--1.txt").unlink()
+    calls.clear()
+    assert pipeline.run(config, stages=stages) == {"first": "cached", "write": "ran"}
+    assert calls == ["write"]
+
+
+def _shots(n):
+    import numpy as np
+    import pandas as pd
+
+    t = np.linspace(0, 1e-7, 50)
+    for shot in range(1, n + 1):
+        yield pd.DataFrame({"file_number": shot, "time": t, "amplitude": -np.sin(t * 3e7) * shot})
+
+
+def _discharges(config):
+    import pandas as pd
+
+    return pd.DataFrame({"file_number": [1, 2, 3], "time": 0.0, "transmitted": 0.15})
+
+
+def test_streaming_stage_reruns_when_its_files_are_missing(config, tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline.for_compiler, "input_folder", tmp_path)
+    monkeypatch.setattr(pipeline, "input_folder", tmp_path)
+    (tmp_path / pipeline.DEFAULTS["data_path"]).mkdir()
+    monkeypatch.setattr(pipeline.streaming, "read_shots", lambda *args, **kwargs: _shots(3))
+    features = next(i for i in pipeline.STREAMING_STAGES if i.name == "features")
+    stages = [pipeline.Stage("discharge", _discharges), features]
+
+    assert pipeline.run(config, stages=stages)["features"] == "ran"
+    written = pipeline._restore(features, pipeline.settings(config)).c33_file.tolist()
+    assert len(written) == 3
+    assert pipeline.run(config, stages=stages)["features"] == "cached"
+
+    pipeline.Path(written[1]).unlink()
+    assert pipeline.run(config, stages=stages) == {"discharge": "cached", "features": "ran"}
+    assert pipeline.Path(written[1]).exists()
+
+
+def test_critical_path():
+    path, length = pipeline.critical_path(STUBS, {"first": 1, "second": 2, "other": 4, "last": 1})
+    assert path == ["other", "last"]
+    assert length == 5
+
+
+def test_fortran_runs_get_their_files(monkeypatch):
+    commands = []
+
+    async def _record(command, env=None):
+        commands.append(command)
+        return ""
+
+    monkeypatch.setattr(pipeline.for_compiler, "run_command", _record)
+    config = pipeline.settings({})
+    asyncio.run(pipeline._shg(config, "shg.x"))
+    asyncio.run(pipeline._ssc(config, "ssc.x", None))
+
+    folder = pipeline.input_folder / "2024_05_16"
+    assert commands[0] == f'"shg.x" "{folder / "input_pos2_27.dat"}" "{folder / "output_pos2_27.dat"}"'
+    assert commands[1] == (
+        f'"ssc.x" "{folder / "input_pos2_27_SSC.dat"}" "{folder / "output_pos2_27_SSC.dat"}" "t_student.dat"'
+    )
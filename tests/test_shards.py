@@ -0,0 +1,74 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from e_fish import load, pipeline, shards, time, transmitted
+
+
+def _c1(n_shots=12, n_samples=2002):
+    # Incident pulse around 20 ns and its reflection around 100 ns, with the last shot left without a reflection
+    t = np.tile(np.linspace(-2e-8, 1.8e-7, n_samples), n_shots)
+    shot = np.repeat(np.arange(1, n_shots + 1), n_samples)
+    incident = np.where((t > 1e-8) & (t < 3e-8), -0.4, 0.0)
+    reflected = np.where((t > 9e-8) & (t < 1.1e-7) & (shot < n_shots), 0.3, 0.0)
+    noise = np.random.default_rng(0).normal(0, 0.01, len(t))
+    return pd.DataFrame({"file_number": shot, "time": t, "amplitude": incident + reflected + noise})
+
+
+@pytest.fixture(scope="module")
+def frames():
+    df_1 = load.avg_amplitude(_c1(), 10)
+    df_time = time.calculate_df_time(df_1, 0.15, -0.15)
+    df_shifted = time.shift_reflected_pulse(df_1, df_time)
+    df_transmitted = transmitted.compute_pulse(df_1, df_shifted, df_time)
+    return df_1, df_time, df_shifted, df_transmitted
+
+
+def test_avg_amplitude(frames):
+    sharded = shards.run_sharded(load.avg_amplitude, (_c1(),), 10, n_shards=3, max_workers=2)
+    pd.testing.assert_frame_equal(sharded, frames[0])
+
+
+def test_shift_reflected_pulse(frames):
+    df_1, df_time, df_shifted, _ = frames
+    sharded = shards.run_sharded(time.shift_reflected_pulse, (df_1, df_time), n_shards=3, max_workers=2)
+    assert not sharded.isna().any().any()
+    pd.testing.assert_frame_equal(sharded, df_shifted)
+
+
+def test_compute_pulse(frames):
+    df_1, df_time, df_shifted, df_transmitted = frames
+    sharded = shards.run_sharded(
+        transmitted.compute_pulse,
+        (df_1, df_shifted, df_time),
+        n_shards=3,
+        max_workers=2,
+        ignore_index=True,
+    )
+    pd.testing.assert_frame_equal(sharded, df_transmitted)
+
+
+def test_get_discharge_times(frames):
+    df_transmitted = frames[3]
+    single = transmitted.get_discharge_times(df_transmitted, 0.15)
+    sharded = shards.run_sharded(
+        transmitted.get_discharge_times,
+        (df_transmitted,),
+        0.15,
+        n_shards=3,
+        max_workers=2,
+        ignore_index=True,
+    )
+    assert len(single) > 0
+    pd.testing.assert_frame_equal(sharded, single)
+
+
+def test_pipeline_stages_with_shards(frames):
+    df_1, df_time, _, df_transmitted = frames
+    config = pipeline.settings({"shards": 3, "workers": 2})
+    pd.testing.assert_frame_equal(pipeline._transmitted(config, df_1, df_time), df_transmitted)
+    pd.testing.assert_frame_equal(
+        pipeline._discharge(config, df_transmitted),
+        transmitted.get_discharge_times(df_transmitted, 0.15),
+    )